@@ -65,7 +65,7 @@ Label = create_enum(
 )
 
 
-@enhance("Classify the given text into multiple labels", llm)
+@enhance("Classify the given text into multiple labels", llm, enum_indices=True)
 def classify(text: str) -> Semantic[List[Label], "Relevant Labels"]: ...  # type: ignore
 
 
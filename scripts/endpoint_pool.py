@@ -0,0 +1,221 @@
+"""Endpoint pool test against local stub servers.
+
+Starts stub OpenAI-compatible servers on localhost (no model, no network) and checks that
+an `EndpointPool` over them spreads concurrent requests, pins sticky prefixes, fails over
+and ejects a failing endpoint, re-admits it once it recovers, and streams. Needs the
+`openai` package.
+
+Usage:
+    python scripts/endpoint_pool.py [--servers 3] [--requests 60] [--latency 0.05]
+
+Exits with a non-zero status if any check fails.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Literal
+
+from semantix.llms import EndpointPool
+
+
+class StubServer(ThreadingHTTPServer):
+    """OpenAI-compatible server answering with its own name after a delay."""
+
+    daemon_threads = True
+
+    def __init__(self, name: str, latency: float) -> None:
+        """Initializes the StubServer class."""
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.name = name
+        self.latency = latency
+        self.failing = False
+        self.requests = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        """Get the base URL of the API."""
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler of the stub servers."""
+
+    server: StubServer
+
+    def log_message(self, *args: object) -> None:
+        """Keep the output quiet."""
+
+    def do_GET(self) -> None:  # noqa: N802
+        """List the models, for the health checks."""
+        if self.server.failing:
+            self.send_json(503, {"error": {"message": "unavailable"}})
+            return
+        data = [{"id": "stub", "object": "model", "created": 0, "owned_by": "stub"}]
+        self.send_json(200, {"object": "list", "data": data})
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Answer a chat completion request."""
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.failing:
+            self.send_json(500, {"error": {"message": "internal error"}})
+            return
+        time.sleep(self.server.latency)
+        content = self.server.name
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for piece in (content[:2], content[2:]):
+                chunk = {
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "stub",
+                    "choices": [{"index": 0, "delta": {"content": piece}}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        self.send_json(
+            200,
+            {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "stub",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 1,
+                    "completion_tokens": 1,
+                    "total_tokens": 2,
+                },
+            },
+        )
+
+    def send_json(self, status: int, data: dict) -> None:
+        """Send a JSON response."""
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def messages(prefix: str) -> list:
+    """Get the messages of a request with the given static prompt."""
+    return [
+        {"role": "system", "content": prefix},
+        {"role": "user", "content": "Hello"},
+    ]
+
+
+def main() -> int:
+    """Run the checks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", type=int, default=3, help="Number of servers.")
+    parser.add_argument("--requests", type=int, default=60, help="Requests per check.")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Stub server latency in seconds."
+    )
+    args = parser.parse_args()
+
+    servers = [StubServer(f"s{i}", args.latency) for i in range(args.servers)]
+    urls = [server.base_url for server in servers]
+    names = {server.name for server in servers}
+    failures: List[str] = []
+
+    def check(name: str, passed: bool, detail: str = "") -> None:
+        print(f"{'ok' if passed else 'FAIL'}: {name} {detail}".rstrip())
+        if not passed:
+            failures.append(name)
+
+    def spread(pool: EndpointPool, prefix: Callable[[int], str]) -> Counter:
+        def request(i: int) -> str:
+            return pool.__infer__(messages(prefix(i)))
+
+        with ThreadPoolExecutor(args.servers * 4) as executor:
+            return Counter(executor.map(request, range(args.requests)))
+
+    strategies: List[Literal["least_outstanding", "latency"]] = [
+        "least_outstanding",
+        "latency",
+    ]
+    for strategy in strategies:
+        pool = EndpointPool(urls, "stub", strategy=strategy, health_interval=None)
+        counts = spread(pool, lambda i: f"prompt {i}")
+        check(
+            f"{strategy} spreads the requests",
+            set(counts) == names and min(counts.values()) >= args.requests // 10,
+            str(dict(counts)),
+        )
+
+    pool = EndpointPool(urls, "stub", sticky=True, health_interval=None)
+    pinned = {pool.__infer__(messages(f"function {i}")) for i in range(3)}
+    repeats = [pool.__infer__(messages("function 0")) for _ in range(5)]
+    check("sticky prefixes are pinned", len(set(repeats)) == 1, str(repeats))
+    counts = spread(pool, lambda i: "one prefix")
+    check(
+        "sticky overflow under load",
+        len(counts) > 1,
+        f"{dict(counts)} (prefixes on {sorted(pinned)})",
+    )
+
+    pool = EndpointPool(
+        urls, "stub", max_failures=2, eject_seconds=0.5, health_interval=0.2
+    )
+    servers[0].failing = True
+    counts = spread(pool, lambda i: f"prompt {i}")
+    ejected = [e["base_url"] for e in pool.stats() if not e["up"]]
+    check(
+        "failover hides the failing endpoint",
+        sum(counts.values()) == args.requests and servers[0].name not in counts,
+        str(dict(counts)),
+    )
+    check("the failing endpoint is ejected", ejected == [urls[0]], str(ejected))
+    servers[0].failing = False
+    time.sleep(1.0)
+    up = [e["base_url"] for e in pool.stats() if e["up"]]
+    check("the recovered endpoint is re-admitted", up == urls, str(up))
+    counts = spread(pool, lambda i: f"prompt {i}")
+    check(
+        "the re-admitted endpoint serves", servers[0].name in counts, str(dict(counts))
+    )
+    pool.close()
+
+    pool = EndpointPool(urls, "stub", health_interval=None)
+    streamed = "".join(pool.__stream__(messages("stream")))
+    check("streaming", streamed in names, repr(streamed))
+    check(
+        "no request left in flight",
+        all(e["outstanding"] == 0 for e in pool.stats()),
+        str(pool.stats()),
+    )
+
+    for server in servers:
+        server.shutdown()
+    if failures:
+        print(f"FAIL: {len(failures)} checks failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Import time benchmark for Semantix.
+
+Measures the cold start of `import semantix` in fresh interpreters and checks that no
+heavy optional dependency is imported eagerly.
+
+Usage:
+    python scripts/import_time.py [--runs 10] [--max-ms 300]
+
+Exits with a non-zero status if the median import time exceeds `--max-ms` or if any of
+the heavy modules is imported by `import semantix`.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "cv2",
+    "PIL",
+    "numpy",
+    "pydantic",
+    "openai",
+    "anthropic",
+    "cohere",
+    "groq",
+    "mistralai",
+    "together",
+    "http.server",
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import semantix
+elapsed = time.perf_counter() - start
+heavy = [m for m in json.loads(sys.argv[1]) if m in sys.modules]
+print(json.dumps({"elapsed": elapsed, "heavy": heavy}))
+"""
+
+
+def measure() -> dict:
+    """Import semantix in a fresh interpreter and return the measurement."""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Number of fresh imports.")
+    parser.add_argument(
+        "--max-ms", type=float, default=300, help="Maximum median import time."
+    )
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.runs)]
+    timings = sorted(r["elapsed"] * 1000 for r in results)
+    median = statistics.median(timings)
+    heavy = sorted({m for r in results for m in r["heavy"]})
+    print(
+        f"import semantix: median {median:.1f} ms, "
+        f"min {timings[0]:.1f} ms, max {timings[-1]:.1f} ms ({args.runs} runs)"
+    )
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if median > args.max_ms:
+        print(f"FAIL: median import time exceeds {args.max_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""Prompt size benchmark for Semantix.
+
+Renders the prompts of sample enhanced functions in the default and the compact form
+(`enhance(..., compact_prompt=True)`) against a local stub model (no network), and reports
+the input tokens of every function and of its type definitions and inputs. The tokens are
+counted with tiktoken when it is installed and an encoding is given, and estimated at 4
+characters per token otherwise.
+
+Usage:
+    python scripts/prompt_tokens.py [--encoding o200k_base] [--no-field-docs] [--show]
+
+Exits with a non-zero status if the compact prompt of any function is larger than its
+default prompt.
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, cast
+
+from semantix import Semantic
+from semantix.inference import EnhancedFunction
+from semantix.llms.base import BaseLLM
+from semantix.session import estimate_tokens
+from semantix.utils import create_enum
+
+LABELS = [
+    "lists_createoradd",
+    "calendar_query",
+    "email_sendemail",
+    "news_query",
+    "play_music",
+    "play_radio",
+    "qa_maths",
+    "email_query",
+    "weather_query",
+    "calendar_set",
+    "iot_hue_lightdim",
+    "takeaway_query",
+    "social_post",
+    "email_querycontact",
+    "qa_factoid",
+    "calendar_remove",
+    "cooking_recipe",
+    "lists_query",
+    "general_quirky",
+    "alarm_query",
+    "takeaway_order",
+    "iot_hue_lightup",
+    "lists_remove",
+    "qa_currency",
+    "play_game",
+    "play_audiobook",
+    "qa_definition",
+    "music_query",
+    "datetime_query",
+    "transport_query",
+    "iot_hue_lightoff",
+    "iot_hue_lightchange",
+    "iot_hue_lighton",
+    "alarm_set",
+    "music_likeness",
+    "recommendation_movies",
+    "transport_ticket",
+    "recommendation_locations",
+    "audio_volume_mute",
+    "iot_wemo_on",
+    "play_podcasts",
+    "datetime_convert",
+    "audio_volume_other",
+    "recommendation_events",
+    "alarm_remove",
+    "iot_coffee",
+    "music_dislikeness",
+    "general_joke",
+    "social_query",
+]
+
+Label = create_enum(
+    "Label",
+    {label.upper(): label for label in LABELS},
+    "The labels for the multilabel classification task",
+)
+
+
+class Personality(Enum):
+    """Personality of the Person."""
+
+    INTROVERT = "Introvert"
+    EXTROVERT = "Extrovert"
+
+
+@dataclass
+class Person:  # noqa: D101 (the docstring is generated from the signature)
+    full_name: str
+    yod: Semantic[int, "Year of Death"]  # type: ignore # noqa: F722
+    personality: Semantic[Personality, "Personality of the Person"]  # type: ignore # noqa: F722 E501
+
+
+@dataclass
+class Address:  # noqa: D101 (the docstring is generated from the signature)
+    street: str
+    city: str
+    country: str = "Sri Lanka"
+
+
+@dataclass
+class Company:
+    """A company and its head office."""
+
+    name: str
+    address: Address
+    industry: str = ""
+
+
+@dataclass
+class Employee:
+    """An employee of a company."""
+
+    name: Semantic[str, "Full name of the employee"]  # type: ignore # noqa: F722
+    role: Semantic[str, "Job title"]  # type: ignore # noqa: F722
+    company: Company
+    remote: bool = False
+
+
+class StubLLM(BaseLLM):
+    """Model that is never called, the prompts are only rendered."""
+
+    def __init__(self) -> None:
+        """Initializes the StubLLM class."""
+        super().__init__()
+        self.default_params = {"model": "stub"}
+
+    def __infer__(self, messages: list, model_params: dict = {}) -> str:
+        """Refuse to answer, the benchmark does not call the model."""
+        raise NotImplementedError
+
+
+def sample_functions(llm: BaseLLM) -> Dict[str, tuple]:
+    """Get the sample functions and the keyword arguments of their calls."""
+
+    @llm.enhance("Classify the given text into multiple labels")
+    def classify(text: str) -> Semantic[List[Label], "Relevant Labels"]:  # type: ignore # noqa: F722 E501
+        ...
+
+    @llm.enhance("Get the information of the person", method="Reason")
+    def get_person_info(name: str) -> Person:  # type: ignore[empty-body]
+        """Look up the person by their name."""
+
+    @llm.enhance("Find the employees who could mentor the new hire")
+    def find_mentors(  # type: ignore[empty-body]
+        new_hire: Employee, staff: List[Employee]
+    ) -> List[str]:
+        """Look for the staff in the same role."""
+
+    company = Company("Jaseci Labs", Address("11 Main Street", "Colombo"), "AI")
+
+    def hire(name: str, role: str) -> Employee:
+        # The Semantic fields hold plain values at runtime
+        return Employee(cast(Any, name), cast(Any, role), company)
+
+    staff = [
+        hire(f"Employee {i}", "Engineer" if i % 2 else "Researcher") for i in range(20)
+    ]
+    return {
+        "classify": (classify, {"text": "Turn the lights on and play some music"}),
+        "get_person_info": (get_person_info, {"name": "Albert Einstein"}),
+        "find_mentors": (
+            find_mentors,
+            {"new_hire": hire("New Hire", "Engineer"), "staff": staff},
+        ),
+    }
+
+
+def measure(
+    function: EnhancedFunction,
+    kwargs: dict,
+    count_tokens: Callable[[str], int],
+    compact: bool,
+    field_docs: bool,
+    show: bool = False,
+) -> Dict[str, int]:
+    """Count the input tokens of a call, in total and for the types and the inputs."""
+    function.compact_prompt, function.field_docs = compact, field_docs
+    function._informations = None
+    engine = function.build_engine(**kwargs)
+    prompt_info = engine.prompt_info
+    messages = engine.get_messages()
+    if show:
+        print("\n\n".join(str(m) for m in messages), end="\n\n")
+    return {
+        "total": sum(count_tokens(str(m)) for m in messages),
+        "types": sum(count_tokens(str(t)) for t in prompt_info.type_explanations),
+        "inputs": sum(count_tokens(str(i)) for i in prompt_info.input_informations),
+    }
+
+
+def get_counter(encoding: Optional[str]) -> Callable[[str], int]:
+    """Get the token counter, tiktoken if an encoding is given."""
+    if not encoding:
+        return estimate_tokens
+    import tiktoken
+
+    tokenizer = tiktoken.get_encoding(encoding)
+    return lambda text: len(tokenizer.encode(text))
+
+
+def main() -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--encoding", default="", help="tiktoken encoding (e.g. o200k_base)."
+    )
+    parser.add_argument(
+        "--no-field-docs",
+        action="store_true",
+        help="Leave the meaning of the fields out of the compact type definitions.",
+    )
+    parser.add_argument("--show", action="store_true", help="Print the prompts.")
+    args = parser.parse_args()
+
+    count_tokens = get_counter(args.encoding)
+    field_docs = not args.no_field_docs
+    print(f"{'function':<18} {'section':<8} {'default':>8} {'compact':>8} {'saved':>7}")
+    failed = []
+    for name, (function, kwargs) in sample_functions(StubLLM()).items():
+        default = measure(function, kwargs, count_tokens, False, True, args.show)
+        compact = measure(function, kwargs, count_tokens, True, field_docs, args.show)
+        for section in ("types", "inputs", "total"):
+            before, after = default[section], compact[section]
+            saved = (before - after) / before if before else 0.0
+            print(f"{name:<18} {section:<8} {before:>8} {after:>8} {saved:>7.1%}")
+        if compact["total"] > default["total"]:
+            failed.append(name)
+    if failed:
+        print(f"FAIL: the compact prompt is larger for {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
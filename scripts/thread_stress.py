@@ -0,0 +1,142 @@
+"""Concurrency stress test for Semantix.
+
+Calls enhanced functions from many threads at once against a local stub model (no
+network), while other threads subscribe `Semantic` types and decorate new functions, and
+checks that every call gets the output of its own inputs. Runs on regular and
+free-threaded (3.13t) builds; the GIL status is reported.
+
+Usage:
+    python scripts/thread_stress.py [--threads 32] [--calls 200]
+
+Exits with a non-zero status if any call fails or gets the output of another call.
+"""
+
+import argparse
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, List, cast
+
+from semantix import Semantic
+from semantix.llms.base import BaseLLM
+
+
+class Parity(Enum):
+    """Parity of a number."""
+
+    EVEN = "even"
+    ODD = "odd"
+
+
+@dataclass
+class Result:
+    """Result of the stub model."""
+
+    number: Semantic[int, "The number"]  # type: ignore # noqa: F722
+    parity: Parity
+    tags: List[str]
+
+
+offset: Semantic[int, "Offset added to the number"] = 1000  # type: ignore # noqa: F722
+
+
+class StubLLM(BaseLLM):
+    """Model answering from the input number of the prompt, without network."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        """Initializes the StubLLM class."""
+        super().__init__()
+        self.latency = latency
+        self.default_params = {"model": "stub"}
+
+    def __infer__(self, messages: list, model_params: dict = {}) -> str:
+        """Answer with a Result for the number of the prompt."""
+        prompt = str(messages)
+        number = int(re.findall(r"- n \(int\) = (\d+)", prompt)[-1])
+        if self.latency:
+            time.sleep(self.latency)
+        parity = "EVEN" if number % 2 == 0 else "ODD"
+        return (
+            "```output\n"
+            f"Result(number={number + 1000}, parity=Parity.{parity}, tags=['t{number}'])"
+            "\n```"
+        )
+
+
+def main() -> int:
+    """Run the stress test."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32, help="Number of threads.")
+    parser.add_argument("--calls", type=int, default=200, help="Calls per thread.")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Stub model latency in seconds."
+    )
+    args = parser.parse_args()
+
+    llm = StubLLM(args.latency)
+
+    @llm.enhance("Add the offset to the number", info=[offset])
+    def shift(n: int) -> Result:  # type: ignore[empty-body]
+        """Shift the number."""
+
+    errors: List[str] = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker(index: int) -> None:
+        for i in range(args.calls):
+            n = index * args.calls + i
+            try:
+                result = shift(n=n)
+                expected = Result(
+                    n + 1000, Parity.EVEN if n % 2 == 0 else Parity.ODD, [f"t{n}"]
+                )
+                if result != expected:
+                    raise AssertionError(f"got {result!r}, expected {expected!r}")
+            except Exception as e:
+                with lock:
+                    errors.append(f"call {n}: {e!r}")
+
+    def churn() -> None:
+        i = 0
+        while not stop.is_set():
+            cast(Any, Semantic)[int, f"meaning {i % 50}"]
+
+            @llm.enhance("Churn")
+            def churned(x: int) -> int:  # type: ignore[empty-body]
+                """Churn."""
+
+            i += 1
+
+    churners = [threading.Thread(target=churn, daemon=True) for _ in range(2)]
+    for t in churners:
+        t.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as executor:
+        list(executor.map(worker, range(args.threads)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for t in churners:
+        t.join()
+
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    total = args.threads * args.calls
+    print(
+        f"{total} calls on {args.threads} threads in {elapsed:.2f} s "
+        f"({total / elapsed:.0f} calls/s), Python {sys.version.split()[0]}, "
+        f"GIL {'enabled' if is_gil_enabled else 'disabled'}"
+    )
+    if errors:
+        print(f"FAIL: {len(errors)} calls failed")
+        for error in errors[:10]:
+            print(f"  {error}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
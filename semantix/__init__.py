@@ -2,6 +2,8 @@
 
 import semantix.llms as llms
 from semantix.decorators import enhance, tool
+from semantix.profiler import profile
+from semantix.session import Session
 from semantix.types.semantic import Semantic
 
-__all__ = ["Semantic", "enhance", "tool", "llms"]
+__all__ = ["Semantic", "enhance", "tool", "llms", "profile", "Session"]
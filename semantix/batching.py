@@ -0,0 +1,183 @@
+"""Micro-batching of enhanced function calls.
+
+Concurrent (or queued) calls of an enhanced function are collected for a short window and
+sent to the model as a single request. The static part of the prompt (goal, context, output
+type, tools and type definitions) is shared, every call adds an indexed input section and
+the model answers with one output block per input. Calls whose output is missing or cannot
+be parsed fall back to a regular single call.
+"""
+
+import copy
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, TYPE_CHECKING, Tuple
+
+from loguru import logger
+
+from semantix import metrics, profiler
+from semantix.types.prompt import TypeExplanation
+from semantix.types.semantic import Output
+from semantix.utils.fences import scan_blocks
+
+if TYPE_CHECKING:
+    from semantix.inference import EnhancedFunction, InferenceEngine
+    from semantix.llms.base import BaseLLM
+
+_FALLBACK = object()
+
+
+class _Batch:
+    """Class to represent the calls collected in a batch."""
+
+    def __init__(self) -> None:
+        """Initializes the _Batch class."""
+        self.items: List[Tuple["InferenceEngine", Future]] = []
+        self.full = threading.Event()
+
+
+class BatchPromptInfo:
+    """Class to represent the prompt information of a batch of calls."""
+
+    def __init__(self, engines: List["InferenceEngine"]) -> None:
+        """Initializes the BatchPromptInfo class."""
+        self.engines = engines
+
+    def get_messages(self, model: "BaseLLM", method: str) -> List["BaseLLM.Message"]:
+        """Get the messages sharing the static sections between the calls."""
+        type_explanations: Dict[str, TypeExplanation] = {}
+        for engine in self.engines:
+            for t in engine.prompt_info.type_explanations:
+                type_explanations.setdefault(t.type.__name__, t)
+        # A copy, the prompt of the first call is left untouched
+        prompt_info = copy.copy(self.engines[0].prompt_info)
+        prompt_info.type_explanations = list(type_explanations.values())
+        messages = prompt_info.get_static_messages(model)
+        desc = model.get_message_desc("batch_input_informations")
+        for index, engine in enumerate(self.engines):
+            messages.extend(
+                engine.prompt_info.get_input_messages(model, desc.format(index=index))
+            )
+        messages.extend(prompt_info.get_information_messages(model))
+        messages.append(model.batch_method_message(method, len(self.engines)))
+        return messages
+
+
+class MicroBatcher:
+    """Class to collect the calls of an enhanced function into batches.
+
+    The first call of a batch becomes its leader: it waits until the batch is full or the
+    window expires, sends the batch to the model and hands the results to the other calls.
+    """
+
+    def __init__(
+        self,
+        function: "EnhancedFunction",
+        batch_size: int,
+        batch_window_ms: float,
+        timeout: float = 600.0,
+    ) -> None:
+        """Initializes the MicroBatcher class.
+
+        Args:
+            function (EnhancedFunction): The enhanced function to batch the calls of.
+            batch_size (int): The maximum number of calls in a batch.
+            batch_window_ms (float): How long the first call of a batch waits for more calls.
+            timeout (float, optional): How long the other calls wait for the result of the
+                batch after the window, in seconds, before running by themselves. Defaults
+                to 600.
+        """
+        self.function = function
+        self.batch_size = batch_size
+        self.batch_window_ms = batch_window_ms
+        self.timeout = timeout
+        self._current: Optional[_Batch] = None
+        self._lock = threading.Lock()
+
+    def submit(self, engine: "InferenceEngine") -> Any:  # noqa: ANN401
+        """Run the inference engine of a call as part of a batch and return its output."""
+        future: Future = Future()
+        with self._lock:
+            batch = self._current
+            leader = batch is None
+            if batch is None:
+                batch = self._current = _Batch()
+            batch.items.append((engine, future))
+            if len(batch.items) >= self.batch_size:
+                self._current = None
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.batch_window_ms / 1000)
+            with self._lock:
+                if self._current is batch:
+                    self._current = None
+            self._execute(batch.items)
+        try:
+            result = future.result(self.batch_window_ms / 1000 + self.timeout)
+        except FutureTimeoutError:
+            result = _FALLBACK
+        if result is _FALLBACK:
+            return self.function._run_engine(engine)
+        return result
+
+    def _execute(self, items: List[Tuple["InferenceEngine", Future]]) -> None:
+        """Run a batch and resolve the futures of its calls."""
+        if len(items) == 1:
+            items[0][1].set_result(_FALLBACK)
+            return
+        results = [_FALLBACK] * len(items)
+        try:
+            results = self.run_batch([engine for engine, _ in items])
+        except Exception as e:
+            metrics.record_retry(e)
+            if self.function.model.verbose:
+                logger.exception(f"Batch failed: {e}. Falling back to single calls.")
+        finally:
+            # Even if the leader is interrupted, the other calls are not left waiting
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+    def run_batch(self, engines: List["InferenceEngine"]) -> List[Any]:
+        """Run the inference engines of the calls in a single request.
+
+        Returns:
+            list: The output of every call, or a fallback marker for the calls that failed.
+        """
+        function = self.function
+        model = function.model
+        with profiler.span("prompt"):
+            messages = BatchPromptInfo(engines).get_messages(model, function.method)
+        model_output = model(messages, function.model_params)
+        if model.verbose:
+            logger.info(f"Model Output\n{model_output}")
+        with profiler.span("parse"):
+            blocks = scan_blocks(model_output)
+        shared: Dict[str, Any] = {
+            k: v for k, v in blocks.items() if not k.startswith("output")
+        }
+        _globals, _locals = function.namespace.globals, function.namespace.locals
+        results: List[Any] = []
+        for index, engine in enumerate(engines):
+            block = blocks.get(f"output_{index}")
+            if block is None:
+                results.append(_FALLBACK)
+                continue
+            try:
+                obj = model.parse_output(
+                    block.strip(), engine.prompt_info.return_hint, _globals, _locals
+                )
+            except Exception as e:
+                try:
+                    obj = model.repair_output(
+                        block.strip(),
+                        engine.output_fix_prompt_info,
+                        _globals,
+                        _locals,
+                        e,
+                    )
+                except Exception:
+                    metrics.record_retry(e)
+                    results.append(_FALLBACK)
+                    continue
+            output = Output(**shared, output=obj)
+            results.append(output if function.return_additional_info else obj)
+        return results
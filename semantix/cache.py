@@ -0,0 +1,367 @@
+"""Caches for enhanced function calls and tools.
+
+The near-duplicate cache serves the output of a previous call when the rendered inputs of a
+new call are almost the same, e.g. they only differ by whitespace, casing, punctuation or a
+few characters. Inputs are normalized, split into character shingles and fingerprinted with
+SimHash. Candidates are the cached inputs whose fingerprint is within a few bits of the new
+one, and a candidate is only served if the Jaccard similarity of the shingles reaches the
+threshold of the cache. Everything runs locally with NumPy, no embedding model is needed.
+
+Example:
+```python
+from semantix.cache import NearDuplicateCache
+
+@sx.enhance("Detect the PII in the text", llm, cache=NearDuplicateCache(threshold=0.95))
+def detect_pii(text: str) -> List[str]: ...
+```
+
+The TTL cache memoises the results of tools by their exact arguments, canonicalised so that
+equal arguments (e.g. passed by position or by keyword, dataclasses, Enums, dicts in any
+order) share the same entry, for a limited time.
+
+Example:
+```python
+from semantix.cache import TTLCache
+
+@sx.tool("Search the web", cache=TTLCache(ttl=600))
+def search(query: str) -> List[str]: ...
+```
+"""
+
+import dataclasses
+import hashlib
+import importlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def _numpy() -> Any:  # noqa: ANN401
+    """Import NumPy, which is only needed by the near-duplicate cache."""
+    try:
+        return importlib.import_module("numpy")
+    except ImportError as e:
+        raise ImportError(
+            "Please install the required dependencies by running `pip install semantix[cache]`."
+        ) from e
+
+
+def normalize(text: str) -> str:
+    """Normalize a text by casefolding it, removing punctuation and collapsing whitespace."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+def shingles(text: str, size: int = 4) -> FrozenSet[str]:
+    """Get the character shingles of a text."""
+    if len(text) <= size:
+        return frozenset([text])
+    return frozenset(text[i : i + size] for i in range(len(text) - size + 1))
+
+
+def simhash(features: FrozenSet[str]) -> int:
+    """Get the 64 bit SimHash fingerprint of a set of features."""
+    np = _numpy()
+    hashes = np.array(
+        [
+            int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "big")
+            for f in features
+        ],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0) * 2 > len(hashes)
+    return int(
+        np.bitwise_or.reduce(votes.astype(np.uint64) << np.arange(64, dtype=np.uint64))
+    )
+
+
+class _Entry:
+    """Class to represent a cached output."""
+
+    def __init__(
+        self,
+        fingerprint: int,
+        features: FrozenSet[str],
+        value: Any,  # noqa: ANN401
+    ) -> None:
+        """Initializes the _Entry class."""
+        self.fingerprint = fingerprint
+        self.features = features
+        self.value = value
+
+
+class _Scope:
+    """Class to hold the entries of the calls sharing the same static prompt.
+
+    The fingerprints are appended to an array that grows by doubling, next to the keys and
+    features of the entries. Rows below the current size are never rewritten, so a snapshot
+    can be searched without the lock. Evicted entries leave dead rows behind, which are
+    dropped once they outnumber the live entries.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the _Scope class."""
+        np = _numpy()
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._keys: List[str] = []
+        self._features: List[FrozenSet[str]] = []
+        self._fingerprints = np.empty(16, dtype=np.uint64)
+        self._size = 0
+
+    def add(self, key: str, entry: _Entry) -> None:
+        """Add or refresh an entry, without evicting."""
+        if key not in self.entries:
+            self._append(key, entry)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+    def evict(self) -> None:
+        """Evict the least recently used entry."""
+        self.entries.popitem(last=False)
+        if self._size > 2 * len(self.entries) + 16:
+            self._compact()
+
+    def snapshot(self) -> Tuple[List[str], List[FrozenSet[str]], Any]:
+        """Get the keys, the features and the fingerprint array of the rows."""
+        return self._keys, self._features, self._fingerprints[: self._size]
+
+    def _append(self, key: str, entry: _Entry) -> None:
+        """Append the row of a new entry."""
+        np = _numpy()
+        if self._size == len(self._fingerprints):
+            # A new array, the snapshots taken before keep the old one
+            grown = np.empty(2 * self._size, dtype=np.uint64)
+            grown[: self._size] = self._fingerprints
+            self._fingerprints = grown
+        self._fingerprints[self._size] = entry.fingerprint
+        self._keys.append(key)
+        self._features.append(entry.features)
+        self._size += 1
+
+    def _compact(self) -> None:
+        """Rebuild the rows from the live entries only."""
+        np = _numpy()
+        self._keys = list(self.entries)
+        self._features = [e.features for e in self.entries.values()]
+        self._size = len(self._keys)
+        self._fingerprints = np.empty(max(2 * self._size, 16), dtype=np.uint64)
+        self._fingerprints[: self._size] = [
+            e.fingerprint for e in self.entries.values()
+        ]
+
+
+class NearDuplicateCache:
+    """Class to cache the outputs of enhanced functions by near-duplicate inputs."""
+
+    name = "near_duplicate"
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        max_distance: int = 8,
+        normalizer: Callable[[str], str] = normalize,
+        shingle_size: int = 4,
+        maxsize: int = 1024,
+    ) -> None:
+        """Initializes the NearDuplicateCache class.
+
+        Args:
+            threshold (float, optional): The minimum Jaccard similarity between the shingles
+                of two inputs to serve the cached output. Use a higher threshold for the
+                functions whose output changes with small edits. Defaults to 0.9.
+            max_distance (int, optional): The maximum Hamming distance between two SimHash
+                fingerprints for an entry to be a candidate. Defaults to 8.
+            normalizer (Callable[[str], str], optional): The function applied to the rendered
+                inputs before fingerprinting. Defaults to `normalize`.
+            shingle_size (int, optional): The number of characters in a shingle. Defaults to 4.
+            maxsize (int, optional): The maximum number of entries per function, the least
+                recently used entries are evicted first. Defaults to 1024.
+        """
+        assert 0 < threshold <= 1, "The threshold must be in (0, 1]."
+        _numpy()
+        self.threshold = threshold
+        self.max_distance = max_distance
+        self.normalizer = normalizer
+        self.shingle_size = shingle_size
+        self.maxsize = maxsize
+        self._scopes: Dict[str, _Scope] = {}
+        self._lock = threading.Lock()
+
+    def get(self, scope: str, text: str, default: Any = None) -> Any:  # noqa: ANN401
+        """Get the cached output of the most similar input within the threshold.
+
+        Args:
+            scope (str): The key of the static part of the prompt (function, model, etc.).
+            text (str): The rendered inputs of the call.
+            default (Any, optional): The value returned on a miss. Defaults to None.
+        """
+        key = self.normalizer(text)
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is None:
+                return default
+            if key in entries.entries:
+                entries.entries.move_to_end(key)
+                return entries.entries[key].value
+            snapshot = entries.snapshot()
+        # The search runs on the snapshot, without holding up the other calls
+        found = self._search(*snapshot, key)
+        if found is None:
+            return default
+        with self._lock:
+            entry = entries.entries.get(found)
+            if entry is None:  # Evicted in the meantime
+                return default
+            entries.entries.move_to_end(found)
+            return entry.value
+
+    def put(self, scope: str, text: str, value: Any) -> None:  # noqa: ANN401
+        """Cache the output of a call."""
+        key = self.normalizer(text)
+        features = shingles(key, self.shingle_size)
+        entry = _Entry(simhash(features), features, value)
+        with self._lock:
+            entries = self._scopes.setdefault(scope, _Scope())
+            entries.add(key, entry)
+            while len(entries.entries) > self.maxsize:
+                entries.evict()
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._scopes.clear()
+
+    def _search(
+        self,
+        keys: List[str],
+        candidates: List[FrozenSet[str]],
+        fingerprints: Any,  # noqa: ANN401
+        key: str,
+    ) -> Optional[str]:
+        """Find the key of the most similar row within the thresholds."""
+        np = _numpy()
+        features = shingles(key, self.shingle_size)
+        diff = fingerprints ^ np.uint64(simhash(features))
+        distances = np.unpackbits(diff.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+        best: Optional[str] = None
+        best_similarity = self.threshold
+        for index in np.flatnonzero(distances <= self.max_distance):
+            candidate = candidates[index]
+            similarity = len(features & candidate) / len(features | candidate)
+            if similarity >= best_similarity:
+                best, best_similarity = keys[index], similarity
+        return best
+
+
+def canonicalize(obj: Any) -> Any:  # noqa: ANN401
+    """Convert a value into a JSON-serializable form that is the same for equal values."""
+    if obj is None or isinstance(obj, (bool, str)):
+        return obj
+    if isinstance(obj, Enum):
+        return {"__enum__": f"{type(obj).__qualname__}.{obj.name}"}
+    if isinstance(obj, (int, float)):
+        return obj
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {
+            "__dataclass__": type(obj).__qualname__,
+            **{
+                f.name: canonicalize(getattr(obj, f.name))
+                for f in dataclasses.fields(obj)
+            },
+        }
+    if hasattr(obj, "model_dump") and not isinstance(obj, type):  # pydantic models
+        return {"__model__": type(obj).__qualname__, **canonicalize(obj.model_dump())}
+    if isinstance(obj, dict):
+        return {
+            "__dict__": sorted(
+                ([canonicalize(k), canonicalize(v)] for k, v in obj.items()),
+                key=_sort_key,
+            )
+        }
+    if isinstance(obj, (set, frozenset)):
+        return {"__set__": sorted((canonicalize(i) for i in obj), key=_sort_key)}
+    if isinstance(obj, tuple):
+        return {"__tuple__": [canonicalize(i) for i in obj]}
+    if isinstance(obj, list):
+        return [canonicalize(i) for i in obj]
+    if isinstance(obj, bytes):
+        return {"__bytes__": obj.hex()}
+    return {"__repr__": f"{type(obj).__qualname__}:{obj!r}"}
+
+
+def _sort_key(obj: Any) -> str:  # noqa: ANN401
+    """Get the sort key of a canonicalised value."""
+    return json.dumps(obj, sort_keys=True)
+
+
+def canonical_key(*parts: Any) -> str:  # noqa: ANN401
+    """Get the hash of the canonical form of the given values."""
+    data = json.dumps([canonicalize(p) for p in parts], sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    """Class to cache values by exact key for a limited time."""
+
+    name = "ttl"
+
+    def __init__(self, ttl: float = 300.0, maxsize: int = 1024) -> None:
+        """Initializes the TTLCache class.
+
+        Args:
+            ttl (float, optional): The number of seconds an entry is served. Defaults to 300.
+            maxsize (int, optional): The maximum number of entries, the least recently used
+                entries are evicted first. Defaults to 1024.
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:  # noqa: ANN401
+        """Get the value of a key, or the default if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Cache the value of a key."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Get the number of hits and misses, the hit rate and the number of entries."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,241 @@
+"""Circuit breaker around the requests to a provider.
+
+When a provider degrades, every call would otherwise wait out the full request timeout
+and then go through the retry loop. The circuit breaker tracks the errors and the slow
+requests over a sliding time window, and opens when their rate crosses a threshold: the
+requests then fail fast with `CircuitOpenError` (which is not retried), or are routed to
+a fallback model. After `open_duration` seconds the circuit is half-open and lets a few
+probe requests through; it closes if they succeed and opens again otherwise.
+
+Share one breaker between the LLMs of a provider to trip them together.
+
+Example:
+```python
+from semantix.circuit import CircuitBreaker
+
+breaker = CircuitBreaker("openai", failure_rate=0.5, fallback=backup_llm)
+llm.circuit_breaker = breaker
+print(breaker.state, breaker.stats())
+```
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, TYPE_CHECKING, Tuple, Type, TypeVar
+
+from semantix import metrics
+
+if TYPE_CHECKING:
+    from semantix.llms.base import BaseLLM
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Error raised when a request is rejected by an open circuit."""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        """Initializes the CircuitOpenError class.
+
+        Args:
+            name (str): The name of the circuit.
+            retry_after (float): The number of seconds before the circuit lets a probe
+                request through.
+        """
+        super().__init__(
+            f"Circuit {name!r} is open, retry after {retry_after:.1f} seconds."
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Class to fail fast the requests to a degraded provider."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_duration: Optional[float] = None,
+        slow_call_rate: float = 0.8,
+        window: float = 60.0,
+        min_calls: int = 10,
+        open_duration: float = 30.0,
+        half_open_calls: int = 1,
+        fallback: Optional["BaseLLM"] = None,
+        ignore: Tuple[Type[BaseException], ...] = (),
+    ) -> None:
+        """Initializes the CircuitBreaker class.
+
+        Args:
+            name (str): The name of the circuit, used in the errors and the metrics.
+            failure_rate (float, optional): The share of failed requests in the window that
+                opens the circuit. Defaults to 0.5.
+            slow_call_duration (float, optional): The duration in seconds above which a
+                request is slow. Defaults to None (the latency is not tracked).
+            slow_call_rate (float, optional): The share of slow requests in the window that
+                opens the circuit. Defaults to 0.8.
+            window (float, optional): The length of the sliding window, in seconds.
+                Defaults to 60.
+            min_calls (int, optional): The number of requests in the window before the
+                rates are evaluated. Defaults to 10.
+            open_duration (float, optional): The number of seconds the circuit stays open
+                before letting probe requests through. Defaults to 30.
+            half_open_calls (int, optional): The number of probe requests, which must all
+                succeed to close the circuit. Defaults to 1.
+            fallback (BaseLLM, optional): The model the calls are routed to while the
+                circuit is open. Defaults to None (the calls fail with `CircuitOpenError`).
+            ignore (Tuple[Type[BaseException], ...], optional): The errors that are not
+                failures of the provider (e.g. invalid requests). Defaults to ().
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self.fallback = fallback
+        self.ignore = ignore
+        self.rejected = 0
+        self.opened = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # time, failed, slow
+        self._lock = threading.Lock()
+        metrics.record_circuit_state(name, _STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        """Get the state of the circuit: "closed", "open" or "half_open"."""
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def stats(self) -> dict:
+        """Get the state of the circuit with the rates over the window."""
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            self._prune(now)
+            calls = len(self._calls)
+            failures = sum(failed for _, failed, _ in self._calls)
+            slow = sum(is_slow for _, _, is_slow in self._calls)
+            return {
+                "state": self._state,
+                "calls": calls,
+                "failure_rate": failures / calls if calls else 0.0,
+                "slow_call_rate": slow / calls if calls else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+    def reset(self) -> None:
+        """Close the circuit and forget the recorded requests."""
+        with self._lock:
+            self._calls.clear()
+            self._transition(CLOSED, time.monotonic())
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Run a request through the circuit.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with all the probe
+                requests in flight.
+        """
+        probe = self._acquire()
+        start = time.monotonic()
+        try:
+            result = fn()
+        except self.ignore:
+            self._release(probe)
+            raise
+        except BaseException:
+            self._record(probe, start, failed=True)
+            raise
+        self._record(probe, start, failed=False)
+        return result
+
+    def _transition(self, state: str, now: float) -> None:
+        """Change the state of the circuit."""
+        if state == OPEN:
+            self._opened_at = now
+            self.opened += 1
+        if state != self._state:
+            self._state = state
+            self._probes = self._probe_successes = 0
+            metrics.record_circuit_state(self.name, _STATE_VALUES[state])
+
+    def _refresh(self, now: float) -> None:
+        """Half-open the circuit once the open duration has elapsed."""
+        if self._state == OPEN and now - self._opened_at >= self.open_duration:
+            self._transition(HALF_OPEN, now)
+
+    def _prune(self, now: float) -> None:
+        """Drop the requests older than the window."""
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def _acquire(self) -> bool:
+        """Let a request through, returning whether it is a probe."""
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self._state == CLOSED:
+                return False
+            if self._state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            retry_after = max(self._opened_at + self.open_duration - now, 0.0)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def _release(self, probe: bool) -> None:
+        """Give back the slot of a probe request that did not test the provider."""
+        if probe:
+            with self._lock:
+                if self._state == HALF_OPEN:
+                    self._probes -= 1
+
+    def _record(self, probe: bool, start: float, failed: bool) -> None:
+        """Record the result of a request and update the state of the circuit."""
+        now = time.monotonic()
+        slow = (
+            self.slow_call_duration is not None
+            and now - start > self.slow_call_duration
+        )
+        with self._lock:
+            if probe:
+                if self._state != HALF_OPEN:
+                    return
+                if failed or slow:
+                    self._transition(OPEN, now)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._calls.clear()
+                    self._transition(CLOSED, now)
+                return
+            if self._state != CLOSED:
+                return
+            self._calls.append((now, failed, slow))
+            self._prune(now)
+            calls = len(self._calls)
+            if calls < self.min_calls:
+                return
+            failures = sum(f for _, f, _ in self._calls)
+            slow_calls = sum(s for _, _, s in self._calls)
+            if (
+                failures / calls >= self.failure_rate
+                or slow_calls / calls >= self.slow_call_rate
+            ):
+                self._transition(OPEN, now)
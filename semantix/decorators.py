@@ -1,18 +1,16 @@
 """Decorators for defining semantic types and tools."""
 
 import inspect
-from typing import Any, Callable, List, Literal, Union
-
-from semantix.inference import (
-    ExtractOutputPromptInfo,
-    InferenceEngine,
-    OutputFixPromptInfo,
-    PromptInfo,
-)
+from typing import Callable, List, Literal, Optional, TYPE_CHECKING, Union
+
+from semantix.inference import EnhancedFunction
 from semantix.llms.base import BaseLLM
-from semantix.types.prompt import Information, OutputHint, Tool, TypeExplanation
-from semantix.types.semantic import Semantic
-from semantix.utils.utils import get_semstr
+from semantix.types.prompt import Tool
+from semantix.utils.namespace import Namespace
+
+if TYPE_CHECKING:
+    from semantix.cache import NearDuplicateCache, TTLCache
+    from semantix.types.media import MediaPool
 
 
 def enhance(
@@ -23,6 +21,18 @@ def enhance(
     tools: List[Union[Callable, Tool]] = [],
     retries: int = 2,
     return_additional_info: bool = False,
+    batch_size: int = 1,
+    batch_window_ms: float = 10,
+    coalesce: bool = False,
+    cache: Optional["NearDuplicateCache"] = None,
+    structured_output: bool = False,
+    candidates: int = 1,
+    media_pool: Optional["MediaPool"] = None,
+    max_steps: int = 5,
+    step_timeout: Optional[float] = None,
+    compact_prompt: bool = False,
+    field_docs: bool = True,
+    enum_indices: bool = False,
     **kwargs: dict,
 ) -> Callable:
     """Convert a function into a semantic function with enhanced LLM capabilities.
@@ -35,6 +45,18 @@ def enhance(
         tools (List[Union[Callable, Tool]], optional): A list of functions or Tool objects that the LLM can use. Defaults to [].
         retries (int, optional): The number of retry attempts for LLM operations. Defaults to 2.
         return_additional_info (bool, optional): Whether to return the output and additional information. Defaults to False.
+        batch_size (int, optional): The maximum number of concurrent calls packed into one LLM request. Defaults to 1 (no batching).
+        batch_window_ms (float, optional): How long a call waits for other calls to join its batch. Defaults to 10.
+        coalesce (bool, optional): Whether identical concurrent calls share a single LLM request. Defaults to False.
+        cache (NearDuplicateCache, optional): The cache serving the outputs of calls with near-duplicate inputs. Defaults to None.
+        structured_output (bool, optional): Whether the model answers with JSON matching the schema of the return type, using the native structured output of the provider when available. Defaults to False.
+        candidates (int, optional): The number of candidate outputs sampled concurrently. The first one that parses and validates is returned. Defaults to 1.
+        media_pool (MediaPool, optional): The process pool preparing the images and videos of the inputs ahead of the requests. Defaults to None.
+        max_steps (int, optional): The maximum number of tool calling steps of the ReAct method, after which the model is asked for the output. Defaults to 5.
+        step_timeout (float, optional): The number of seconds a ReAct step waits for its tool calls, which run concurrently. Defaults to None (no timeout).
+        compact_prompt (bool, optional): Whether the type definitions and the inputs are written in a compact form, with fewer tokens. Defaults to False.
+        field_docs (bool, optional): Whether the meaning of the fields is given in the compact type definitions. Defaults to True.
+        enum_indices (bool, optional): Whether the Enum members of the output are numbered in the prompt and written as their index by the model. Defaults to False.
         **kwargs (dict): Additional keyword arguments to be passed to the LLM.
 
     Returns:
@@ -69,84 +91,45 @@ def enhance(
         raise Exception(
             "Cannot get the previous frame."
         )  # Don't know whether this will happen
+    namespace = Namespace.from_frame(frame)
+    del frame, curr_frame
     model_params = kwargs
 
     def decorator(func: Callable) -> Callable:
-        def wrapper(**kwargs: dict) -> Any:  # noqa
-            informations = []
-            for i in info:
-                var_name, meaning = get_semstr(frame, i)
-                informations.append(Information(meaning, var_name, i))
-            _tools = [tool if isinstance(tool, Tool) else Tool(tool) for tool in tools]
-            _tools = [tool if isinstance(tool, Tool) else Tool(tool) for tool in tools]
-            input_informations = []
-            return_hint: OutputHint
-            for param, annotation in func.__annotations__.items():
-                if isinstance(annotation, type) and issubclass(annotation, Semantic):
-                    if param == "return":
-                        return_hint = OutputHint(
-                            annotation._meaning, annotation.wrapped_type
-                        )
-                        continue
-                    input_informations.append(
-                        Information(annotation._meaning, param, kwargs[param])
-                    )
-                else:
-                    if param == "return":
-                        return_hint = OutputHint("", annotation)
-                        continue
-                    input_informations.append(Information("", param, kwargs[param]))
-            assert (
-                return_hint
-            ), "Return type is not defined. Please define the return type."
-            action = f"{meaning} ({func.__name__})"
-            context = func.__doc__ if func.__doc__ else ""
-
-            types = set()
-            for i in [
-                *informations,
-                *input_informations,
-                return_hint if return_hint else [],
-            ]:
-                types.update(i.get_types())  # type: ignore
-            type_explanations = [TypeExplanation(frame, t) for t in types]
-            for t in type_explanations:
-                types.update(t.get_nested_types())
-            type_explanations = [TypeExplanation(frame, t) for t in types]
-
-            inference_engine = InferenceEngine(
-                model=model,
-                method=method,
-                prompt_info=PromptInfo(
-                    action=action,
-                    context=context,
-                    informations=informations,
-                    input_informations=input_informations,
-                    tools=_tools,
-                    return_hint=return_hint,
-                    type_explanations=type_explanations,
-                ),
-                extract_output_prompt_info=ExtractOutputPromptInfo(
-                    return_hint=return_hint, type_explanations=type_explanations
-                ),
-                output_fix_prompt_info=OutputFixPromptInfo(
-                    return_hint=return_hint,
-                    type_explanations=type_explanations,
-                ),
-                model_params=model_params,
-            )
-            return inference_engine.run(frame, retries + 1, return_additional_info)
-
-        return wrapper
+        return EnhancedFunction(
+            func=func,
+            namespace=namespace,
+            model=model,
+            meaning=meaning,
+            info=info,
+            method=method,
+            tools=tools,
+            retries=retries,
+            return_additional_info=return_additional_info,
+            model_params=model_params,
+            batch_size=batch_size,
+            batch_window_ms=batch_window_ms,
+            coalesce=coalesce,
+            cache=cache,
+            structured_output=structured_output,
+            candidates=candidates,
+            media_pool=media_pool,
+            max_steps=max_steps,
+            step_timeout=step_timeout,
+            compact_prompt=compact_prompt,
+            field_docs=field_docs,
+            enum_indices=enum_indices,
+        )
 
     return decorator
 
 
-def tool(meaning: str) -> Callable:
+def tool(meaning: str, cache: Optional["TTLCache"] = None) -> Callable:
     """Converts a function into a tool.
 
     Args:
         meaning (str): A description of the tool's purpose or intended behavior.
+        cache (TTLCache, optional): The cache memoising the results of the tool by their arguments. Defaults to None.
 
     Returns:
         Callable: A wrapped version of the original function as a Tool object.
@@ -160,10 +143,18 @@ def tool(meaning: str) -> Callable:
         # Implementation
     ```
 
+    Calls with equal arguments (dataclasses and Enums included) are served from the cache
+    until they expire, and identical concurrent calls share a single execution:
+    ```python
+    @tool("Search the web", cache=TTLCache(ttl=600))
+    def search(query: str) -> List[str]:
+        # Implementation
+    ```
+
     For more information on how to use tools with the LLM, please refer to the documentation.
     """
 
     def decorator(func: Callable) -> Tool:
-        return Tool(func, meaning)
+        return Tool(func, meaning, cache)
 
     return decorator
@@ -0,0 +1,227 @@
+"""Hedged requests, to cut the tail latency of the providers.
+
+When a request has not completed after a high percentile of the recent latencies of its
+model, a duplicate request is sent to the same model (or to an alternate one) and the
+first response wins. The latencies are tracked online per model, in HDR-style histograms
+rotated every `window` requests so that the percentile follows the provider.
+
+Hedging costs the tokens of the duplicate requests, so the share of hedged requests is
+capped by `max_rate`. Every request of a hedged model runs in a thread of its own, so
+the delay before hedging is never spent waiting for a worker and the requests in flight
+are not capped. The provider SDKs cannot interrupt a request in flight, so the losing
+request runs to completion in the background and its response is discarded.
+
+Example:
+```python
+from semantix.hedging import HedgePolicy
+
+llm.hedge = HedgePolicy(percentile=0.95, max_rate=0.05)
+```
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+from semantix import metrics
+
+if TYPE_CHECKING:
+    from semantix.llms.base import BaseLLM
+
+
+class LatencyTracker:
+    """Class to track the recent latency percentiles of a model."""
+
+    def __init__(self, window: int = 1000) -> None:
+        """Initializes the LatencyTracker class.
+
+        Args:
+            window (int, optional): The number of requests after which the histogram is
+                rotated. The percentiles are computed over the last one to two windows.
+                Defaults to 1000.
+        """
+        self.window = window
+        self._current = metrics.HdrHistogram()
+        self._previous: Optional[metrics.HdrHistogram] = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """Record the latency of a request, in seconds."""
+        with self._lock:
+            if self._count >= self.window:
+                self._previous, self._current = self._current, metrics.HdrHistogram()
+                self._count = 0
+            self._count += 1
+            current = self._current
+        current.record(latency)
+
+    @property
+    def count(self) -> int:
+        """Get the number of latencies the percentiles are computed over."""
+        with self._lock:
+            return self._count + (self.window if self._previous is not None else 0)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Get the latency at the given quantile, between 0 and 1, None if no data."""
+        with self._lock:
+            current, previous, count = self._current, self._previous, self._count
+        if previous is not None and count < self.window // 2:
+            return previous.quantile(q)
+        return current.quantile(q)
+
+
+class HedgePolicy:
+    """Class to hedge the slow requests of a model with a duplicate request."""
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        alternate: Optional["BaseLLM"] = None,
+        max_rate: float = 0.1,
+        min_samples: int = 20,
+        min_delay: float = 0.0,
+        window: int = 1000,
+    ) -> None:
+        """Initializes the HedgePolicy class.
+
+        Args:
+            percentile (float, optional): The latency percentile, between 0 and 1, after
+                which a request is hedged. Defaults to 0.95.
+            alternate (BaseLLM, optional): The model the duplicate requests are sent to. It
+                receives the same messages and request parameters, so it must be of the
+                same provider. Defaults to the model of the request.
+            max_rate (float, optional): The maximum share of the requests that are hedged,
+                bounding the extra spend. Defaults to 0.1.
+            min_samples (int, optional): The number of latencies to record before hedging
+                the requests of a model. Defaults to 20.
+            min_delay (float, optional): The minimum delay before hedging, in seconds.
+                Defaults to 0.
+            window (int, optional): The number of requests the percentile is tracked over.
+                Defaults to 1000.
+        """
+        assert 0 < percentile < 1, "The percentile must be between 0 and 1."
+        self.percentile = percentile
+        self.alternate = alternate
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.window = window
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+    def tracker(self, model: str) -> LatencyTracker:
+        """Get the latency tracker of a model."""
+        with self._lock:
+            tracker = self._trackers.get(model)
+            if tracker is None:
+                tracker = self._trackers[model] = LatencyTracker(self.window)
+            return tracker
+
+    def delay(self, model: str) -> Optional[float]:
+        """Get the delay after which a request to a model is hedged, None to not hedge."""
+        tracker = self.tracker(model)
+        if tracker.count < self.min_samples:
+            return None
+        latency = tracker.quantile(self.percentile)
+        return None if latency is None else max(latency, self.min_delay)
+
+    def stats(self) -> dict:
+        """Get the hedging statistics, with the tracked percentile of every model."""
+        with self._lock:
+            trackers = dict(self._trackers)
+            stats: Dict[str, Any] = {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+            }
+        stats["latency"] = {
+            model: tracker.quantile(self.percentile)
+            for model, tracker in trackers.items()
+        }
+        return stats
+
+    def _acquire(self) -> bool:
+        """Reserve a hedge if the hedge rate allows it."""
+        with self._lock:
+            if self.hedged + 1 > self.max_rate * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def _submit(self, model: "BaseLLM", fn: Callable[[], str]) -> Future:
+        """Send a request in a new thread, recording its latency when it succeeds.
+
+        A thread per request rather than a shared pool: a request queued for a worker
+        would spend its hedge delay waiting and fire a needless hedge.
+        """
+        tracker = self.tracker(model.model_name)
+        context = contextvars.copy_context()
+        future: Future = Future()
+
+        def request() -> None:
+            if not future.set_running_or_notify_cancel():
+                return
+            start = time.perf_counter()
+            try:
+                result = context.run(fn)
+            except Exception as e:
+                future.set_exception(e)
+                return
+            tracker.record(time.perf_counter() - start)
+            future.set_result(result)
+
+        threading.Thread(target=request, name="semantix-hedge", daemon=True).start()
+        return future
+
+    def run(
+        self,
+        model: "BaseLLM",
+        send: Callable[["BaseLLM"], str],
+    ) -> str:
+        """Send a request, hedging it if it is slower than the tracked percentile.
+
+        Args:
+            model (BaseLLM): The model of the request.
+            send (Callable[[BaseLLM], str]): Sends the request to the given model and returns
+                the response.
+
+        Returns:
+            str: The first response.
+        """
+        with self._lock:
+            self.requests += 1
+        delay = self.delay(model.model_name)
+        if delay is None:
+            start = time.perf_counter()
+            result = send(model)
+            self.tracker(model.model_name).record(time.perf_counter() - start)
+            return result
+        primary = self._submit(model, lambda: send(model))
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._acquire():
+            return primary.result()
+        alternate = self.alternate or model
+        hedge = self._submit(alternate, lambda: send(alternate))
+        pending: List[Future] = [primary, hedge]
+        while True:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                if future.exception() is not None and pending:
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                won = future is hedge and future.exception() is None
+                if won:
+                    with self._lock:
+                        self.hedge_wins += 1
+                metrics.record_hedge(alternate.model_name, won)
+                if future.exception() is not None:
+                    return primary.result()  # Both failed, raise the original error
+                return future.result()
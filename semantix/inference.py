@@ -1,15 +1,63 @@
 """Inference engine for running the model and generating prompts."""
 
-from types import FrameType
-from typing import Any, List, TYPE_CHECKING
+import functools
+import hashlib
+import json
+import time
+import typing
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Generator,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    TYPE_CHECKING,
+    Tuple,
+    Union,
+)
 
 from loguru import logger
 
+from semantix import metrics, profiler
+from semantix.batching import MicroBatcher
+from semantix.circuit import CircuitOpenError
+from semantix.session import current_session
+from semantix.singleflight import SingleFlight
+from semantix.streaming import (
+    BlockDelta,
+    BlockEvents,
+    FinalOutput,
+    ListElement,
+    ListElementScanner,
+    StreamEvent,
+    iterate_in_thread,
+)
 from semantix.types.prompt import Information, OutputHint, Tool, TypeExplanation
-from semantix.types.semantic import Output
+from semantix.types.semantic import Output, Semantic
+from semantix.utils.namespace import Namespace
+from semantix.utils.schema import compile_output_schema
+from semantix.utils.validation import decode_enum_indices, validate_output
 
 if TYPE_CHECKING:
+    from semantix.cache import NearDuplicateCache
     from semantix.llms.base import BaseLLM
+    from semantix.types.media import MediaPool
+
+_MISS = object()
+
+
+def list_element_type(annotation: Any) -> Any:  # noqa: ANN401
+    """Get the type of the elements of a list type, None if the type is not a list."""
+    if isinstance(annotation, type) and issubclass(annotation, Semantic):
+        annotation = annotation.wrapped_type
+    if annotation is list:
+        return Any
+    if typing.get_origin(annotation) is list:
+        return next(iter(typing.get_args(annotation)), Any)
+    return None
 
 
 class PromptInfo:
@@ -36,15 +84,37 @@ class PromptInfo:
 
     def get_messages(self, model: "BaseLLM") -> List["BaseLLM.Message"]:
         """Get the messages for the prompt."""
+        messages = self.get_static_messages(model)
+        messages.extend(self.get_input_messages(model))
+        messages.extend(self.get_information_messages(model))
+        return messages
+
+    def get_static_messages(self, model: "BaseLLM") -> List["BaseLLM.Message"]:
+        """Get the messages that do not depend on the inputs of the call."""
         messages = [model.get_system_message()] if model.SYSTEM_PROMPT else []
-        messages.append(
+        messages.extend(self.get_goal_messages(model))
+        if self.type_explanations:
+            messages.append(
+                model.Message(
+                    model.SYSTEM_ROLE,
+                    model.Message.Content(
+                        [str(t) for t in self.type_explanations],
+                        model.get_message_desc("type_explanations"),
+                    ),
+                )
+            )
+        return messages
+
+    def get_goal_messages(self, model: "BaseLLM") -> List["BaseLLM.Message"]:
+        """Get the messages with the goal, the context, the output type and the tools."""
+        messages = [
             model.Message(
                 model.SYSTEM_ROLE,
                 model.Message.Content(
                     [f"{model.get_message_desc('action')} {self.action}"]
                 ),
             )
-        )
+        ]
         if self.context:
             messages.append(
                 model.Message(
@@ -71,26 +141,27 @@ class PromptInfo:
                     ),
                 )
             )
-        if self.type_explanations:
-            messages.append(
-                model.Message(
-                    model.SYSTEM_ROLE,
-                    model.Message.Content(
-                        [str(t) for t in self.type_explanations],
-                        model.get_message_desc("type_explanations"),
-                    ),
-                )
-            )
-        if self.input_informations:
-            messages.append(
-                model.Message(
-                    model.USER_ROLE,
-                    model.Message.Content(
-                        self.input_informations,  # type: ignore
-                        model.get_message_desc("input_informations"),
-                    ),
-                )
+        return messages
+
+    def get_input_messages(
+        self, model: "BaseLLM", desc: str = ""
+    ) -> List["BaseLLM.Message"]:
+        """Get the messages with the inputs of the call."""
+        if not self.input_informations:
+            return []
+        return [
+            model.Message(
+                model.USER_ROLE,
+                model.Message.Content(
+                    self.input_informations,  # type: ignore
+                    desc or model.get_message_desc("input_informations"),
+                ),
             )
+        ]
+
+    def get_information_messages(self, model: "BaseLLM") -> List["BaseLLM.Message"]:
+        """Get the messages with the additional information."""
+        messages = []
         if self.informations:
             messages.append(
                 model.Message(
@@ -220,40 +291,510 @@ class InferenceEngine:
         extract_output_prompt_info: ExtractOutputPromptInfo,
         output_fix_prompt_info: OutputFixPromptInfo,
         model_params: dict,
+        name: str = "",
+        structured: bool = False,
+        candidates: int = 1,
+        max_steps: int = 5,
+        step_timeout: Optional[float] = None,
     ) -> None:
         """Initializes the InferenceEngine class."""
+        self.name = name
+        self.structured = structured
+        self.candidates = candidates
+        self.max_steps = max_steps
+        self.step_timeout = step_timeout
         self.model = model
         self.method = method
         self.prompt_info = prompt_info
         self.extract_output_prompt_info = extract_output_prompt_info
         self.output_fix_prompt_info = output_fix_prompt_info
         self.model_params = model_params
+        self._messages: Optional[List["BaseLLM.Message"]] = None
+        self._schema: Optional[Tuple[dict, bool]] = None
+        self.output = ""
+
+    def output_schema(self) -> Tuple[dict, bool]:
+        """Get the JSON Schema of the response in the structured output mode."""
+        if self._schema is None:
+            with profiler.span("prompt"):
+                self._schema = compile_output_schema(
+                    self.prompt_info.return_hint.annotation,
+                    self.model.method_sections(self.method),
+                )
+        return self._schema
+
+    def method_message(self) -> "BaseLLM.Message":
+        """Get the message with the method instructions."""
+        if self.structured:
+            return self.model.structured_method_message(self.output_schema()[0])
+        return self.model.method_message(self.method)
+
+    def request_params(self) -> dict:
+        """Get the parameters of the request."""
+        if self.structured:
+            return {
+                **self.model_params,
+                **self.model.structured_params(*self.output_schema()),
+            }
+        return self.model_params
+
+    def get_messages(self) -> List["BaseLLM.Message"]:
+        """Get the messages of the request, including the method instructions."""
+        if self._messages is None:
+            with profiler.span("prompt"):
+                messages = self.prompt_info.get_messages(self.model)
+                messages.append(self.method_message())
+            self._messages = messages
+        return list(self._messages)
+
+    def set_messages(self, messages: List["BaseLLM.Message"]) -> None:
+        """Set the messages of the request, e.g. on top of the history of a session."""
+        self._messages = list(messages)
+
+    def request_key(self) -> str:
+        """Get the canonical hash of the request (model, parameters and rendered messages)."""
+        return self._hash(self.get_messages())
+
+    def scope_key(self) -> str:
+        """Get the canonical hash of the request without the inputs of the call."""
+        with profiler.span("prompt"):
+            messages = self.prompt_info.get_static_messages(self.model)
+            messages.extend(self.prompt_info.get_information_messages(self.model))
+            messages.append(self.method_message())
+        return self._hash(messages)
+
+    def _hash(self, messages: List["BaseLLM.Message"]) -> str:
+        """Hash the model, the parameters and the given messages."""
+        request = {
+            "model": [self.model.__class__.__name__, self.model.model_name],
+            "params": self.request_params(),
+            "messages": [[m.role, str(m)] for m in messages],
+        }
+        data = json.dumps(request, sort_keys=True, default=repr)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def with_model(self, model: "BaseLLM") -> "InferenceEngine":
+        """Get a copy of the inference engine running with another model."""
+        return InferenceEngine(
+            model=model,
+            method=self.method,
+            prompt_info=self.prompt_info,
+            extract_output_prompt_info=self.extract_output_prompt_info,
+            output_fix_prompt_info=self.output_fix_prompt_info,
+            model_params=self.model_params,
+            name=self.name,
+            structured=self.structured,
+            candidates=self.candidates,
+            max_steps=self.max_steps,
+            step_timeout=self.step_timeout,
+        )
+
+    def resolve(
+        self,
+        model_output: str,
+        _globals: dict,
+        _locals: Mapping[str, Any],
+        local_only: bool = False,
+    ) -> dict:
+        """Resolve the output of the model into the output sections and the object.
+
+        The output of the model is kept in `output`.
+        """
+        self.output = model_output
+        resolve_output = (
+            self.model.resolve_structured_output
+            if self.structured
+            else self.model.resolve_output
+        )
+        return resolve_output(
+            model_output,
+            self.extract_output_prompt_info,
+            self.output_fix_prompt_info,
+            _globals,
+            _locals,
+            local_only,
+        )
+
+    def stream(
+        self, namespace: Namespace, return_additional_info: bool
+    ) -> Generator[StreamEvent, None, None]:
+        """Run the inference engine, yielding the events of the streamed response.
+
+        The elements of a list output are parsed from the output block as it is streamed,
+        until one fails to parse, and the remaining ones are taken from the final output.
+        """
+        if self.candidates > 1 or self.method == "ReAct":
+            raise ValueError(
+                "Streaming does not support candidate sampling or the ReAct method."
+            )
+        element_type = (
+            None
+            if self.structured
+            else list_element_type(self.prompt_info.return_hint.annotation)
+        )
+        scanner = ListElementScanner() if element_type is not None else None
+        elements: List[Any] = []
+
+        def with_elements(events: List[StreamEvent]) -> Iterator[StreamEvent]:
+            for event in events:
+                yield event
+                if (
+                    scanner is None
+                    or scanner.done
+                    or not isinstance(event, BlockDelta)
+                    or event.name != "output"
+                ):
+                    continue
+                for source in scanner.feed(event.text):
+                    try:
+                        value = self._parse_element(source, element_type, namespace)
+                    except Exception:
+                        scanner.done = True
+                        break
+                    elements.append(value)
+                    yield ListElement(len(elements) - 1, value)
+
+        block_events = BlockEvents()
+        chunks = []
+        for chunk in self.model.stream(self.get_messages(), self.request_params()):
+            chunks.append(chunk)
+            with profiler.span("parse"):
+                new_events = block_events.feed(chunk)
+            yield from with_elements(new_events)
+        yield from with_elements(block_events.close())
+        model_output = self.resolve(
+            "".join(chunks), namespace.globals, namespace.locals
+        )
+        output = Output(**model_output)
+        if element_type is not None and isinstance(output.output, list):
+            for index in range(len(elements), len(output.output)):
+                yield ListElement(index, output.output[index])
+        yield FinalOutput(output if return_additional_info else output.output)
+
+    def _parse_element(
+        self, source: str, element_type: Any, namespace: Namespace  # noqa: ANN401
+    ) -> Any:  # noqa: ANN401
+        """Parse and validate an element of a list output."""
+        with profiler.span("eval"):
+            obj = eval(source, namespace.globals, namespace.locals)
+        with profiler.span("validation"):
+            if self.prompt_info.return_hint.enum_indices:
+                obj = decode_enum_indices(obj, element_type)
+            return validate_output(obj, element_type)
 
     def run(
-        self, frame: FrameType, retries: int, return_additional_info: bool
+        self, namespace: Namespace, retries: int, return_additional_info: bool
     ) -> Any:  # noqa: ANN401
         """Run the inference engine."""
-        messages = self.prompt_info.get_messages(self.model)
-        messages.append(self.model.method_message(self.method))
-        _locals = frame.f_locals
-        _globals = frame.f_globals
+        _globals, _locals = namespace.globals, namespace.locals
         for i in range(retries + 1):
-            model_output_str = self.model(messages, self.model_params)
             try:
-                model_output = self.model.resolve_output(
-                    model_output_str,
-                    self.extract_output_prompt_info,
-                    self.output_fix_prompt_info,
-                    _globals,
-                    _locals,
-                )
+                model_output = self.model.run_engine(self, _globals, _locals)
                 output = Output(**model_output)
                 if return_additional_info:
                     return output
                 return output.output
+            except CircuitOpenError:
+                raise
             except Exception as e:
-                if self.model.verbose and i < retries:
-                    err_msg = f"Error encountered: {e}. Retrying... ({i+1}/{retries})"
-                    logger.exception(err_msg)
+                if i < retries:
+                    metrics.record_retry(e)
+                    if self.model.verbose:
+                        err_msg = (
+                            f"Error encountered: {e}. Retrying... ({i+1}/{retries})"
+                        )
+                        logger.exception(err_msg)
         else:
             raise Exception(f"Failed to perform the operation after {retries} retries.")
+
+
+class EnhancedFunction:
+    """Class to represent a function enhanced with LLM capabilities.
+
+    Created by the `enhance` decorators. Calling it builds the prompt from the keyword
+    arguments and runs the inference engine.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        namespace: Namespace,
+        model: "BaseLLM",
+        meaning: str,
+        info: list,
+        method: str,
+        tools: List[Union[Callable, Tool]],
+        retries: int,
+        return_additional_info: bool,
+        model_params: dict,
+        batch_size: int = 1,
+        batch_window_ms: float = 10,
+        coalesce: bool = False,
+        cache: Optional["NearDuplicateCache"] = None,
+        structured_output: bool = False,
+        candidates: int = 1,
+        media_pool: Optional["MediaPool"] = None,
+        max_steps: int = 5,
+        step_timeout: Optional[float] = None,
+        compact_prompt: bool = False,
+        field_docs: bool = True,
+        enum_indices: bool = False,
+    ) -> None:
+        """Initializes the EnhancedFunction class."""
+        if structured_output and enum_indices:
+            raise ValueError("The structured output does not support Enum indices.")
+        if structured_output and batch_size > 1:
+            raise ValueError("Micro-batching does not support the structured output.")
+        if candidates > 1 and batch_size > 1:
+            raise ValueError("Micro-batching does not support candidate sampling.")
+        if method == "ReAct" and (
+            structured_output or candidates > 1 or batch_size > 1
+        ):
+            raise ValueError(
+                "The ReAct method does not support the structured output, candidate "
+                "sampling or micro-batching."
+            )
+        self.func = func
+        self.namespace = namespace
+        self._informations: Optional[List[Information]] = None
+        self.model = model
+        self.meaning = meaning
+        self.info = info
+        self.method = method
+        self.tools = tools
+        self.retries = retries
+        self.return_additional_info = return_additional_info
+        self.model_params = model_params
+        self.batcher = (
+            MicroBatcher(self, batch_size, batch_window_ms) if batch_size > 1 else None
+        )
+        self.single_flight = SingleFlight() if coalesce else None
+        self.cache = cache
+        self.structured_output = structured_output
+        self.candidates = candidates
+        self.media_pool = media_pool
+        self.max_steps = max_steps
+        self.step_timeout = step_timeout
+        self.compact_prompt = compact_prompt
+        self.field_docs = field_docs
+        self.enum_indices = enum_indices
+        functools.update_wrapper(self, func)
+
+    def get_informations(self) -> List[Information]:
+        """Get the informations given to the function, resolved once from the namespace."""
+        if self._informations is None:
+            informations = []
+            for i in self.info:
+                var_name, semstr = self.namespace.get_semstr(i)
+                informations.append(
+                    Information(semstr, var_name, i, self.compact_prompt)
+                )
+            self._informations = informations
+        return self._informations
+
+    def build_engine(self, **kwargs: Any) -> InferenceEngine:  # noqa: ANN401
+        """Build the inference engine for a call with the given keyword arguments."""
+        func = self.func
+        informations = self.get_informations()
+        _tools = [tool if isinstance(tool, Tool) else Tool(tool) for tool in self.tools]
+        input_informations = []
+        return_hint: OutputHint
+        for param, annotation in func.__annotations__.items():
+            if isinstance(annotation, type) and issubclass(annotation, Semantic):
+                if param == "return":
+                    return_hint = OutputHint(
+                        annotation._meaning, annotation.wrapped_type, self.enum_indices
+                    )
+                    continue
+                input_informations.append(
+                    Information(
+                        annotation._meaning, param, kwargs[param], self.compact_prompt
+                    )
+                )
+            else:
+                if param == "return":
+                    return_hint = OutputHint("", annotation, self.enum_indices)
+                    continue
+                input_informations.append(
+                    Information("", param, kwargs[param], self.compact_prompt)
+                )
+        assert return_hint, "Return type is not defined. Please define the return type."
+        if self.media_pool is not None:
+            self.media_pool.prepare(i.value for i in input_informations)
+        action = f"{self.meaning} ({func.__name__})"
+        context = func.__doc__ if func.__doc__ else ""
+
+        with profiler.span("type_explanation"):
+            type_explanations = self._get_type_explanations(
+                informations, input_informations, return_hint
+            )
+
+        return InferenceEngine(
+            model=self.model,
+            method=self.method,
+            prompt_info=PromptInfo(
+                action=action,
+                context=context,
+                informations=informations,
+                input_informations=input_informations,
+                tools=_tools,
+                return_hint=return_hint,
+                type_explanations=type_explanations,
+            ),
+            extract_output_prompt_info=ExtractOutputPromptInfo(
+                return_hint=return_hint, type_explanations=type_explanations
+            ),
+            output_fix_prompt_info=OutputFixPromptInfo(
+                return_hint=return_hint,
+                type_explanations=type_explanations,
+            ),
+            model_params=self.model_params,
+            name=func.__name__,
+            structured=self.structured_output,
+            candidates=self.candidates,
+            max_steps=self.max_steps,
+            step_timeout=self.step_timeout,
+        )
+
+    def _get_type_explanations(
+        self,
+        informations: List[Information],
+        input_informations: List[Information],
+        return_hint: OutputHint,
+    ) -> List[TypeExplanation]:
+        """Get the explanations of the types used in the inputs and the output."""
+        types = set()
+        for i in [*informations, *input_informations, return_hint]:
+            types.update(i.get_types())  # type: ignore
+        type_explanations = [TypeExplanation(self.namespace, t) for t in types]
+        for t in type_explanations:
+            types.update(t.get_nested_types())
+        return [
+            TypeExplanation(
+                self.namespace,
+                t,
+                self.compact_prompt,
+                self.field_docs,
+                self.enum_indices,
+            )
+            for t in types
+        ]
+
+    def run(self, **kwargs: Any) -> Any:  # noqa: ANN401
+        """Run a single call of the enhanced function, without batching."""
+        with profiler.span("prompt"):
+            inference_engine = self.build_engine(**kwargs)
+        return self._run_engine(inference_engine)
+
+    def _run_engine(self, inference_engine: InferenceEngine) -> Any:  # noqa: ANN401
+        """Run the inference engine of a call."""
+        return inference_engine.run(
+            self.namespace, self.retries + 1, self.return_additional_info
+        )
+
+    def stream(self, **kwargs: Any) -> Iterator[StreamEvent]:  # noqa: ANN401
+        """Run the enhanced function, yielding the blocks of the response as they are generated.
+
+        The call is sent by itself, without batching, coalescing, caching nor retries. See
+        `semantix.streaming` for the events.
+        """
+        name, model = self.func.__name__, self.model.model_name
+        # Only held around each read, as the consumer may leave the generator at any yield
+        call_span = profiler.StepSpan(profiler.CALL, name)
+        metrics.start_call(name, model)
+        start = time.perf_counter()
+        error: Optional[BaseException] = None
+        events: Optional[Generator[StreamEvent, None, None]] = None
+        try:
+            with metrics.call_labels(name, model), call_span.step():
+                with profiler.span("prompt"):
+                    inference_engine = self.build_engine(**kwargs)
+                events = inference_engine.stream(
+                    self.namespace, self.return_additional_info
+                )
+            while True:
+                with metrics.call_labels(name, model), call_span.step():
+                    event = next(events, None)
+                if event is None:
+                    break
+                yield event
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if events is not None:
+                events.close()
+            call_span.finish()
+            metrics.finish_call(name, model, time.perf_counter() - start, error)
+
+    def astream(self, **kwargs: Any) -> AsyncIterator[StreamEvent]:  # noqa: ANN401
+        """Run the enhanced function, yielding the events of `stream` asynchronously.
+
+        The streamed request runs in a worker thread, so it does not block the event loop.
+        """
+        return iterate_in_thread(lambda: self.stream(**kwargs))
+
+    def stream_elements(self, **kwargs: Any) -> Iterator[Any]:  # noqa: ANN401
+        """Run an enhanced function returning a list, yielding the elements as they are generated.
+
+        Raises:
+            ValueError: If the return type is not a list.
+        """
+        if list_element_type(self.func.__annotations__.get("return")) is None:
+            raise ValueError("The return type is not a list.")
+        for event in self.stream(**kwargs):
+            if isinstance(event, ListElement):
+                yield event.value
+
+    def astream_elements(self, **kwargs: Any) -> AsyncIterator[Any]:  # noqa: ANN401
+        """Run an enhanced function returning a list, yielding the elements asynchronously."""
+        return iterate_in_thread(lambda: self.stream_elements(**kwargs))
+
+    def __call__(self, **kwargs: Any) -> Any:  # noqa: ANN401
+        """Run the enhanced function with the given keyword arguments."""
+        name = self.func.__name__
+        with metrics.track_call(name, self.model.model_name), profiler.span(
+            profiler.CALL, name
+        ):
+            session = current_session()
+            if session is not None:
+                return session.run(self, **kwargs)
+            with profiler.span("prompt"):
+                inference_engine = self.build_engine(**kwargs)
+            if self.cache is not None:
+                return self._cached_call(inference_engine)
+            return self._dispatch(inference_engine)
+
+    def _dispatch(self, inference_engine: InferenceEngine) -> Any:  # noqa: ANN401
+        """Run the call by itself, coalesced or as part of a batch."""
+        if self.single_flight is not None:
+            return self._coalesced_call(inference_engine)
+        if self.batcher:
+            return self.batcher.submit(inference_engine)
+        return self._run_engine(inference_engine)
+
+    def _cached_call(self, inference_engine: InferenceEngine) -> Any:  # noqa: ANN401
+        """Serve the call from the cache, or run it and cache its output."""
+        assert self.cache is not None
+        scope = inference_engine.scope_key()
+        text = "\n".join(
+            str(i) for i in inference_engine.prompt_info.input_informations
+        )
+        with profiler.span("cache"):
+            output = self.cache.get(scope, text, _MISS)
+        metrics.record_cache(self.cache.name, output is not _MISS)
+        if output is not _MISS:
+            return output
+        output = self._dispatch(inference_engine)
+        with profiler.span("cache"):
+            self.cache.put(scope, text, output)
+        return output
+
+    def _coalesced_call(self, inference_engine: InferenceEngine) -> Any:  # noqa: ANN401
+        """Run the call, or wait for an identical call already in flight."""
+        assert self.single_flight is not None
+        key = inference_engine.request_key()
+        if self.batcher:
+            batcher = self.batcher
+            return self.single_flight.do(key, lambda: batcher.submit(inference_engine))
+        return self.single_flight.do(key, lambda: self._run_engine(inference_engine))
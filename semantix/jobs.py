@@ -0,0 +1,411 @@
+"""Offline batch jobs for enhanced functions.
+
+Non-urgent bulk workloads can be run through the provider batch APIs (OpenAI Batch,
+Anthropic Message Batches), which are cheaper and have higher throughput than live calls.
+A `BatchJob` renders enhanced function calls into a batch request file, and ingests the
+result file with the usual output parsing. Outputs that need an LLM extraction or fix are
+gathered into a follow-up job instead of being fixed one by one.
+
+Example:
+```python
+from semantix.jobs import BatchJob, LocalBatchExecutor
+
+job = BatchJob(format="openai")
+for text in texts:
+    job.add(classify, text=text)
+job.to_jsonl("requests.jsonl")
+# Submit requests.jsonl to the provider, or run it locally:
+LocalBatchExecutor(llm).run("requests.jsonl", "results.jsonl")
+result = job.ingest("results.jsonl")
+while result.fix_job:
+    result.fix_job.to_jsonl("fix_requests.jsonl")
+    LocalBatchExecutor(llm).run("fix_requests.jsonl", "fix_results.jsonl")
+    result = result.fix_job.ingest("fix_results.jsonl")
+print(result.outputs, result.errors)
+```
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Literal, Optional, TYPE_CHECKING
+
+from semantix import metrics
+from semantix.types.semantic import Output
+from semantix.utils.fences import scan_blocks
+
+if TYPE_CHECKING:
+    from semantix.inference import EnhancedFunction, InferenceEngine
+    from semantix.llms.base import BaseLLM
+
+OPENAI_BATCH_URL = "/v1/chat/completions"
+
+
+class BatchRequest:
+    """Class to represent a request of a batch job."""
+
+    def __init__(
+        self,
+        custom_id: str,
+        function: "EnhancedFunction",
+        engine: "InferenceEngine",
+        messages: List["BaseLLM.Message"],
+        model_params: dict,
+        stage: str = "main",
+        attempt: int = 0,
+        blocks: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Initializes the BatchRequest class."""
+        self.custom_id = custom_id
+        self.function = function
+        self.engine = engine
+        self.messages = messages
+        self.model_params = model_params
+        self.stage = stage
+        self.attempt = attempt
+        self.blocks = blocks or {}
+
+    def to_row(self, format: str) -> dict:  # noqa: A002
+        """Render the request as a row of a provider batch file."""
+        model = self.function.model
+        body = model.build_request(
+            [m.to_dict() for m in self.messages], self.model_params
+        )
+        if format == "anthropic":
+            if "system" not in body:
+                system = [m for m in body["messages"] if m["role"] == model.SYSTEM_ROLE]
+                body["messages"] = [m for m in body["messages"] if m not in system]
+                body["system"] = _system_content([m["content"] for m in system])
+            return {"custom_id": self.custom_id, "params": body}
+        return {
+            "custom_id": self.custom_id,
+            "method": "POST",
+            "url": OPENAI_BATCH_URL,
+            "body": body,
+        }
+
+
+class BatchResult:
+    """Class to represent the result of ingesting a batch job."""
+
+    def __init__(
+        self,
+        outputs: Dict[str, Any],
+        errors: Dict[str, str],
+        fix_job: Optional["BatchJob"],
+    ) -> None:
+        """Initializes the BatchResult class.
+
+        Args:
+            outputs (Dict[str, Any]): The parsed outputs by custom id, including the ones of
+                the previous jobs of the chain.
+            errors (Dict[str, str]): The errors of the requests that could not be resolved.
+            fix_job (BatchJob, optional): The follow-up job with the extraction and fix
+                requests, None if every request is resolved.
+        """
+        self.outputs = outputs
+        self.errors = errors
+        self.fix_job = fix_job
+
+
+class BatchJob:
+    """Class to render enhanced function calls into a provider batch request file."""
+
+    def __init__(
+        self,
+        format: Literal["openai", "anthropic"] = "openai",  # noqa: A002
+        outputs: Optional[Dict[str, Any]] = None,
+        errors: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Initializes the BatchJob class.
+
+        Args:
+            format (str, optional): The batch file format. "openai" for the OpenAI Batch API
+                (also used by OpenAI compatible providers), "anthropic" for the Anthropic
+                Message Batches API. Defaults to "openai".
+            outputs (Dict[str, Any], optional): Outputs already resolved by previous jobs.
+            errors (Dict[str, str], optional): Errors of previous jobs.
+        """
+        self.format = format
+        self.requests: Dict[str, BatchRequest] = {}
+        self.outputs = outputs if outputs is not None else {}
+        self.errors = errors if errors is not None else {}
+
+    def add(
+        self,
+        function: "EnhancedFunction",
+        custom_id: str = "",
+        **kwargs: Any,  # noqa: ANN401
+    ) -> str:
+        """Add a call of an enhanced function to the job.
+
+        Args:
+            function (EnhancedFunction): The enhanced function to call.
+            custom_id (str, optional): The id of the request. Defaults to `<function>-<n>`.
+            **kwargs: The keyword arguments of the call.
+
+        Returns:
+            str: The custom id of the request.
+
+        Raises:
+            ValueError: If the custom id is already used, or if the function samples
+                candidates or uses the ReAct method, which take several requests per call.
+        """
+        custom_id = custom_id or f"{function.func.__name__}-{len(self.requests)}"
+        if custom_id in self.requests:
+            raise ValueError(f"Duplicate custom_id: {custom_id}")
+        if function.candidates > 1 or function.method == "ReAct":
+            raise ValueError(
+                "Batch jobs do not support candidate sampling or the ReAct method."
+            )
+        engine = function.build_engine(**kwargs)
+        self.requests[custom_id] = BatchRequest(
+            custom_id,
+            function,
+            engine,
+            engine.get_messages(),
+            engine.request_params(),
+        )
+        return custom_id
+
+    def rows(self) -> List[dict]:
+        """Get the rows of the batch request file."""
+        return [request.to_row(self.format) for request in self.requests.values()]
+
+    def to_jsonl(self, path: str) -> None:
+        """Write the batch request file."""
+        with open(path, "w") as file:
+            for row in self.rows():
+                file.write(json.dumps(row) + "\n")
+
+    def ingest(self, path: str) -> BatchResult:
+        """Parse the result file of the job.
+
+        Returns:
+            BatchResult: The outputs, the errors and the follow-up job with the requests that
+                need an LLM extraction or fix.
+        """
+        with open(path, "r") as file:
+            rows = [json.loads(line) for line in file if line.strip()]
+        outputs = dict(self.outputs)
+        errors = dict(self.errors)
+        fix_job = BatchJob(self.format, outputs, errors)
+        for row in rows:
+            request = self.requests.get(row.get("custom_id", ""))
+            if request is None:
+                continue
+            try:
+                text = parse_result_row(row)
+            except Exception as e:
+                errors[request.custom_id] = str(e)
+                continue
+            self._resolve(request, text, outputs, errors, fix_job)
+        for custom_id in self.requests:
+            if custom_id not in {**outputs, **errors, **fix_job.requests}:
+                errors[custom_id] = "Missing from the result file."
+        return BatchResult(outputs, errors, fix_job if fix_job.requests else None)
+
+    def _resolve(
+        self,
+        request: BatchRequest,
+        text: str,
+        outputs: Dict[str, Any],
+        errors: Dict[str, str],
+        fix_job: "BatchJob",
+    ) -> None:
+        """Parse the response of a request or add its follow-up request to the fix job."""
+        function, engine = request.function, request.engine
+        model = function.model
+        labels = {"function": function.func.__name__, "model": model.model_name}
+        if engine.structured and request.stage == "main":
+            _globals, _locals = function.namespace.globals, function.namespace.locals
+            try:
+                result = Output(
+                    **engine.resolve(text, _globals, _locals, local_only=True)
+                )
+            except Exception as e:
+                errors[request.custom_id] = str(e)
+                return
+            outputs[request.custom_id] = (
+                result if function.return_additional_info else result.output
+            )
+            return
+        blocks = scan_blocks(text)
+        shared = request.blocks if request.stage != "main" else blocks
+        if "output" not in blocks:
+            if request.stage != "main":
+                errors[request.custom_id] = "No output block in the response."
+                return
+            metrics.EXTRACT_LOOPS.inc(1, **labels)
+            fix_job.requests[request.custom_id] = BatchRequest(
+                request.custom_id,
+                function,
+                engine,
+                engine.extract_output_prompt_info.get_messages(model, text),
+                {},
+                stage="extract",
+                blocks=shared,
+            )
+            return
+        output = blocks["output"].strip()
+        _globals, _locals = function.namespace.globals, function.namespace.locals
+        try:
+            obj = model.parse_output(
+                output, engine.output_fix_prompt_info.return_hint, _globals, _locals
+            )
+        except Exception as e:
+            try:
+                obj = model.repair_output(
+                    output, engine.output_fix_prompt_info, _globals, _locals, e
+                )
+            except Exception:
+                self._fix(request, output, e, errors, fix_job, shared)
+                return
+        result = Output(**{**shared, "output": obj})
+        outputs[request.custom_id] = (
+            result if function.return_additional_info else result.output
+        )
+
+    def _fix(
+        self,
+        request: BatchRequest,
+        output: str,
+        error: Exception,
+        errors: Dict[str, str],
+        fix_job: "BatchJob",
+        shared: Dict[str, str],
+    ) -> None:
+        """Add the output fix request of an output that cannot be parsed to the fix job."""
+        function, engine = request.function, request.engine
+        model = function.model
+        if request.attempt + 1 >= model.max_retries:
+            errors[request.custom_id] = str(error)
+            return
+        metrics.FIX_LOOPS.inc(
+            1, function=function.func.__name__, model=model.model_name
+        )
+        fix_job.requests[request.custom_id] = BatchRequest(
+            request.custom_id,
+            function,
+            engine,
+            engine.output_fix_prompt_info.get_messages(model, output, str(error)),
+            {},
+            stage="fix",
+            attempt=request.attempt + 1,
+            blocks=shared,
+        )
+
+
+def _system_content(contents: List[Any]) -> Any:  # noqa: ANN401
+    """Merge the contents of the system messages into the system parameter of a request.
+
+    The text contents are joined, and a list of content blocks is returned if any content
+    is a list (e.g. with media).
+    """
+    if all(isinstance(content, str) for content in contents):
+        return "\n".join(contents)
+    blocks: List[Any] = []
+    for content in contents:
+        if isinstance(content, str):
+            blocks.append({"type": "text", "text": content})
+        else:
+            blocks.extend(content)
+    return blocks
+
+
+def parse_result_row(row: dict) -> str:
+    """Get the response text of a row of an OpenAI or Anthropic batch result file."""
+    if "result" in row:
+        result = row["result"]
+        if result.get("type") != "succeeded":
+            raise ValueError(f"Request {result.get('type')}: {result.get('error')}")
+        content = result["message"]["content"]
+        for c in content:
+            if c.get("type") == "tool_use":  # The structured output mode
+                return json.dumps(c.get("input", {}))
+        return "".join(c.get("text", "") for c in content if c.get("type") == "text")
+    if row.get("error"):
+        raise ValueError(f"Request failed: {row['error']}")
+    response = row["response"]
+    if response.get("status_code", 200) != 200:
+        raise ValueError(f"Request failed with status {response['status_code']}")
+    return response["body"]["choices"][0]["message"]["content"]
+
+
+class LocalBatchExecutor:
+    """Class to run a batch request file against any model, standing in for the provider."""
+
+    def __init__(self, model: "BaseLLM", max_workers: int = 4) -> None:
+        """Initializes the LocalBatchExecutor class.
+
+        Args:
+            model (BaseLLM): The model to run the requests with. The parameters of every
+                request (e.g. model, temperature, response_format) override the default
+                parameters of this model.
+            max_workers (int, optional): The number of requests run concurrently. Defaults to 4.
+        """
+        self.model = model
+        self.max_workers = max_workers
+
+    def run(self, input_path: str, output_path: str) -> None:
+        """Run the requests of a batch request file and write the result file."""
+        with open(input_path, "r") as file:
+            rows = [json.loads(line) for line in file if line.strip()]
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            results = list(executor.map(self._run_row, rows))
+        with open(output_path, "w") as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+
+    def _run_row(self, row: dict) -> dict:
+        """Run a request and render its result row in the format of the request."""
+        custom_id = row["custom_id"]
+        is_anthropic = "params" in row
+        try:
+            params = dict(row["params"] if is_anthropic else row["body"])
+            messages = params.pop("messages")
+            if is_anthropic:
+                system = params.pop("system", None)
+                if system:
+                    messages = [
+                        {"role": self.model.SYSTEM_ROLE, "content": system},
+                        *messages,
+                    ]
+            text = self.model.__infer__(messages, params)
+        except Exception as e:
+            if is_anthropic:
+                return {
+                    "custom_id": custom_id,
+                    "result": {"type": "errored", "error": {"message": str(e)}},
+                }
+            return {
+                "custom_id": custom_id,
+                "response": None,
+                "error": {"message": str(e)},
+            }
+        if is_anthropic:
+            return {
+                "custom_id": custom_id,
+                "result": {
+                    "type": "succeeded",
+                    "message": {
+                        "role": "assistant",
+                        "content": [{"type": "text", "text": text}],
+                    },
+                },
+            }
+        return {
+            "custom_id": custom_id,
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }
+                    ]
+                },
+            },
+            "error": None,
+        }
@@ -1,11 +1,57 @@
-"""Builtin LLMs for Semantix."""
-
-from semantix.llms._anthropic import Anthropic
-from semantix.llms._cohere import Cohere
-from semantix.llms._groq import Groq
-from semantix.llms._mistral import Mistral
-from semantix.llms._openai import OpenAI
-from semantix.llms._together import Together
+"""Builtin LLMs for Semantix.
+
+Provider classes are imported on first access, so that importing `semantix` does not
+pay for the provider modules that are not used.
+"""
+
+import importlib
+from typing import Any, List, TYPE_CHECKING
+
 from semantix.llms.base import BaseLLM
 
-__all__ = ["OpenAI", "BaseLLM", "Anthropic", "Cohere", "Mistral", "Together", "Groq"]
+if TYPE_CHECKING:
+    from semantix.llms._anthropic import Anthropic
+    from semantix.llms._cascade import Cascade
+    from semantix.llms._cohere import Cohere
+    from semantix.llms._groq import Groq
+    from semantix.llms._mistral import Mistral
+    from semantix.llms._openai import OpenAI
+    from semantix.llms._pool import EndpointPool
+    from semantix.llms._together import Together
+
+_PROVIDERS = {
+    "OpenAI": "semantix.llms._openai",
+    "Anthropic": "semantix.llms._anthropic",
+    "Cohere": "semantix.llms._cohere",
+    "Mistral": "semantix.llms._mistral",
+    "Together": "semantix.llms._together",
+    "Groq": "semantix.llms._groq",
+    "Cascade": "semantix.llms._cascade",
+    "EndpointPool": "semantix.llms._pool",
+}
+
+__all__ = [
+    "OpenAI",
+    "BaseLLM",
+    "Anthropic",
+    "Cohere",
+    "Mistral",
+    "Together",
+    "Groq",
+    "Cascade",
+    "EndpointPool",
+]
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    """Import the provider classes lazily."""
+    if name in _PROVIDERS:
+        value = getattr(importlib.import_module(_PROVIDERS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    """List the attributes of the module, including the lazily imported ones."""
+    return sorted(set(globals()) | set(__all__))
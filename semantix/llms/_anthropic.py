@@ -1,7 +1,8 @@
 """Anthropic API client for Language Learning Models (LLMs)."""
 
+import json
 import os
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 from semantix.llms.base import BaseLLM
 from semantix.types import Image, Video
@@ -11,6 +12,9 @@ from semantix.types.prompt import Information
 class Anthropic(BaseLLM):
     """Anthropic API client for Language Learning Models (LLMs)."""
 
+    STRUCTURED_SCHEMA_IN_PROMPT = False
+    STRUCTURED_TOOL_NAME = "respond"
+
     class Message(BaseLLM.Message):
         """Message class for the Anthropic API client."""
 
@@ -111,10 +115,48 @@ class Anthropic(BaseLLM):
 
     def __infer__(self, messages: list, model_params: dict = {}) -> str:
         """Infer a response from the input meaning."""
+        params = self.build_request(messages, model_params)
+        output = self.client.messages.create(**params)
+        self.record_usage(output.usage.input_tokens, output.usage.output_tokens)
+        for block in output.content:
+            if block.type == "tool_use" and block.name == self.STRUCTURED_TOOL_NAME:
+                return json.dumps(block.input)
+        return output.content[0].text
+
+    def __stream__(self, messages: list, model_params: dict = {}) -> Iterator[str]:
+        """Infer a response from the input meaning, yielding it in chunks.
+
+        The structured output mode answers with a tool call, which is yielded at once.
+        """
+        params = self.build_request(messages, model_params)
+        if "tool_choice" in params:
+            yield self.__infer__(messages, model_params)
+            return
+        with self.client.messages.stream(**params) as stream:
+            yield from stream.text_stream
+            output = stream.get_final_message()
+        self.record_usage(output.usage.input_tokens, output.usage.output_tokens)
+
+    def structured_params(self, schema: dict, strict: bool) -> dict:
+        """Get the request parameters forcing the response through a tool with the JSON Schema."""
+        return {
+            "tools": [
+                {
+                    "name": self.STRUCTURED_TOOL_NAME,
+                    "description": "Respond with the answer.",
+                    "input_schema": schema,
+                }
+            ],
+            "tool_choice": {"type": "tool", "name": self.STRUCTURED_TOOL_NAME},
+        }
+
+    def build_request(self, messages: list, model_params: dict = {}) -> dict:
+        """Build the Messages API request body for the given messages."""
         params = {
             **self.default_params,
             **model_params,
         }
+        messages = list(messages)
         system_message = messages.pop(0)
         # Anthropic API requires the system message to be seperate and not part of the messages
         # Also, user and assistant roles should be one after another without consecutive messages from the same role
@@ -130,10 +172,7 @@ class Anthropic(BaseLLM):
             for message in messages
         ]
         messages = self.simplify_messages(messages)
-        output = self.client.messages.create(
-            system=system_message["content"], messages=messages, **params
-        )
-        return output.content[0].text
+        return {"system": system_message["content"], "messages": messages, **params}
 
     def simplify_messages(self, messages: List[dict]) -> List[dict]:
         """Simplify the messages to the required format."""
@@ -146,12 +185,16 @@ class Anthropic(BaseLLM):
             last_message = new_messages[-1]
             if last_message["role"] == message["role"]:
                 if isinstance(last_message["content"], list):
-                    if isinstance(message["content"], list):
-                        last_message["content"].extend(message["content"])
-                    else:
-                        last_message["content"].append(
-                            {"type": "text", "text": message["content"]}
-                        )
+                    # New lists, the contents of the given messages are left untouched
+                    content = (
+                        message["content"]
+                        if isinstance(message["content"], list)
+                        else [{"type": "text", "text": message["content"]}]
+                    )
+                    new_messages[-1] = {
+                        "role": last_message["role"],
+                        "content": [*last_message["content"], *content],
+                    }
                 elif isinstance(message["content"], list):
                     new_messages[-1] = {
                         "role": last_message["role"],
@@ -0,0 +1,183 @@
+"""Cascade of models, from the cheapest to the most capable."""
+
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Mapping, Optional, TYPE_CHECKING
+
+from loguru import logger
+
+from semantix import metrics
+from semantix.llms.base import BaseLLM
+from semantix.types.semantic import Output
+from semantix.utils.threads import start_thread
+
+if TYPE_CHECKING:
+    from semantix.inference import InferenceEngine
+
+
+class TierStats:
+    """Class to represent the statistics of a tier of a cascade."""
+
+    def __init__(self, model: str) -> None:
+        """Initializes the TierStats class."""
+        self.model = model
+        self.calls = 0
+        self.successes = 0
+        self.escalations: Dict[str, int] = {}
+        self.latency = 0.0
+
+    def to_dict(self) -> dict:
+        """Get the statistics as a dictionary."""
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "successes": self.successes,
+            "escalations": dict(self.escalations),
+            "mean_latency": self.latency / self.calls if self.calls else 0.0,
+        }
+
+
+class Cascade(BaseLLM):
+    """Composite model trying the cheap models first and escalating to the next tier.
+
+    A tier escalates when its output cannot be parsed or validated (without running the
+    output fix loop on it), when its request fails or exceeds the timeout, or when the
+    `escalate_on` predicate rejects its output. The last tier runs with the usual
+    extraction and fix loops.
+    """
+
+    def __init__(
+        self,
+        models: List[BaseLLM],
+        escalate_on: Optional[Callable[[Output], bool]] = None,
+        timeout: Optional[float] = None,
+        verbose: bool = False,
+        max_retries: int = 3,
+    ) -> None:
+        """Initializes the Cascade class.
+
+        Args:
+            models (List[BaseLLM]): The tiers, from the first tried to the last resort.
+            escalate_on (Callable[[Output], bool], optional): Predicate on the parsed output of
+                a tier (with the method sections, e.g. reasoning). Returns True to escalate.
+            timeout (float, optional): The latency budget of every tier but the last, in
+                seconds. A tier exceeding it is abandoned and the call escalates.
+            verbose (bool, optional): Whether to enable verbose mode. Defaults to False.
+            max_retries (int, optional): The maximum number of self healing steps allowed. Defaults to 3.
+        """
+        assert models, "A cascade needs at least one model."
+        super().__init__(verbose, max_retries)
+        self.models = models
+        self.escalate_on = escalate_on
+        self.timeout = timeout
+        self._stats = [TierStats(model.model_name) for model in models]
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        """Get the name of the cascade."""
+        return f"cascade({', '.join(model.model_name for model in self.models)})"
+
+    def stats(self) -> List[dict]:
+        """Get the statistics of every tier."""
+        with self._lock:
+            return [s.to_dict() for s in self._stats]
+
+    def reset_stats(self) -> None:
+        """Reset the statistics of every tier."""
+        with self._lock:
+            self._stats = [TierStats(model.model_name) for model in self.models]
+
+    def _record(self, index: int, start: float, escalation: str = "") -> None:
+        """Record the result of a tier attempt."""
+        with self._lock:
+            stats = self._stats[index]
+            stats.calls += 1
+            stats.latency += time.perf_counter() - start
+            if escalation:
+                stats.escalations[escalation] = stats.escalations.get(escalation, 0) + 1
+            else:
+                stats.successes += 1
+        if escalation:
+            metrics.record_escalation(self.models[index].model_name, escalation)
+            if self.verbose:
+                logger.info(
+                    f"Escalating from {self.models[index].model_name} ({escalation})."
+                )
+
+    def _attempt(
+        self,
+        model: BaseLLM,
+        engine: "InferenceEngine",
+        _globals: dict,
+        _locals: Mapping[str, Any],
+    ) -> dict:
+        """Run a tier without the extraction and fix loops, within the timeout."""
+        if self.timeout is None:
+            return model.run_engine(engine, _globals, _locals, local_only=True)
+        # An abandoned tier cannot be interrupted, it finishes in the background
+        future = start_thread(
+            model.run_engine, engine, _globals, _locals, True, name="semantix-cascade"
+        )
+        return future.result(self.timeout)
+
+    def run_engine(
+        self,
+        engine: "InferenceEngine",
+        _globals: dict,
+        _locals: Mapping[str, Any],
+        local_only: bool = False,
+    ) -> dict:
+        """Run the tiers in order until one resolves an acceptable output.
+
+        The tiers run with the method and the candidate sampling of the engine. A tier
+        escalates as `invalid` if its output was received but not resolved, and as `error`
+        if its requests failed.
+        """
+        last = len(self.models) - 1
+        for index, model in enumerate(self.models):
+            tier_engine = engine.with_model(model)
+            start = time.perf_counter()
+            if index == last:
+                try:
+                    result = model.run_engine(
+                        tier_engine, _globals, _locals, local_only
+                    )
+                except Exception:
+                    self._record(index, start, "error")
+                    raise
+                self._record(index, start)
+                return result
+            try:
+                result = self._attempt(model, tier_engine, _globals, _locals)
+            except FutureTimeoutError:
+                self._record(index, start, "timeout")
+                continue
+            except Exception as e:
+                # The engine keeps the last output it was asked to resolve
+                if tier_engine.output:
+                    self._record(index, start, "invalid")
+                else:
+                    metrics.record_retry(e)
+                    self._record(index, start, "error")
+                continue
+            if self.escalate_on is not None and self.escalate_on(Output(**result)):
+                self._record(index, start, "predicate")
+                continue
+            self._record(index, start)
+            return result
+        raise AssertionError("Unreachable")
+
+    def __infer__(self, messages: list, model_params: dict = {}) -> str:
+        """Infer a response with the first tier that does not fail."""
+        for model in self.models[:-1]:
+            try:
+                return model.__infer__(messages, model_params)
+            except Exception as e:
+                metrics.record_retry(e)
+        return self.models[-1].__infer__(messages, model_params)
+
+    def build_request(self, messages: list, model_params: dict = {}) -> dict:
+        """Build the request body of the first tier."""
+        return self.models[0].build_request(messages, model_params)
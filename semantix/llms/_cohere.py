@@ -1,7 +1,7 @@
 """Cohere API client for Language Learning Models (LLMs)."""
 
 import os
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
 from semantix.llms.base import BaseLLM
 
@@ -63,8 +63,35 @@ class Cohere(BaseLLM):
             message=message,
             **params,
         )
+        billed_units = output.meta.billed_units if output.meta else None
+        if billed_units:
+            self.record_usage(billed_units.input_tokens, billed_units.output_tokens)
         return output.text
 
+    def __stream__(self, messages: list, model_params: dict = {}) -> Iterator[str]:
+        """Infer a response from the input meaning, yielding it in chunks."""
+        params = {
+            **self.default_params,
+            **model_params,
+        }
+        simplified_messages = self.simplify_messages(messages)
+        chat_history, message = self.process_messages(simplified_messages)
+        stream = self.client.chat_stream(
+            chat_history=chat_history,
+            message=message,
+            **params,
+        )
+        for event in stream:
+            if event.event_type == "text-generation":
+                yield event.text
+            elif event.event_type == "stream-end":
+                meta = event.response.meta
+                billed_units = meta.billed_units if meta else None
+                if billed_units:
+                    self.record_usage(
+                        billed_units.input_tokens, billed_units.output_tokens
+                    )
+
     @staticmethod
     def process_messages(messages: list) -> Tuple[list, str]:
         """Process the messages to the required format."""
@@ -1,7 +1,7 @@
 """Groq API client for Language Learning Models (LLMs)."""
 
 import os
-from typing import Optional
+from typing import Iterator, Optional
 
 from semantix.llms.base import BaseLLM
 
@@ -38,11 +38,35 @@ class Groq(BaseLLM):
             **kwargs,
         }
 
+    def structured_params(self, schema: dict, strict: bool) -> dict:
+        """Get the request parameters enabling the JSON mode, the schema is given in the prompt."""
+        return {"response_format": {"type": "json_object"}}
+
     def __infer__(self, messages: list, model_params: dict = {}) -> str:
         """Infer a response from the input meaning."""
         params = {
             **self.default_params,
             **model_params,
         }
-        output = self.client.chat.complete.create(messages=messages, **params)
+        output = self.client.chat.completions.create(messages=messages, **params)
+        if output.usage:
+            self.record_usage(
+                output.usage.prompt_tokens, output.usage.completion_tokens
+            )
         return output.choices[0].message.content
+
+    def __stream__(self, messages: list, model_params: dict = {}) -> Iterator[str]:
+        """Infer a response from the input meaning, yielding it in chunks."""
+        params = {
+            **self.default_params,
+            **model_params,
+        }
+        stream = self.client.chat.completions.create(
+            messages=messages, stream=True, **params
+        )
+        for chunk in stream:
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage:
+                self.record_usage(usage.prompt_tokens, usage.completion_tokens)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -1,7 +1,7 @@
 """MistralAI API client for Language Learning Models (LLMs)."""
 
 import os
-from typing import Optional
+from typing import Iterator, Optional
 
 from semantix.llms.base import BaseLLM
 
@@ -38,6 +38,10 @@ class Mistral(BaseLLM):
             **kwargs,
         }
 
+    def structured_params(self, schema: dict, strict: bool) -> dict:
+        """Get the request parameters enabling the JSON mode, the schema is given in the prompt."""
+        return {"response_format": {"type": "json_object"}}
+
     def __infer__(self, messages: list, model_params: dict = {}) -> str:
         """Infer a response from the input meaning."""
         params = {
@@ -45,4 +49,23 @@ class Mistral(BaseLLM):
             **model_params,
         }
         output = self.client.chat.complete.create(messages=messages, **params)
+        if output.usage:
+            self.record_usage(
+                output.usage.prompt_tokens, output.usage.completion_tokens
+            )
         return output.choices[0].message.content
+
+    def __stream__(self, messages: list, model_params: dict = {}) -> Iterator[str]:
+        """Infer a response from the input meaning, yielding it in chunks."""
+        params = {
+            **self.default_params,
+            **model_params,
+        }
+        for event in self.client.chat.stream(messages=messages, **params):
+            chunk = event.data
+            if chunk.usage:
+                self.record_usage(
+                    chunk.usage.prompt_tokens, chunk.usage.completion_tokens
+                )
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -1,14 +1,20 @@
 """OpenAI API client for Language Learning Models (LLMs)."""
 
 import os
-from typing import Optional
+from typing import Iterator, List, Optional, TYPE_CHECKING
 
 from semantix.llms.base import BaseLLM
 
+if TYPE_CHECKING:
+    import openai
+
 
 class OpenAI(BaseLLM):
     """OpenAI API client for Language Learning Models (LLMs)."""
 
+    STRUCTURED_SCHEMA_IN_PROMPT = False
+    SUPPORTS_N = True
+
     def __init__(
         self,
         verbose: bool = False,
@@ -38,12 +44,63 @@ class OpenAI(BaseLLM):
             **kwargs,
         }
 
+    def structured_params(self, schema: dict, strict: bool) -> dict:
+        """Get the request parameters constraining the response to the JSON Schema."""
+        return {
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": schema, "strict": strict},
+            }
+        }
+
     def __infer__(self, messages: list, model_params: dict = {}) -> str:
         """Infer a response from the input meaning."""
-        params = {
-            **self.default_params,
-            **model_params,
-        }
-        messages = self.simplify_messages(messages)
-        output = self.client.chat.completions.create(messages=messages, **params)
+        return self._complete(self.client, messages, model_params)
+
+    def __stream__(self, messages: list, model_params: dict = {}) -> Iterator[str]:
+        """Infer a response from the input meaning, yielding it in chunks."""
+        yield from self._complete_stream(self.client, messages, model_params)
+
+    def infer_candidates(self, messages: list, model_params: dict, n: int) -> List[str]:
+        """Infer n candidate responses in a single request."""
+        return self._complete_candidates(self.client, messages, model_params, n)
+
+    def _complete(
+        self, client: "openai.OpenAI", messages: list, model_params: dict
+    ) -> str:
+        """Send a chat completion request with the given client."""
+        params = self.build_request(messages, model_params)
+        output = client.chat.completions.create(**params)
+        if output.usage:
+            self.record_usage(
+                output.usage.prompt_tokens, output.usage.completion_tokens
+            )
         return output.choices[0].message.content
+
+    def _complete_stream(
+        self, client: "openai.OpenAI", messages: list, model_params: dict
+    ) -> Iterator[str]:
+        """Send a streamed chat completion request with the given client."""
+        params = self.build_request(messages, model_params)
+        stream = client.chat.completions.create(
+            **params, stream=True, stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            if chunk.usage:
+                self.record_usage(
+                    chunk.usage.prompt_tokens, chunk.usage.completion_tokens
+                )
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _complete_candidates(
+        self, client: "openai.OpenAI", messages: list, model_params: dict, n: int
+    ) -> List[str]:
+        """Send a chat completion request for n candidates with the given client."""
+        params = self.build_request(messages, {**model_params, "n": n})
+        output = client.chat.completions.create(**params)
+        if output.usage:
+            self.record_usage(
+                output.usage.prompt_tokens, output.usage.completion_tokens
+            )
+        return [choice.message.content for choice in output.choices]
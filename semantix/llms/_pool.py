@@ -0,0 +1,359 @@
+"""Load-balanced pool of OpenAI-compatible endpoints.
+
+`EndpointPool` spreads the requests of a model over several self-hosted inference servers
+exposing the OpenAI chat completions API (vLLM, SGLang, llama.cpp, TGI...):
+
+- Routing: `"least_outstanding"` sends a request to the endpoint with the fewest
+  requests in flight (ties broken by the lower latency), `"latency"` picks an endpoint at
+  random, weighted by the inverse of its expected wait (its latency average times its
+  requests in flight plus one).
+- Sticky sessions: with `sticky=True`, the requests sharing a prefix (by default the
+  leading system messages: the static prompt of a function, which also starts the
+  history of a `Session`) are pinned to an endpoint by rendezvous hashing, so that the prefix cache of the server
+  is reused. A pinned endpoint with `sticky_load_factor` times more requests in flight
+  than the average is skipped for the next one in the ranking of the prefix.
+- Health: an endpoint is ejected after `max_failures` consecutive failed requests or a
+  failed health check, for `eject_seconds`. It is re-admitted by the next successful
+  health check after that period (or, without health checks, on probation: one more
+  failure ejects it again). The health checks list the models of every endpoint every
+  `health_interval` seconds, from a daemon thread.
+- Failover: a request failing to connect, timing out or getting a server error is sent
+  to another endpoint, up to `failover` times. Only these errors count as failures of
+  the endpoint, not the rejected requests (e.g. invalid parameters).
+
+When every endpoint is ejected, the requests are spread over all of them rather than
+failing.
+
+Example:
+```python
+from semantix.llms import EndpointPool
+
+llm = EndpointPool(
+    ["http://gpu-1:8000/v1", "http://gpu-2:8000/v1"],
+    model="meta-llama/Llama-3.1-8B-Instruct",
+)
+```
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Literal, Optional, TypeVar
+
+from loguru import logger
+
+from semantix import metrics
+from semantix.llms._openai import OpenAI
+from semantix.llms.base import BaseLLM
+
+T = TypeVar("T")
+
+
+def system_prefix_key(messages: list) -> str:
+    """Get the sticky key of a request: the hash of its leading system messages."""
+    prefix = []
+    for message in messages:
+        if message.get("role") != "system":
+            break
+        prefix.append(message.get("content"))
+    data = json.dumps(prefix, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class Endpoint:
+    """Class to represent an endpoint of a pool and its load and health."""
+
+    def __init__(self, base_url: str, api_key: str, timeout: Optional[float]) -> None:
+        """Initializes the Endpoint class.
+
+        Args:
+            base_url (str): The base URL of the OpenAI-compatible API.
+            api_key (str): The API key of the endpoint.
+            timeout (float, optional): The timeout of the requests, in seconds.
+        """
+        import openai
+
+        self.base_url = base_url
+        self.client = openai.OpenAI(
+            base_url=base_url, api_key=api_key, max_retries=0, timeout=timeout
+        )
+        self.outstanding = 0
+        self.latency = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        self.up = True
+        self.ejected_at = 0.0
+        self.probation = False
+
+    def score(self, key: str) -> int:
+        """Get the rendezvous hashing score of the endpoint for a sticky key."""
+        digest = hashlib.sha256(f"{key}|{self.base_url}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big")
+
+    def to_dict(self) -> dict:
+        """Get the state of the endpoint as a dictionary."""
+        return {
+            "base_url": self.base_url,
+            "up": self.up,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_latency": self.latency,
+        }
+
+
+class EndpointPool(OpenAI):
+    """Model spreading its requests over a pool of OpenAI-compatible endpoints."""
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        model: str,
+        api_key: str = "EMPTY",
+        strategy: Literal["least_outstanding", "latency"] = "least_outstanding",
+        sticky: bool = False,
+        sticky_key: Callable[[list], str] = system_prefix_key,
+        sticky_load_factor: float = 1.25,
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        health_interval: Optional[float] = 10.0,
+        failover: int = 1,
+        timeout: Optional[float] = 600.0,
+        verbose: bool = False,
+        max_retries: int = 3,
+        **kwargs: dict,
+    ) -> None:
+        """Initializes the EndpointPool class.
+
+        Args:
+            base_urls (List[str]): The base URLs of the endpoints (e.g. "http://host:8000/v1").
+            model (str): The model served by the endpoints.
+            api_key (str, optional): The API key of the endpoints. Defaults to "EMPTY".
+            strategy (str, optional): The routing of the requests, "least_outstanding" or "latency". Defaults to "least_outstanding".
+            sticky (bool, optional): Whether the requests sharing a prefix are pinned to an endpoint. Defaults to False.
+            sticky_key (Callable[[list], str], optional): Gets the prefix key of the messages of a request. Defaults to the hash of the leading system messages.
+            sticky_load_factor (float, optional): How many times the average requests in flight a pinned endpoint can have before the next one is used. Defaults to 1.25.
+            max_failures (int, optional): The number of consecutive failed requests ejecting an endpoint. Defaults to 3.
+            eject_seconds (float, optional): The minimum time an endpoint stays ejected. Defaults to 30.
+            health_interval (float, optional): The number of seconds between the health checks. Defaults to 10 (None disables them).
+            failover (int, optional): The number of other endpoints a failed request is sent to. Defaults to 1.
+            timeout (float, optional): The timeout of the requests, in seconds. Defaults to 600.
+            verbose (bool, optional): Whether to enable verbose mode. Defaults to False.
+            max_retries (int, optional): The maximum number of self healing steps allowed. Defaults to 3.
+            **kwargs (dict): Additional keyword arguments to be passed to the chat completions API.
+        """  # noqa: E501
+        assert base_urls, "A pool needs at least one endpoint."
+        BaseLLM.__init__(self, verbose, max_retries)
+        self.endpoints = [Endpoint(url, api_key, timeout) for url in base_urls]
+        self.strategy = strategy
+        self.sticky = sticky
+        self.sticky_key = sticky_key
+        self.sticky_load_factor = sticky_load_factor
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.failover = failover
+        self.default_params = {"model": model, **kwargs}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        for endpoint in self.endpoints:
+            metrics.record_endpoint_state(endpoint.base_url, True)
+
+    def __infer__(self, messages: list, model_params: dict = {}) -> str:
+        """Infer a response from the input meaning, on an endpoint of the pool."""
+        return self._with_failover(
+            messages,
+            lambda endpoint: self._complete(endpoint.client, messages, model_params),
+        )
+
+    def infer_candidates(self, messages: list, model_params: dict, n: int) -> List[str]:
+        """Infer n candidate responses in a single request, on an endpoint of the pool."""
+        return self._with_failover(
+            messages,
+            lambda endpoint: self._complete_candidates(
+                endpoint.client, messages, model_params, n
+            ),
+        )
+
+    def __stream__(self, messages: list, model_params: dict = {}) -> Iterator[str]:
+        """Infer a response from the input meaning, yielding it in chunks.
+
+        A streamed request is not sent again once it has started.
+        """
+        with self._use(self._choose(messages)) as endpoint:
+            yield from self._complete_stream(endpoint.client, messages, model_params)
+
+    def _with_failover(self, messages: list, request: Callable[[Endpoint], T]) -> T:
+        """Send a request, to other endpoints if it fails on a retryable error."""
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self._choose(messages, tried)
+            try:
+                with self._use(endpoint):
+                    return request(endpoint)
+            except Exception as e:
+                tried.append(endpoint)
+                if len(tried) > self.failover or not self._is_retryable(e):
+                    raise
+                if self.verbose:
+                    logger.info(f"Request failed on {endpoint.base_url}: {e}")
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Check whether a failed request can be sent to another endpoint."""
+        import openai
+
+        return isinstance(
+            error,
+            (openai.APIConnectionError, openai.InternalServerError),
+        )
+
+    def _choose(
+        self, messages: list, exclude: Optional[List[Endpoint]] = None
+    ) -> Endpoint:
+        """Choose the endpoint of a request."""
+        exclude = exclude or []
+        self._ensure_health_checks()
+        with self._lock:
+            self._readmit_expired()
+            candidates = [e for e in self.endpoints if e.up and e not in exclude]
+            if not candidates:
+                candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                candidates = list(self.endpoints)
+            if self.sticky:
+                return self._choose_sticky(self.sticky_key(messages), candidates)
+            if self.strategy == "latency":
+                weights = [
+                    1.0 / (max(e.latency, 1e-3) * (e.outstanding + 1))
+                    for e in candidates
+                ]
+                return random.choices(candidates, weights)[0]
+            return min(candidates, key=lambda e: (e.outstanding, e.latency))
+
+    def _choose_sticky(self, key: str, candidates: List[Endpoint]) -> Endpoint:
+        """Choose the endpoint of a prefix, skipping the overloaded ones."""
+        average = sum(e.outstanding for e in candidates) / len(candidates)
+        limit = max(average * self.sticky_load_factor, average + 1)
+        ranking = sorted(candidates, key=lambda e: e.score(key), reverse=True)
+        for endpoint in ranking:
+            if endpoint.outstanding < limit:
+                return endpoint
+        return ranking[0]
+
+    @contextmanager
+    def _use(self, endpoint: Endpoint) -> Iterator[Endpoint]:
+        """Track a request on an endpoint: its load, latency and outcome."""
+        with self._lock:
+            endpoint.outstanding += 1
+        start = time.perf_counter()
+        result = "ok"
+        try:
+            yield endpoint
+        except GeneratorExit:  # The stream was closed by its consumer
+            raise
+        except Exception as e:
+            result = "error" if self._is_retryable(e) else "rejected"
+            raise
+        finally:
+            ok = result != "error"
+            latency = time.perf_counter() - start
+            with self._lock:
+                endpoint.outstanding -= 1
+                endpoint.requests += 1
+                if result == "ok":
+                    # Exponentially weighted moving average of the latency
+                    endpoint.latency = (
+                        latency
+                        if endpoint.latency == 0
+                        else 0.8 * endpoint.latency + 0.2 * latency
+                    )
+                if ok:
+                    endpoint.failures = 0
+                    endpoint.probation = False
+                else:
+                    endpoint.errors += 1
+                    endpoint.failures += 1
+                    if endpoint.probation or endpoint.failures >= self.max_failures:
+                        self._eject(endpoint)
+            metrics.record_endpoint_request(endpoint.base_url, result)
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        """Eject an endpoint from the routing (with the lock held)."""
+        endpoint.ejected_at = time.monotonic()
+        endpoint.probation = False
+        if endpoint.up:
+            endpoint.up = False
+            metrics.record_endpoint_state(endpoint.base_url, False)
+            if self.verbose:
+                logger.info(f"Ejected {endpoint.base_url}.")
+
+    def _admit(self, endpoint: Endpoint, probation: bool = False) -> None:
+        """Admit an endpoint back into the routing (with the lock held)."""
+        endpoint.failures = 0
+        endpoint.probation = probation
+        if not endpoint.up:
+            endpoint.up = True
+            metrics.record_endpoint_state(endpoint.base_url, True)
+            if self.verbose:
+                logger.info(f"Re-admitted {endpoint.base_url}.")
+
+    def _readmit_expired(self) -> None:
+        """Admit on probation the ejected endpoints, without health checks."""
+        if self.health_interval is not None:
+            return
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            if not endpoint.up and now - endpoint.ejected_at >= self.eject_seconds:
+                self._admit(endpoint, probation=True)
+
+    def check_health(self) -> None:
+        """Check the health of every endpoint, ejecting and re-admitting them."""
+        for endpoint in self.endpoints:
+            try:
+                endpoint.client.with_options(
+                    timeout=min(self.health_interval or 5.0, 5.0)
+                ).models.list()
+                healthy = True
+            except Exception:
+                healthy = False
+            with self._lock:
+                if not healthy:
+                    self._eject(endpoint)
+                # The failures of an endpoint already up are left to the requests
+                elif not endpoint.up and (
+                    time.monotonic() - endpoint.ejected_at >= self.eject_seconds
+                ):
+                    self._admit(endpoint)
+
+    def _ensure_health_checks(self) -> None:
+        """Start the health checks on the first request."""
+        if self.health_interval is None or self._health_thread is not None:
+            return
+        with self._lock:
+            if self._health_thread is not None:
+                return
+            self._health_thread = threading.Thread(
+                target=self._health_loop, name="semantix-health", daemon=True
+            )
+            self._health_thread.start()
+
+    def _health_loop(self) -> None:
+        """Check the health of the endpoints until the pool is closed."""
+        assert self.health_interval is not None
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+    def close(self) -> None:
+        """Stop the health checks."""
+        self._stop.set()
+
+    def stats(self) -> List[dict]:
+        """Get the state of every endpoint."""
+        with self._lock:
+            return [endpoint.to_dict() for endpoint in self.endpoints]
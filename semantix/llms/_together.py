@@ -1,7 +1,7 @@
 """Together API client for Language Learning Models (LLMs)."""
 
 import os
-from typing import Optional
+from typing import Iterator, List, Optional
 
 from semantix.llms.base import BaseLLM
 
@@ -9,6 +9,8 @@ from semantix.llms.base import BaseLLM
 class Together(BaseLLM):
     """Together API client for Language Learning Models (LLMs)."""
 
+    SUPPORTS_N = True
+
     def __init__(
         self,
         verbose: bool = False,
@@ -38,6 +40,10 @@ class Together(BaseLLM):
             **kwargs,
         }
 
+    def structured_params(self, schema: dict, strict: bool) -> dict:
+        """Get the request parameters constraining the response to the JSON Schema."""
+        return {"response_format": {"type": "json_object", "schema": schema}}
+
     def __infer__(self, messages: list, model_params: dict = {}) -> str:
         """Infer a response from the input meaning."""
         params = {
@@ -45,4 +51,38 @@ class Together(BaseLLM):
             **model_params,
         }
         output = self.client.chat.completions.create(messages=messages, **params)
+        if output.usage:
+            self.record_usage(
+                output.usage.prompt_tokens, output.usage.completion_tokens
+            )
         return output.choices[0].message.content
+
+    def __stream__(self, messages: list, model_params: dict = {}) -> Iterator[str]:
+        """Infer a response from the input meaning, yielding it in chunks."""
+        params = {
+            **self.default_params,
+            **model_params,
+        }
+        stream = self.client.chat.completions.create(
+            messages=messages, stream=True, **params
+        )
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                self.record_usage(usage.prompt_tokens, usage.completion_tokens)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def infer_candidates(self, messages: list, model_params: dict, n: int) -> List[str]:
+        """Infer n candidate responses in a single request."""
+        params = {
+            **self.default_params,
+            **model_params,
+            "n": n,
+        }
+        output = self.client.chat.completions.create(messages=messages, **params)
+        if output.usage:
+            self.record_usage(
+                output.usage.prompt_tokens, output.usage.completion_tokens
+            )
+        return [choice.message.content for choice in output.choices]
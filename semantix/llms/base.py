@@ -1,24 +1,51 @@
 """Base Large Language Model (LLM) class."""
 
+import contextlib
 import inspect
+import json
 import logging
 import re
 import traceback
-from typing import Any, Callable, Dict, List, Literal, Union
+import types
+from concurrent.futures import as_completed
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    TYPE_CHECKING,
+    Union,
+)
 
 from loguru import logger
 
 
+from semantix import metrics, profiler
+from semantix.circuit import CircuitOpenError
 from semantix.inference import (
+    EnhancedFunction,
     ExtractOutputPromptInfo,
-    InferenceEngine,
     OutputFixPromptInfo,
-    PromptInfo,
 )
-from semantix.types import Image, Video
-from semantix.types.prompt import Information, OutputHint, Tool, TypeExplanation
-from semantix.types.semantic import Semantic
-from semantix.utils.utils import get_semstr
+from semantix.react import parse_tool_calls, run_tool_calls
+from semantix.repair import RepairContext, RepairPipeline
+from semantix.types import Image, MediaPool, Video
+from semantix.types.prompt import Information, OutputHint, ReActOutput, Tool
+from semantix.utils.fences import scan_blocks
+from semantix.utils.namespace import Namespace
+from semantix.utils.schema import from_json
+from semantix.utils.threads import start_thread
+from semantix.utils.validation import decode_enum_indices, validate_output
+
+if TYPE_CHECKING:
+    from semantix.cache import NearDuplicateCache
+    from semantix.circuit import CircuitBreaker
+    from semantix.hedging import HedgePolicy
+    from semantix.inference import InferenceEngine
 
 
 httpx_logger = logging.getLogger("httpx")
@@ -85,7 +112,48 @@ Provide the output in the desired output type.
 ```
 """
 
-REACT = ""
+REACT = """
+Follow the following template at every step to achieve the goal with the tools.
+
+```thought
+Lets Reason about what to do next.
+```
+```action
+Call the tools needed for this step, one call per line, e.g. tool_name(arg=value).
+The calls of a step run in parallel, so only make calls that do not depend on each other.
+```
+Stop after the action and wait for the observations of the calls.
+Once the observations are enough to achieve the goal, follow the following template instead.
+
+```thought
+Lets Reason to achieve the goal with the observations.
+```
+```output
+Provide the output in the desired output type.
+```
+"""
+
+REACT_FINAL_INSTRUCTION = """
+The maximum number of steps is reached. Do not call any more tools.
+Follow the following template to provide the answer with the observations so far.
+
+```output
+Provide the output in the desired output type.
+```
+"""
+
+OUTPUT_SECTION = """```output
+Provide the output in the desired output type.
+```"""
+
+BATCH_OUTPUT_SECTION = """```output_0
+Provide the output for Input 0 in the desired output type.
+```
+...
+```output_{last}
+Provide the output for Input {last} in the desired output type.
+```
+Provide one output block for every input, from output_0 to output_{last}."""
 
 EXTRACT_OUTPUT_INSTRUCTION = """
 Above output is not in the desired output format.
@@ -96,6 +164,21 @@ Only provide the output in this section in the desired output type.
 ```
 """
 
+STRUCTURED_OUTPUT_INSTRUCTION = """
+Provide the answer as a single JSON object matching the JSON Schema of the response.
+Fill the fields in order, the output field comes last.
+"""
+
+SUMMARIZE_INSTRUCTION = """
+Summarize the conversation above (and the previous summary, if any) for the assistant to
+continue it. Keep the facts, the decisions and the outputs that later requests may refer to.
+Follow the following template to provide the answer.
+
+```summary
+The summary of the conversation.
+```
+"""
+
 OUTPUT_FIX_INSTRUCTION = """
 Above Error is encountered when trying to evaluate the Model Output.
 Follow the following template to provide the answer.
@@ -127,6 +210,10 @@ class BaseLLM:
         "output_fix_error": "## Error Encountered",
         "output_fix_output": "## Previous Output",
         "extract_output_output": "## Model Output",
+        "batch_input_informations": "## Input {index}",
+        "observations": "## Observations",
+        "summary": "## Conversation Summary",
+        "conversation": "## Conversation",
     }
     SYSTEM_PROMPT = ""
     METHOD_PROMPTS = {
@@ -137,11 +224,23 @@ class BaseLLM:
         "Reflection": REFLECTION,
         "Planner": PLANNER,
     }
+    OUTPUT_SECTION = OUTPUT_SECTION
+    BATCH_OUTPUT_SECTION = BATCH_OUTPUT_SECTION
     EXTRACT_OUTPUT_INSTRUCTION = EXTRACT_OUTPUT_INSTRUCTION
     OUTPUT_FIX_INSTRUCTION = OUTPUT_FIX_INSTRUCTION
+    STRUCTURED_OUTPUT_INSTRUCTION = STRUCTURED_OUTPUT_INSTRUCTION
+    REACT_FINAL_INSTRUCTION = REACT_FINAL_INSTRUCTION
+    SUMMARIZE_INSTRUCTION = SUMMARIZE_INSTRUCTION
+    # Whether the JSON Schema is added to the prompt in the structured output mode. Providers
+    # that constrain the response to the schema natively do not need it.
+    STRUCTURED_SCHEMA_IN_PROMPT = True
+    # Whether the provider samples several responses in a single request (the `n` parameter),
+    # in which case `infer_candidates` is implemented.
+    SUPPORTS_N = False
     SYSTEM_MESSAGES = {
         "extract_output": "You are an expert in extracting the output in the desired format.",
         "output_fix": "You are an expert in debugging python errors.",
+        "summarize": "You are an expert in summarizing conversations.",
     }
 
     class Message:
@@ -258,6 +357,20 @@ class BaseLLM:
         """Initialize the Large Language Model (LLM) client."""
         self.verbose = verbose
         self.max_retries = max_retries
+        self.repair_pipeline: Optional[RepairPipeline] = RepairPipeline()
+        self.hedge: Optional["HedgePolicy"] = None
+        self.circuit_breaker: Optional["CircuitBreaker"] = None
+
+    @property
+    def model_name(self) -> str:
+        """Get the name of the underlying model."""
+        return getattr(self, "default_params", {}).get("model", self.__class__.__name__)
+
+    def record_usage(self, prompt_tokens: int, completion_tokens: int) -> None:
+        """Record the token usage of a request in the metrics."""
+        metrics.record_tokens(
+            self.model_name, prompt_tokens or 0, completion_tokens or 0
+        )
 
     def get_message_desc(self, key: str) -> str:
         """Get the message description."""
@@ -278,10 +391,67 @@ class BaseLLM:
             self.USER_ROLE, self.Message.Content([self.METHOD_PROMPTS[method]])
         )
 
+    def batch_method_message(self, method: str, size: int) -> Message:
+        """Get the method message asking for one output block per input of a batch."""
+        prompt = self.METHOD_PROMPTS[method]
+        if self.OUTPUT_SECTION not in prompt:
+            raise ValueError(f"Method {method} does not support batching.")
+        outputs = self.BATCH_OUTPUT_SECTION.format(last=size - 1)
+        return self.Message(
+            self.USER_ROLE,
+            self.Message.Content([prompt.replace(self.OUTPUT_SECTION, outputs)]),
+        )
+
+    def method_sections(self, method: str) -> Dict[str, str]:
+        """Get the sections a method asks for before the output, with their instructions."""
+        return {
+            name: desc.strip()
+            for name, desc in re.findall(
+                r"```([\w-]+)\n(.*?)```", self.METHOD_PROMPTS[method], re.DOTALL
+            )
+            if name != "output"
+        }
+
+    def structured_method_message(self, schema: dict) -> Message:
+        """Get the method message of the structured output mode."""
+        items: List[Union[str, Information]] = [self.STRUCTURED_OUTPUT_INSTRUCTION]
+        if self.STRUCTURED_SCHEMA_IN_PROMPT:
+            items.append(f"## JSON Schema\n{json.dumps(schema)}")
+        return self.Message(self.USER_ROLE, self.Message.Content(items))
+
+    def structured_params(self, schema: dict, strict: bool) -> dict:
+        """Get the request parameters constraining the response to the JSON Schema.
+
+        Args:
+            schema (dict): The JSON Schema of the response.
+            strict (bool): Whether the schema is supported by strict schema modes.
+        """
+        return {}
+
     def __infer__(self, messages: list, model_params: dict) -> str:
         """Infer a response from the input meaning."""
         raise NotImplementedError
 
+    def infer_candidates(self, messages: list, model_params: dict, n: int) -> List[str]:
+        """Infer n candidate responses in a single request, if `SUPPORTS_N`."""
+        raise NotImplementedError
+
+    def __stream__(self, messages: list, model_params: dict) -> Iterator[str]:
+        """Infer a response from the input meaning, yielding it in chunks as it is generated.
+
+        The providers without streaming yield the whole response at once.
+        """
+        yield self.__infer__(messages, model_params)
+
+    def build_request(self, messages: list, model_params: dict = {}) -> dict:
+        """Build the chat request body sent to the provider for the given messages."""
+        return {
+            "model": self.model_name,
+            **getattr(self, "default_params", {}),
+            **model_params,
+            "messages": self.simplify_messages(messages),
+        }
+
     @staticmethod
     def _msgs_to_str(messages: List[Message]) -> str:
         """Convert the messages to a string."""
@@ -291,27 +461,213 @@ class BaseLLM:
         """Infer a response from the input text."""
         if self.verbose:
             logger.info(f"Model Input\n{self._msgs_to_str(messages)}")
-        _messages = [m.to_dict() for m in messages]
-        return self.__infer__(_messages, model_params)
+        with profiler.span("prompt"):
+            _messages = [m.to_dict() for m in messages]
+        with profiler.span(profiler.NETWORK, self.model_name):
+            return self._send(_messages, model_params)
+
+    def sample(self, messages: List[Message], model_params: dict, n: int) -> List[str]:
+        """Infer n candidate responses from the input text in a single request."""
+        if self.verbose:
+            logger.info(f"Model Input\n{self._msgs_to_str(messages)}")
+        with profiler.span("prompt"):
+            _messages = [m.to_dict() for m in messages]
+        with profiler.span(profiler.NETWORK, self.model_name):
+            if self.circuit_breaker is None:
+                return self.infer_candidates(_messages, model_params, n)
+            return self.circuit_breaker.call(
+                lambda: self.infer_candidates(_messages, model_params, n)
+            )
+
+    def stream(self, messages: List[Message], model_params: dict) -> Iterator[str]:
+        """Infer a response from the input text, yielding it in chunks as it is generated.
+
+        The streamed requests are not hedged nor guarded by the circuit breaker.
+        """
+        if self.verbose:
+            logger.info(f"Model Input\n{self._msgs_to_str(messages)}")
+        with profiler.span("prompt"):
+            _messages = [m.to_dict() for m in messages]
+        network_span = profiler.StepSpan(profiler.NETWORK, self.model_name)
+        chunks = self.__stream__(_messages, model_params)
+        try:
+            while True:
+                with network_span.step():
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Closing the generator of the provider releases the response
+            if isinstance(chunks, types.GeneratorType):
+                chunks.close()
+            network_span.finish()
+
+    def _send(self, messages: list, model_params: dict) -> str:
+        """Send the request to the provider, through the circuit breaker and the hedge policy.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker rejects the request.
+        """
+        if self.circuit_breaker is None:
+            return self._hedged(messages, model_params)
+        return self.circuit_breaker.call(lambda: self._hedged(messages, model_params))
+
+    def _hedged(self, messages: list, model_params: dict) -> str:
+        """Send the request to the provider, hedging it if a hedge policy is set."""
+        if self.hedge is None:
+            return self.__infer__(messages, model_params)
+        return self.hedge.run(
+            self, lambda model: model.__infer__(messages, model_params)
+        )
+
+    def run_engine(
+        self,
+        engine: "InferenceEngine",
+        _globals: dict,
+        _locals: Mapping[str, Any],
+        local_only: bool = False,
+    ) -> dict:
+        """Run one attempt of an inference engine: send the request and resolve the output.
+
+        The attempt is run by the fallback model of the circuit breaker if the circuit is
+        open. With `local_only`, the model is not asked to extract or fix the output and the
+        errors are raised instead.
+        """
+        try:
+            if engine.candidates > 1:
+                return self.run_candidates(engine, _globals, _locals, local_only)
+            if engine.method == "ReAct":
+                return self.run_react(engine, _globals, _locals, local_only)
+            model_output = self(engine.get_messages(), engine.request_params())
+        except CircuitOpenError:
+            breaker = self.circuit_breaker
+            if breaker is None or breaker.fallback is None:
+                raise
+            fallback = breaker.fallback
+            return fallback.run_engine(
+                engine.with_model(fallback), _globals, _locals, local_only
+            )
+        return engine.resolve(model_output, _globals, _locals, local_only)
+
+    def run_candidates(
+        self,
+        engine: "InferenceEngine",
+        _globals: dict,
+        _locals: Mapping[str, Any],
+        local_only: bool = False,
+    ) -> dict:
+        """Sample candidate outputs concurrently and resolve the first one that is valid.
+
+        The providers supporting the `n` parameter sample the candidates in a single request,
+        the others in parallel requests, each in a thread of its own, and the pending
+        requests are abandoned once a candidate parses and validates. If none does, the
+        first candidate goes through the output fix loop.
+        """
+        messages, params = engine.get_messages(), engine.request_params()
+        outputs: List[str] = []
+        if self.SUPPORTS_N:
+            for output in self.sample(messages, params, engine.candidates):
+                outputs.append(output)
+                with contextlib.suppress(Exception):
+                    result = engine.resolve(output, _globals, _locals, local_only=True)
+                    metrics.record_candidates(self.model_name, len(outputs) - 1, True)
+                    return result
+        else:
+            error: Optional[Exception] = None
+            futures = [
+                start_thread(self, messages, params, name="semantix-candidates")
+                for _ in range(engine.candidates)
+            ]
+            for future in as_completed(futures):
+                try:
+                    output = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                outputs.append(output)
+                with contextlib.suppress(Exception):
+                    result = engine.resolve(output, _globals, _locals, local_only=True)
+                    metrics.record_candidates(self.model_name, len(outputs) - 1, True)
+                    return result
+            if not outputs and error is not None:
+                raise error
+        metrics.record_candidates(self.model_name, len(outputs), False)
+        return engine.resolve(outputs[0], _globals, _locals, local_only)
+
+    def run_react(
+        self,
+        engine: "InferenceEngine",
+        _globals: dict,
+        _locals: Mapping[str, Any],
+        local_only: bool = False,
+    ) -> dict:
+        """Run the ReAct loop: call the tools the model asks for until it gives the output.
+
+        The tool calls of a step run concurrently, and their observations are sent back to
+        the model. After `engine.max_steps` steps, the model is asked for the output. The
+        steps are returned in the `steps` section, as `ReActOutput` objects.
+        """
+        tools = {tool.func.__name__: tool for tool in engine.prompt_info.tools}
+        messages, params = engine.get_messages(), engine.request_params()
+        steps: List[ReActOutput] = []
+        for step in range(engine.max_steps):
+            model_output = self(messages, params)
+            with profiler.span("parse"):
+                blocks = scan_blocks(model_output)
+            action = blocks.get("action", "").strip()
+            if not action:
+                break
+            if self.verbose:
+                logger.info(f"Step {step + 1}: {action}")
+            with profiler.span("tool", f"step {step + 1}"):
+                calls = parse_tool_calls(action, tools, _globals, _locals)
+                observation = "\n".join(run_tool_calls(calls, engine.step_timeout))
+            if self.verbose:
+                logger.info(f"Observations\n{observation}")
+            steps.append(
+                ReActOutput(blocks.get("thought", "").strip(), action, observation)
+            )
+            messages.append(
+                self.Message(self.ASSISTANT_ROLE, self.Message.Content([model_output]))
+            )
+            messages.append(
+                self.Message(
+                    self.USER_ROLE,
+                    self.Message.Content(
+                        [observation], self.get_message_desc("observations")
+                    ),
+                )
+            )
+        else:
+            messages.append(
+                self.Message(
+                    self.USER_ROLE, self.Message.Content([self.REACT_FINAL_INSTRUCTION])
+                )
+            )
+            model_output = self(messages, params)
+        result = engine.resolve(model_output, _globals, _locals, local_only)
+        result["steps"] = steps
+        return result
 
     def simplify_messages(self, messages: List[dict]) -> List[dict]:
-        """Simplify the messages by combining consecutive messages from the same role."""
+        """Simplify the messages by combining consecutive messages from the same role.
+
+        The given messages are left untouched, so the same messages can be sent again
+        (e.g. by a hedged request or another model).
+        """
         new_msgs: List[dict] = []
         for msg in messages:
-            if not new_msgs:
-                new_msgs.append(msg)
-            elif isinstance(msg["content"], str):
-                last_msg = new_msgs[-1]
-                if last_msg["role"] == msg["role"] and isinstance(
-                    last_msg["content"], str
-                ):
-                    last_msg["content"] = "\n".join(
-                        [last_msg["content"], msg["content"]]
-                    )
-                else:
-                    new_msgs.append(msg)
+            last_msg = new_msgs[-1] if new_msgs else None
+            if (
+                last_msg is not None
+                and last_msg["role"] == msg["role"]
+                and isinstance(msg["content"], str)
+                and isinstance(last_msg["content"], str)
+            ):
+                last_msg["content"] = "\n".join([last_msg["content"], msg["content"]])
             else:
-                new_msgs.append(msg)
+                new_msgs.append(dict(msg))
         return new_msgs
 
     def resolve_output(
@@ -320,49 +676,104 @@ class BaseLLM:
         extract_output_prompt_info: "ExtractOutputPromptInfo",
         output_fix_prompt_info: "OutputFixPromptInfo",
         _globals: dict,
-        _locals: dict,
+        _locals: Mapping[str, Any],
+        local_only: bool = False,
     ) -> dict:
-        """Resolve the output string to return the reasoning and output."""
+        """Resolve the output string to return the reasoning and output.
+
+        With `local_only`, the model is not asked to extract or fix the output and the
+        errors are raised instead.
+        """
         if self.verbose:
             logger.info(f"Model Output\n{model_output}")
-        outputs = dict(re.findall(r"```(.*?)\n(.*?)```", model_output, re.DOTALL))
+        with profiler.span("parse"):
+            outputs = scan_blocks(model_output)
         if "output" not in outputs:
+            if local_only:
+                raise ValueError("No output block in the model output.")
             output = self._extract_output(
                 model_output,
                 extract_output_prompt_info,
             )
         else:
             output = outputs["output"].strip()
-        obj = self.to_object(output, output_fix_prompt_info, _globals, _locals)
+        obj = self.to_object(
+            output, output_fix_prompt_info, _globals, _locals, local_only=local_only
+        )
         outputs["output"] = obj
         return outputs
 
+    def resolve_structured_output(
+        self,
+        model_output: str,
+        extract_output_prompt_info: "ExtractOutputPromptInfo",
+        output_fix_prompt_info: "OutputFixPromptInfo",
+        _globals: dict,
+        _locals: Mapping[str, Any],
+        local_only: bool = False,
+    ) -> dict:
+        """Decode the JSON response of the structured output mode.
+
+        Falls back to `resolve_output` if the model answered with an output block instead.
+        """
+        if self.verbose:
+            logger.info(f"Model Output\n{model_output}")
+        with profiler.span("parse"):
+            match = re.search(r"\{.*\}", model_output, re.DOTALL)
+        if match is None and "```output" in model_output:
+            return self.resolve_output(
+                model_output,
+                extract_output_prompt_info,
+                output_fix_prompt_info,
+                _globals,
+                _locals,
+                local_only,
+            )
+        if match is None:
+            raise ValueError("No JSON object in the model output.")
+        return_hint = output_fix_prompt_info.return_hint
+        with profiler.span("eval"):
+            data = json.loads(match.group(0))
+            output = from_json(data.pop("output"), return_hint.annotation)
+        with profiler.span("validation"):
+            output = validate_output(output, return_hint.annotation)
+        return {**data, "output": output}
+
     def _extract_output(
         self, model_output: str, extract_output_prompt_info: "ExtractOutputPromptInfo"
     ) -> str:
         """Extract the output from the model output."""
+        metrics.record_extract_loop()
         if self.verbose:
             logger.info("Extracting output from the model output.")
-        output_extract_messages = extract_output_prompt_info.get_messages(
-            self, model_output
-        )
-        _messages = [m.to_dict() for m in output_extract_messages]
-        output_extract_output = self.__infer__(_messages, {})
+        with profiler.span("prompt"):
+            output_extract_messages = extract_output_prompt_info.get_messages(
+                self, model_output
+            )
+            _messages = [m.to_dict() for m in output_extract_messages]
+        with profiler.span(profiler.NETWORK, self.model_name):
+            output_extract_output = self._send(_messages, {})
         if self.verbose:
             logger.info(f"Extracted Output: {output_extract_output}")
-        outputs = dict(re.findall(r"```(.*?)\n(.*?)```", model_output, re.DOTALL))
-        return outputs["output"].strip()
+        with profiler.span("parse"):
+            outputs = scan_blocks(output_extract_output, ["output"])
+        return outputs.get("output", output_extract_output).strip()
 
     def to_object(
         self,
         output: str,
         output_fix_prompt_info: "OutputFixPromptInfo",
         _globals: dict,
-        _locals: dict,
+        _locals: Mapping[str, Any],
         error: str = "",
         num_retries: int = 0,
+        local_only: bool = False,
     ) -> Any:  # noqa: ANN401
-        """Convert the output string to an object."""
+        """Convert the output string to an object.
+
+        With `local_only`, the model is not asked to fix the output and the parsing error is
+        raised instead.
+        """
         if output_fix_prompt_info.return_hint.type == "str":
             return output
         if num_retries >= self.max_retries:
@@ -378,8 +789,16 @@ class BaseLLM:
                 num_retries=num_retries + 1,
             )
         try:
-            return eval(output, _globals, _locals)
+            return self.parse_output(
+                output, output_fix_prompt_info.return_hint, _globals, _locals
+            )
         except Exception as e:
+            with contextlib.suppress(Exception):
+                return self.repair_output(
+                    output, output_fix_prompt_info, _globals, _locals, e
+                )
+            if local_only:
+                raise
             if num_retries == self.max_retries - 1:
                 traceback_str = traceback.format_exc()
                 error_str = "\n".join([traceback_str, str(e)])
@@ -394,21 +813,71 @@ class BaseLLM:
                 num_retries=num_retries + 1,
             )
 
+    def parse_output(
+        self,
+        output: str,
+        return_hint: "OutputHint",
+        _globals: dict,
+        _locals: Mapping[str, Any],
+    ) -> Any:  # noqa: ANN401
+        """Convert the output string to an object, without asking the model to fix it."""
+        if return_hint.type == "str":
+            return output
+        with profiler.span("eval"):
+            obj = eval(output, _globals, _locals)
+        with profiler.span("validation"):
+            if return_hint.enum_indices:
+                obj = decode_enum_indices(obj, return_hint.annotation)
+            return validate_output(obj, return_hint.annotation)
+
+    def repair_output(
+        self,
+        output: str,
+        output_fix_prompt_info: "OutputFixPromptInfo",
+        _globals: dict,
+        _locals: Mapping[str, Any],
+        error: Exception,
+    ) -> Any:  # noqa: ANN401
+        """Repair the output locally and convert it to an object, without asking the model.
+
+        Raises:
+            ValueError: If the local repairs do not make the output parse.
+        """
+        if self.repair_pipeline is None:
+            raise ValueError("Local repair is disabled.")
+        return_hint = output_fix_prompt_info.return_hint
+        context = RepairContext(
+            error,
+            return_hint,
+            output_fix_prompt_info.type_explanations,
+            _globals,
+            _locals,
+        )
+        return self.repair_pipeline.run(
+            output,
+            lambda text: self.parse_output(text, return_hint, _globals, _locals),
+            context,
+        )
+
     def _fix_output(
         self, output: str, output_fix_prompt_info: "OutputFixPromptInfo", error: str
     ) -> str:
         """Fix the output string."""
+        metrics.record_fix_loop()
         if self.verbose:
             logger.info(f"Error: {error}, Fixing the output.")
-        output_fix_messages = [
-            m.to_dict()
-            for m in output_fix_prompt_info.get_messages(self, output, error)
-        ]
-        output_fix_output = self.__infer__(output_fix_messages, {})
+        with profiler.span("prompt"):
+            output_fix_messages = [
+                m.to_dict()
+                for m in output_fix_prompt_info.get_messages(self, output, error)
+            ]
+        with profiler.span(profiler.NETWORK, self.model_name):
+            output_fix_output = self._send(output_fix_messages, {})
         if self.verbose:
             logger.info(f"Fixed Output: {output_fix_output}")
-        outputs = dict(re.findall(r"```(.*?)\n(.*?)```", output_fix_output, re.DOTALL))
-        return outputs["output"].strip()
+        with profiler.span("parse"):
+            outputs = scan_blocks(output_fix_output, ["output"])
+        return outputs.get("output", output_fix_output).strip()
 
     def enhance(
         self,
@@ -420,6 +889,18 @@ class BaseLLM:
         tools: List[Union[Callable, Tool]] = [],
         retries: int = 2,
         return_additional_info: bool = False,
+        batch_size: int = 1,
+        batch_window_ms: float = 10,
+        coalesce: bool = False,
+        cache: Optional["NearDuplicateCache"] = None,
+        structured_output: bool = False,
+        candidates: int = 1,
+        media_pool: Optional["MediaPool"] = None,
+        max_steps: int = 5,
+        step_timeout: Optional[float] = None,
+        compact_prompt: bool = False,
+        field_docs: bool = True,
+        enum_indices: bool = False,
         **kwargs: dict,
     ) -> Callable:
         """Convert a function into a semantic function with enhanced LLM capabilities.
@@ -431,6 +912,18 @@ class BaseLLM:
             tools (List[Union[Callable, Tool]], optional): A list of functions or Tool objects that the LLM can use. Defaults to [].
             retries (int, optional): The number of retry attempts for LLM operations. Defaults to 2.
             return_additional_info (bool, optional): Whether to return the output and additional information. Defaults to False.
+            batch_size (int, optional): The maximum number of concurrent calls packed into one LLM request. Defaults to 1 (no batching).
+            batch_window_ms (float, optional): How long a call waits for other calls to join its batch. Defaults to 10.
+            coalesce (bool, optional): Whether identical concurrent calls share a single LLM request. Defaults to False.
+            cache (NearDuplicateCache, optional): The cache serving the outputs of calls with near-duplicate inputs. Defaults to None.
+            structured_output (bool, optional): Whether the model answers with JSON matching the schema of the return type, using the native structured output of the provider when available. Defaults to False.
+            candidates (int, optional): The number of candidate outputs sampled concurrently. The first one that parses and validates is returned. Defaults to 1.
+            media_pool (MediaPool, optional): The process pool preparing the images and videos of the inputs ahead of the requests. Defaults to None.
+            max_steps (int, optional): The maximum number of tool calling steps of the ReAct method, after which the model is asked for the output. Defaults to 5.
+            step_timeout (float, optional): The number of seconds a ReAct step waits for its tool calls, which run concurrently. Defaults to None (no timeout).
+            compact_prompt (bool, optional): Whether the type definitions and the inputs are written in a compact form, with fewer tokens. Defaults to False.
+            field_docs (bool, optional): Whether the meaning of the fields is given in the compact type definitions. Defaults to True.
+            enum_indices (bool, optional): Whether the Enum members of the output are numbered in the prompt and written as their index by the model. Defaults to False.
             **kwargs (dict): Additional keyword arguments to be passed to the LLM.
 
         Returns:
@@ -465,77 +958,34 @@ class BaseLLM:
             raise Exception(
                 "Cannot get the previous frame."
             )  # Don't know whether this will happen
+        namespace = Namespace.from_frame(frame)
+        del frame, curr_frame
         model_params = kwargs
 
         def decorator(func: Callable) -> Callable:
-            def wrapper(**kwargs: dict) -> Any:  # noqa
-                informations = []
-                for i in info:
-                    var_name, semstr = get_semstr(frame, i)
-                    informations.append(Information(semstr, var_name, i))
-                _tools = [
-                    tool if isinstance(tool, Tool) else Tool(tool) for tool in tools
-                ]
-                input_informations = []
-                return_hint: OutputHint
-                for param, annotation in func.__annotations__.items():
-                    if isinstance(annotation, type) and issubclass(
-                        annotation, Semantic
-                    ):
-                        if param == "return":
-                            return_hint = OutputHint(
-                                annotation._meaning, annotation.wrapped_type
-                            )
-                            continue
-                        input_informations.append(
-                            Information(annotation._meaning, param, kwargs[param])
-                        )
-                    else:
-                        if param == "return":
-                            return_hint = OutputHint("", annotation)
-                            continue
-                        input_informations.append(Information("", param, kwargs[param]))
-                assert (
-                    return_hint
-                ), "Return type is not defined. Please define the return type."
-                action = f"{meaning} ({func.__name__})"
-                context = func.__doc__ if func.__doc__ else ""
-
-                types = set()
-                for i in [
-                    *informations,
-                    *input_informations,
-                    return_hint if return_hint else [],
-                ]:
-                    types.update(i.get_types())  # type: ignore
-                type_explanations = [TypeExplanation(frame, t) for t in types]
-                for t in type_explanations:
-                    types.update(t.get_nested_types())
-                type_explanations = [TypeExplanation(frame, t) for t in types]
-
-                inference_engine = InferenceEngine(
-                    model=self,
-                    method=method,
-                    prompt_info=PromptInfo(
-                        action=action,
-                        context=context,
-                        informations=informations,
-                        input_informations=input_informations,
-                        tools=_tools,
-                        return_hint=return_hint,
-                        type_explanations=type_explanations,
-                    ),
-                    extract_output_prompt_info=ExtractOutputPromptInfo(
-                        return_hint=return_hint, type_explanations=type_explanations
-                    ),
-                    output_fix_prompt_info=OutputFixPromptInfo(
-                        return_hint=return_hint,
-                        type_explanations=type_explanations,
-                    ),
-                    model_params=model_params,
-                )
-                return inference_engine.run(frame, retries + 1, return_additional_info)
-
-            return wrapper
+            return EnhancedFunction(
+                func=func,
+                namespace=namespace,
+                model=self,
+                meaning=meaning,
+                info=info,
+                method=method,
+                tools=tools,
+                retries=retries,
+                return_additional_info=return_additional_info,
+                model_params=model_params,
+                batch_size=batch_size,
+                batch_window_ms=batch_window_ms,
+                coalesce=coalesce,
+                cache=cache,
+                structured_output=structured_output,
+                candidates=candidates,
+                media_pool=media_pool,
+                max_steps=max_steps,
+                step_timeout=step_timeout,
+                compact_prompt=compact_prompt,
+                field_docs=field_docs,
+                enum_indices=enum_indices,
+            )
 
         return decorator
@@ -0,0 +1,650 @@
+"""In-process metrics for enhanced functions, exposed in the Prometheus text format.
+
+The inference path updates the default registry automatically. Use `generate_latest`
+to render the metrics or `start_http_server` to serve them over HTTP.
+
+Example:
+```python
+from semantix import metrics
+
+metrics.start_http_server(9100)  # GET http://localhost:9100/metrics
+print(metrics.generate_latest())
+```
+"""
+
+import contextlib
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, TYPE_CHECKING, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+_call_labels: ContextVar[Tuple[str, str]] = ContextVar(
+    "semantix_call_labels", default=("", "")
+)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format the label set of a sample."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Base class for the metrics in the registry."""
+
+    TYPE = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        """Initialize the metric."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """Get the label values tuple for the given labels."""
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        """Get the sample lines of the metric."""
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """Reset the metric."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the metric in the Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.TYPE}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    TYPE = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        """Initialize the counter."""
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increment the counter."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        """Get the current value of the counter."""
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        """Get the sample lines of the counter."""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in values
+        ]
+
+    def reset(self) -> None:
+        """Reset the counter."""
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge to the given value."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class _ShardOwner:
+    """Marker kept in a thread-local next to a shard, to find out when its thread ends."""
+
+
+def _release_shard(ref: "weakref.ref[HdrHistogram]", shard: List) -> None:
+    """Release the shard of a finished thread, if its histogram still exists."""
+    histogram = ref()
+    if histogram is not None:
+        histogram._release(shard)
+
+
+class HdrHistogram:
+    """Log-linear (HDR-style) histogram of non-negative values.
+
+    Values are recorded in integer units of `resolution`. Values below `2 ** precision`
+    units are counted exactly, larger values land in buckets with a relative width of
+    `2 ** (1 - precision)`. Every thread records into its own shard, so recording never
+    takes a lock; shards are merged when the histogram is read. The shard of a finished
+    thread is folded into a shared base shard, so short-lived threads do not pile up.
+    """
+
+    def __init__(self, precision: int = 5, resolution: float = 1e-6) -> None:
+        """Initialize the histogram."""
+        self.precision = precision
+        self.resolution = resolution
+        self._local = threading.local()
+        self._base: List = [{}, 0, 0.0]  # bucket counts, count, sum
+        self._shards: List[List] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> List:
+        """Get the shard of the current thread."""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [{}, 0, 0.0]
+            self._local.shard = shard
+            # The thread-local values are dropped when the thread finishes
+            self._local.owner = owner = _ShardOwner()
+            weakref.finalize(owner, _release_shard, weakref.ref(self), shard)
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _release(self, shard: List) -> None:
+        """Fold the shard of a finished thread into the base shard."""
+        with self._lock:
+            counts = self._base[0]
+            for index, c in shard[0].items():
+                counts[index] = counts.get(index, 0) + c
+            self._base[1] += shard[1]
+            self._base[2] += shard[2]
+            self._shards.remove(shard)
+
+    def _index(self, units: int) -> int:
+        """Get the bucket index of a value."""
+        p = self.precision
+        if units < (1 << p):
+            return units
+        shift = units.bit_length() - p
+        return (
+            (1 << p) + (shift - 1) * (1 << (p - 1)) + (units >> shift) - (1 << (p - 1))
+        )
+
+    def _upper_bound(self, index: int) -> float:
+        """Get the (exclusive) upper bound of a bucket in value units."""
+        p = self.precision
+        if index < (1 << p):
+            return (index + 1) * self.resolution
+        shift, offset = divmod(index - (1 << p), 1 << (p - 1))
+        shift += 1
+        return (((1 << (p - 1)) + offset + 1) << shift) * self.resolution
+
+    def record(self, value: float) -> None:
+        """Record a value."""
+        units = max(int(value / self.resolution), 0)
+        shard = self._shard()
+        counts = shard[0]
+        index = self._index(units)
+        counts[index] = counts.get(index, 0) + 1
+        shard[1] += 1
+        shard[2] += value
+
+    def snapshot(self) -> Tuple[Dict[int, int], int, float]:
+        """Get the merged bucket counts, count and sum of the histogram."""
+        merged: Dict[int, int] = {}
+        count, total = 0, 0.0
+        with self._lock:
+            shards = [[dict(self._base[0]), self._base[1], self._base[2]]]
+            shards.extend(self._shards)
+        for counts, shard_count, shard_sum in shards:
+            for index, c in list(counts.items()):
+                merged[index] = merged.get(index, 0) + c
+            count += shard_count
+            total += shard_sum
+        return merged, count, total
+
+    @property
+    def count(self) -> int:
+        """Get the number of recorded values."""
+        return self.snapshot()[1]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Get the estimated value at the given quantile, between 0 and 1."""
+        counts, count, _ = self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index in sorted(counts):
+            seen += counts[index]
+            if seen >= rank:
+                return self._upper_bound(index)
+        return self._upper_bound(max(counts))
+
+    def cumulative(self, bounds: Sequence[float]) -> List[int]:
+        """Get the cumulative counts of values below each of the given bounds."""
+        counts, _, _ = self.snapshot()
+        result = []
+        for bound in bounds:
+            result.append(
+                sum(c for i, c in counts.items() if self._upper_bound(i) <= bound)
+            )
+        return result
+
+
+class Histogram(Metric):
+    """Latency histogram backed by HDR-style buckets."""
+
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Initialize the histogram."""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], HdrHistogram] = {}
+
+    def labels(self, **labels: str) -> HdrHistogram:
+        """Get the underlying histogram for the given labels."""
+        key = self._key(labels)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, HdrHistogram())
+        return child
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation."""
+        self.labels(**labels).record(value)
+
+    def samples(self) -> List[str]:
+        """Get the sample lines of the histogram."""
+        lines = []
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            _, count, total = child.snapshot()
+            names = (*self.labelnames, "le")
+            for bound, cumulative in zip(self.buckets, child.cumulative(self.buckets)):
+                labels = _format_labels(names, (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(names, (*key, "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def reset(self) -> None:
+        """Reset the histogram."""
+        with self._lock:
+            self._children.clear()
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Register a metric, returning the already registered one with the same name."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        """Create or get a counter."""
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        """Create or get a gauge."""
+        return self.register(Gauge(name, documentation, labelnames))  # type: ignore
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create or get a histogram."""
+        return self.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore
+
+    def get(self, name: str) -> Optional[Metric]:
+        """Get a registered metric by name."""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all the metrics in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+    def reset(self) -> None:
+        """Reset all the metrics."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            m.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+CALLS = REGISTRY.counter(
+    "semantix_calls_total",
+    "Number of enhanced function calls.",
+    ("function", "model"),
+)
+ERRORS = REGISTRY.counter(
+    "semantix_errors_total",
+    "Number of failed enhanced function calls, by error class.",
+    ("function", "model", "error"),
+)
+RETRIES = REGISTRY.counter(
+    "semantix_retries_total",
+    "Number of failed attempts of enhanced function calls that were retried, by error class.",
+    ("function", "model", "error"),
+)
+FIX_LOOPS = REGISTRY.counter(
+    "semantix_fix_loops_total",
+    "Number of LLM output fix requests.",
+    ("function", "model"),
+)
+EXTRACT_LOOPS = REGISTRY.counter(
+    "semantix_extract_loops_total",
+    "Number of LLM output extraction requests.",
+    ("function", "model"),
+)
+LATENCY = REGISTRY.histogram(
+    "semantix_call_latency_seconds",
+    "Latency of enhanced function calls in seconds.",
+    ("function", "model"),
+)
+CACHE = REGISTRY.counter(
+    "semantix_cache_requests_total",
+    "Number of cache lookups, by result (hit or miss).",
+    ("function", "cache", "result"),
+)
+TOKENS = REGISTRY.counter(
+    "semantix_tokens_total",
+    "Number of tokens consumed, by kind (prompt or completion).",
+    ("function", "model", "kind"),
+)
+COALESCED = REGISTRY.counter(
+    "semantix_coalesced_calls_total",
+    "Number of calls served by an identical call already in flight.",
+    ("function",),
+)
+ESCALATIONS = REGISTRY.counter(
+    "semantix_cascade_escalations_total",
+    "Number of calls escalated from a tier of a cascade, by reason.",
+    ("function", "model", "reason"),
+)
+HEDGES = REGISTRY.counter(
+    "semantix_hedged_requests_total",
+    "Number of duplicate requests sent for slow requests, by result.",
+    ("function", "model", "result"),
+)
+CANDIDATES = REGISTRY.counter(
+    "semantix_candidates_total",
+    "Number of sampled candidate outputs, by result.",
+    ("function", "model", "result"),
+)
+CIRCUIT_STATE = REGISTRY.gauge(
+    "semantix_circuit_state",
+    "State of the circuit breakers: 0 closed, 1 half-open, 2 open.",
+    ("circuit",),
+)
+TOOL_CALLS = REGISTRY.counter(
+    "semantix_tool_calls_total",
+    "Number of tool calls of the ReAct method, by result.",
+    ("function", "tool", "result"),
+)
+ENDPOINT_REQUESTS = REGISTRY.counter(
+    "semantix_endpoint_requests_total",
+    "Number of requests sent to the endpoints of a pool, by result.",
+    ("endpoint", "result"),
+)
+ENDPOINT_UP = REGISTRY.gauge(
+    "semantix_endpoint_up",
+    "Whether the endpoints of a pool are admitted (1) or ejected (0).",
+    ("endpoint",),
+)
+LOCAL_REPAIRS = REGISTRY.counter(
+    "semantix_local_repairs_total",
+    "Number of outputs repaired locally, each one an LLM output fix avoided.",
+    ("function", "model", "repair"),
+)
+
+
+def current_labels() -> Tuple[str, str]:
+    """Get the (function, model) labels of the enhanced call in progress."""
+    return _call_labels.get()
+
+
+@contextlib.contextmanager
+def call_labels(function: str, model: str) -> Iterator[None]:
+    """Label the metrics recorded inside the context with the given call."""
+    token = _call_labels.set((function, model))
+    try:
+        yield
+    finally:
+        _call_labels.reset(token)
+
+
+@contextlib.contextmanager
+def track_call(function: str, model: str) -> Iterator[None]:
+    """Track an enhanced function call: count it, time it and count escaping errors."""
+    with call_labels(function, model):
+        start_call(function, model)
+        start = time.perf_counter()
+        error: Optional[BaseException] = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            finish_call(function, model, time.perf_counter() - start, error)
+
+
+def start_call(function: str, model: str) -> None:
+    """Count an enhanced function call tracked without `track_call`, like a streamed one."""
+    CALLS.inc(function=function, model=model)
+
+
+def finish_call(
+    function: str, model: str, duration: float, error: Optional[BaseException] = None
+) -> None:
+    """Record the latency of a finished call and the error that escaped it, if any."""
+    if error is not None:
+        ERRORS.inc(function=function, model=model, error=type(error).__name__)
+    LATENCY.observe(duration, function=function, model=model)
+
+
+def record_retry(error: BaseException) -> None:
+    """Record a failed attempt of the enhanced call in progress that is retried.
+
+    The errors escaping the call are counted by `track_call`, so every failed call counts
+    once in `semantix_errors_total` however many attempts it took.
+    """
+    function, model = current_labels()
+    RETRIES.inc(function=function, model=model, error=type(error).__name__)
+
+
+def record_fix_loop() -> None:
+    """Record an output fix request of the enhanced call in progress."""
+    function, model = current_labels()
+    FIX_LOOPS.inc(function=function, model=model)
+
+
+def record_extract_loop() -> None:
+    """Record an output extraction request of the enhanced call in progress."""
+    function, model = current_labels()
+    EXTRACT_LOOPS.inc(function=function, model=model)
+
+
+def record_local_repair(repair: str) -> None:
+    """Record an output repaired locally instead of by an LLM output fix."""
+    function, model = current_labels()
+    LOCAL_REPAIRS.inc(function=function, model=model, repair=repair)
+
+
+def record_escalation(model: str, reason: str) -> None:
+    """Record a call escalated from a tier of a cascade."""
+    ESCALATIONS.inc(function=current_labels()[0], model=model, reason=reason)
+
+
+def record_hedge(model: str, won: bool) -> None:
+    """Record a duplicate request sent for a slow request."""
+    HEDGES.inc(
+        function=current_labels()[0], model=model, result="won" if won else "lost"
+    )
+
+
+def record_candidates(model: str, rejected: int, accepted: bool) -> None:
+    """Record the candidate outputs examined for a call."""
+    function = current_labels()[0]
+    if rejected:
+        CANDIDATES.inc(rejected, function=function, model=model, result="rejected")
+    if accepted:
+        CANDIDATES.inc(function=function, model=model, result="accepted")
+
+
+def record_tool_call(tool: str, result: str) -> None:
+    """Record a tool call of the ReAct method."""
+    TOOL_CALLS.inc(function=current_labels()[0], tool=tool, result=result)
+
+
+def record_circuit_state(circuit: str, state: int) -> None:
+    """Record the state of a circuit breaker."""
+    CIRCUIT_STATE.set(state, circuit=circuit)
+
+
+def record_endpoint_request(endpoint: str, result: str) -> None:
+    """Record a request sent to an endpoint of a pool."""
+    ENDPOINT_REQUESTS.inc(endpoint=endpoint, result=result)
+
+
+def record_endpoint_state(endpoint: str, up: bool) -> None:
+    """Record whether an endpoint of a pool is admitted or ejected."""
+    ENDPOINT_UP.set(1 if up else 0, endpoint=endpoint)
+
+
+def record_cache(cache: str, hit: bool, function: str = "") -> None:
+    """Record a cache lookup."""
+    function = function or current_labels()[0]
+    CACHE.inc(function=function, cache=cache, result="hit" if hit else "miss")
+
+
+def record_coalesced(function: str = "") -> None:
+    """Record a call coalesced with an identical call in flight."""
+    COALESCED.inc(function=function or current_labels()[0])
+
+
+def record_tokens(model: str, prompt_tokens: int, completion_tokens: int) -> None:
+    """Record the token usage of a model request."""
+    function = current_labels()[0]
+    if prompt_tokens:
+        TOKENS.inc(prompt_tokens, function=function, model=model, kind="prompt")
+    if completion_tokens:
+        TOKENS.inc(completion_tokens, function=function, model=model, kind="completion")
+
+
+def generate_latest(registry: MetricsRegistry = REGISTRY) -> str:
+    """Render the metrics of the registry in the Prometheus text format."""
+    return registry.render()
+
+
+def start_http_server(
+    port: int, addr: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY
+) -> "ThreadingHTTPServer":
+    """Serve the metrics on `http://<addr>:<port>/metrics` from a daemon thread.
+
+    Args:
+        port (int): The port to listen on. Use 0 to pick a free port.
+        addr (str, optional): The address to bind to. Defaults to "0.0.0.0".
+        registry (MetricsRegistry, optional): The registry to serve. Defaults to the default registry.
+
+    Returns:
+        ThreadingHTTPServer: The running server. Call `shutdown()` to stop it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Request handler serving the metrics."""
+
+        def do_GET(self) -> None:  # noqa: N802
+            """Serve the metrics."""
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = generate_latest(registry).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            """Silence the request logs."""
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
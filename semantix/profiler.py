@@ -0,0 +1,296 @@
+"""Profiler to find where the time of enhanced function calls is spent.
+
+Every enhanced call made inside `semantix.profile()` is captured as a timeline of spans.
+The report splits the wall time of each function into network wait (LLM requests) and
+local work done by the library (prompt building, type explanations, media processing,
+output parsing, etc.).
+
+Example:
+```python
+import semantix as sx
+
+with sx.profile() as prof:
+    get_person_info(name="Albert Einstein")
+
+print(prof)
+prof.to_chrome_trace("trace.json")  # Open with chrome://tracing or ui.perfetto.dev
+```
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from semantix import metrics
+
+NETWORK = "network"
+CALL = "call"
+
+_active: ContextVar[Optional["Profile"]] = ContextVar("semantix_profile", default=None)
+
+
+class Span:
+    """Class to represent a timed span of work."""
+
+    def __init__(
+        self, category: str, name: str, function: str, start: float, tid: int
+    ) -> None:
+        """Initializes the Span class."""
+        self.category = category
+        self.name = name
+        self.function = function
+        self.start = start
+        self.end = start
+        self.tid = tid
+        self.child_time = 0.0
+
+    @property
+    def duration(self) -> float:
+        """Get the duration of the span in seconds."""
+        return self.end - self.start
+
+    @property
+    def self_time(self) -> float:
+        """Get the duration of the span excluding its child spans."""
+        return self.duration - self.child_time
+
+
+class Profile:
+    """Class to collect the spans of the enhanced calls made inside `semantix.profile()`."""
+
+    def __init__(self) -> None:
+        """Initializes the Profile class."""
+        self.spans: List[Span] = []
+        self.origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[Span]:
+        """Get the span stack of the current thread."""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def new_span(self, category: str, name: str) -> Span:
+        """Create a span starting now, without opening it."""
+        return Span(
+            category,
+            name or category,
+            metrics.current_labels()[0],
+            time.perf_counter(),
+            threading.get_ident(),
+        )
+
+    def enter(self, category: str, name: str) -> Span:
+        """Open a span."""
+        s = self.new_span(category, name)
+        self._stack().append(s)
+        return s
+
+    def exit(self, s: Span) -> None:
+        """Close a span."""
+        s.end = time.perf_counter()
+        stack = self._stack()
+        stack.pop()
+        if stack:
+            stack[-1].child_time += s.duration
+        with self._lock:
+            self.spans.append(s)
+
+    def resume(self, s: Span) -> float:
+        """Resume a span for a step of its work, returning the start of the step."""
+        self._stack().append(s)
+        return time.perf_counter()
+
+    def suspend(self, s: Span, started: float) -> float:
+        """Suspend a span after a step of its work, returning the duration of the step."""
+        elapsed = time.perf_counter() - started
+        stack = self._stack()
+        stack.pop()
+        if stack:
+            stack[-1].child_time += elapsed
+        return elapsed
+
+    def record(self, s: Span) -> None:
+        """Record a finished span."""
+        with self._lock:
+            self.spans.append(s)
+
+    def report(self) -> Dict[str, Any]:
+        """Get the time breakdown of every profiled function.
+
+        Returns:
+            dict: Per function, the number of calls, the wall time, the network time, the local
+                time and the local time broken down by category (in seconds).
+        """
+        functions: Dict[str, Dict[str, Any]] = {}
+        for s in sorted(self.spans, key=lambda x: x.start):
+            entry = functions.setdefault(
+                s.function or "<unknown>",
+                {"calls": 0, "wall": 0.0, NETWORK: 0.0, "local": 0.0, "breakdown": {}},
+            )
+            if s.category == CALL:
+                entry["calls"] += 1
+                entry["wall"] += s.duration
+                entry["breakdown"]["other"] = (
+                    entry["breakdown"].get("other", 0.0) + s.self_time
+                )
+            elif s.category == NETWORK:
+                entry[NETWORK] += s.self_time
+            else:
+                entry["breakdown"][s.category] = (
+                    entry["breakdown"].get(s.category, 0.0) + s.self_time
+                )
+        for entry in functions.values():
+            entry["local"] = entry["wall"] - entry[NETWORK]
+        return {"functions": functions}
+
+    def to_json(self, path: str = "") -> str:
+        """Export the report as JSON, writing it to `path` if given."""
+        data = json.dumps(self.report(), indent=2)
+        if path:
+            with open(path, "w") as file:
+                file.write(data)
+        return data
+
+    def to_chrome_trace(self, path: str = "") -> str:
+        """Export the spans in the Chrome trace-event format, writing them to `path` if given."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": (s.start - self.origin) * 1e6,
+                "dur": s.duration * 1e6,
+                "pid": pid,
+                "tid": s.tid,
+                "args": {"function": s.function},
+            }
+            for s in sorted(self.spans, key=lambda x: x.start)
+        ]
+        data = json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+        if path:
+            with open(path, "w") as file:
+                file.write(data)
+        return data
+
+    def __str__(self) -> str:
+        """Get a table of the time breakdown of every profiled function."""
+        lines = [
+            f"{'function':<30} {'calls':>6} {'wall(s)':>10} {'network(s)':>11} {'local(s)':>10}  breakdown"
+        ]
+        for name, entry in self.report()["functions"].items():
+            breakdown = ", ".join(
+                f"{k}={v:.4f}"
+                for k, v in sorted(entry["breakdown"].items(), key=lambda x: -x[1])
+            )
+            lines.append(
+                f"{name:<30} {entry['calls']:>6} {entry['wall']:>10.4f} {entry[NETWORK]:>11.4f} "
+                f"{entry['local']:>10.4f}  {breakdown}"
+            )
+        return "\n".join(lines)
+
+
+class _NullSpan:
+    """Span used when no profile is active."""
+
+    def __enter__(self) -> None:
+        """Enter the span."""
+
+    def __exit__(self, *args: object) -> None:
+        """Exit the span."""
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _ActiveSpan:
+    """Span recorded in the active profile."""
+
+    def __init__(self, prof: Profile, category: str, name: str) -> None:
+        """Initialize the span."""
+        self.prof = prof
+        self.category = category
+        self.name = name
+
+    def __enter__(self) -> None:
+        """Enter the span."""
+        self.span = self.prof.enter(self.category, self.name)
+
+    def __exit__(self, *args: object) -> None:
+        """Exit the span."""
+        self.prof.exit(self.span)
+
+
+class StepSpan:
+    """Span timed over separate steps, like the reads of a streamed response.
+
+    Nothing is held open between the steps, so the span can be left between them (e.g.
+    across the yields of a generator) and finished from any thread. Its duration is the
+    total time of its steps.
+    """
+
+    def __init__(self, category: str, name: str = "") -> None:
+        """Initializes the StepSpan class.
+
+        Args:
+            category (str): The category of the span.
+            name (str, optional): The name of the span. Defaults to the category.
+        """
+        self.prof = _active.get()
+        self.category = category
+        self.name = name
+        self.span: Optional[Span] = None
+        self.elapsed = 0.0
+
+    @contextlib.contextmanager
+    def step(self) -> Iterator[None]:
+        """Time the enclosed block as a step of the span."""
+        if self.prof is None:
+            yield
+            return
+        if self.span is None:
+            self.span = self.prof.new_span(self.category, self.name)
+        started = self.prof.resume(self.span)
+        try:
+            yield
+        finally:
+            self.elapsed += self.prof.suspend(self.span, started)
+
+    def finish(self) -> None:
+        """Record the span, if any step was timed."""
+        if self.prof is None or self.span is None:
+            return
+        self.span.end = self.span.start + self.elapsed
+        self.prof.record(self.span)
+        self.span = None
+
+
+def span(category: str, name: str = "") -> Any:  # noqa: ANN401
+    """Time the enclosed block as a span of the given category when profiling."""
+    prof = _active.get()
+    if prof is None:
+        return _NULL_SPAN
+    return _ActiveSpan(prof, category, name)
+
+
+@contextlib.contextmanager
+def profile() -> Iterator[Profile]:
+    """Capture every enhanced call made inside the context.
+
+    Yields:
+        Profile: The profile collecting the spans. Use `report()`, `to_json()` or
+            `to_chrome_trace()` after the context exits.
+    """
+    prof = Profile()
+    token = _active.set(prof)
+    try:
+        yield prof
+    finally:
+        _active.reset(token)
@@ -0,0 +1,174 @@
+"""Tool calls of the ReAct method.
+
+At every step of a ReAct call the model reasons in a `thought` block, then either calls
+tools in an `action` block, one call per line, or answers in the `output` block. The calls
+of a step are independent, so they run concurrently in a thread pool of the step (the
+coroutine functions on an event loop of their worker thread) within the timeout of the
+step. Their results, or their errors, are sent back to the model as observations.
+
+The tools are looked up by name among the tools of the enhanced function, the model never
+calls anything else. The arguments are evaluated like the outputs, in the namespace of
+the function, so they can be instances of the types of the prompt.
+"""
+
+import ast
+import asyncio
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Mapping, Optional
+
+from semantix import metrics
+from semantix.types.prompt import Tool
+from semantix.utils.utils import get_object_string
+
+
+class ToolCall:
+    """Class to represent a tool call requested by the model."""
+
+    def __init__(
+        self,
+        source: str,
+        tool: Optional[Tool] = None,
+        args: Optional[list] = None,
+        kwargs: Optional[dict] = None,
+        error: str = "",
+    ) -> None:
+        """Initializes the ToolCall class.
+
+        Args:
+            source (str): The call as written by the model.
+            tool (Tool, optional): The called tool. Defaults to None (invalid call).
+            args (list, optional): The positional arguments. Defaults to None.
+            kwargs (dict, optional): The keyword arguments. Defaults to None.
+            error (str, optional): Why the call cannot run. Defaults to "".
+        """
+        self.source = source
+        self.tool = tool
+        self.args = args or []
+        self.kwargs = kwargs or {}
+        self.error = error
+
+    @property
+    def name(self) -> str:
+        """Get the name of the called tool, "" for an invalid call."""
+        return self.tool.func.__name__ if self.tool is not None else ""
+
+    def run(self) -> Any:  # noqa: ANN401
+        """Run the tool, awaiting its result if it is a coroutine function."""
+        assert self.tool is not None, self.error
+        result = self.tool(*self.args, **self.kwargs)
+        if asyncio.iscoroutine(result):
+            result = asyncio.run(result)
+        return result
+
+
+def parse_tool_calls(
+    action: str,
+    tools: Dict[str, Tool],
+    _globals: dict,
+    _locals: Mapping[str, Any],
+) -> List[ToolCall]:
+    """Parse the tool calls of an action block, one call per line.
+
+    Args:
+        action (str): The content of the action block.
+        tools (Dict[str, Tool]): The tools the model can call, by name.
+        _globals (dict): The globals the arguments are evaluated in.
+        _locals (Mapping[str, Any]): The locals the arguments are evaluated in.
+
+    Returns:
+        List[ToolCall]: The calls, with an error for the calls that cannot run.
+    """
+    action = action.strip()
+    try:
+        tree = ast.parse(action)
+    except SyntaxError as e:
+        return [ToolCall(action, error=f"Invalid tool calls: {e}")]
+    calls = []
+    for node in tree.body:
+        source = ast.get_source_segment(action, node) or ""
+        call = node.value if isinstance(node, ast.Expr) else None
+        if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name):
+            calls.append(ToolCall(source, error="Not a tool call."))
+            continue
+        tool = tools.get(call.func.id)
+        if tool is None:
+            calls.append(
+                ToolCall(
+                    source,
+                    error=f"Unknown tool {call.func.id!r}. "
+                    f"Available tools: {', '.join(tools) or 'none'}.",
+                )
+            )
+            continue
+        try:
+            args = [_evaluate(arg, _globals, _locals) for arg in call.args]
+            kwargs = {
+                str(keyword.arg): _evaluate(keyword.value, _globals, _locals)
+                for keyword in call.keywords
+            }
+        except Exception as e:
+            calls.append(ToolCall(source, tool, error=f"Invalid arguments: {e}"))
+            continue
+        calls.append(ToolCall(source, tool, args, kwargs))
+    return calls
+
+
+def _evaluate(
+    node: ast.expr, _globals: dict, _locals: Mapping[str, Any]
+) -> Any:  # noqa: ANN401
+    """Evaluate an argument of a tool call."""
+    if isinstance(node, ast.Starred):
+        raise ValueError("Unpacked arguments are not supported.")
+    code = compile(ast.Expression(node), "<action>", "eval")
+    return eval(code, _globals, _locals)
+
+
+def run_tool_calls(calls: List[ToolCall], timeout: Optional[float] = None) -> List[str]:
+    """Run the tool calls of a step concurrently and get their observations.
+
+    Args:
+        calls (List[ToolCall]): The calls of the step.
+        timeout (float, optional): The number of seconds the step waits for its calls.
+            The calls still running are reported as timed out, and their results are
+            discarded. Defaults to None (no timeout).
+
+    Returns:
+        List[str]: The observation of every call, in order.
+    """
+    runnable = [index for index, call in enumerate(calls) if not call.error]
+    futures: Dict[int, Future] = {}
+    if runnable:
+        # A pool per step: the calls still running after a timeout cannot be stopped, and
+        # would hold the workers of a shared pool and starve the later steps
+        executor = ThreadPoolExecutor(
+            len(runnable), thread_name_prefix="semantix-tools"
+        )
+        for index in runnable:
+            futures[index] = executor.submit(
+                contextvars.copy_context().run, calls[index].run
+            )
+        executor.shutdown(wait=False)
+        wait(futures.values(), timeout=timeout)
+    observations = []
+    for index, call in enumerate(calls):
+        future = futures.get(index)
+        if future is None:
+            metrics.record_tool_call(call.name, "invalid")
+            observations.append(f"- {call.source} -> Error: {call.error}")
+        elif not future.done():
+            future.cancel()
+            metrics.record_tool_call(call.name, "timeout")
+            observations.append(
+                f"- {call.source} -> Error: Timed out after {timeout} seconds."
+            )
+        elif future.exception() is not None:
+            e = future.exception()
+            metrics.record_tool_call(call.name, "error")
+            observations.append(f"- {call.source} -> Error: {type(e).__name__}: {e}")
+        else:
+            metrics.record_tool_call(call.name, "ok")
+            observations.append(
+                f"- {call.source} = {get_object_string(future.result())}"
+            )
+    return observations
@@ -0,0 +1,221 @@
+"""Local repair of model outputs that fail to parse.
+
+Many parse failures are mechanical: JSON literals (`true`, `null`), smart quotes, a bare
+enum member without its class, a trailing comma or brackets left open by a truncated
+response. The repair pipeline tries cheap rewrites of the output, in order and on top of
+each other, and the output is parsed again after every rewrite. The model is only asked to
+fix the output if no rewrite makes it parse.
+
+Repairs are plain functions taking the output and a `RepairContext`, and returning the
+rewritten output. Add your own with `llm.repair_pipeline.add(fn)`, or disable the local
+repair with `llm.repair_pipeline = None`.
+"""
+
+import re
+from enum import Enum
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from semantix import metrics, profiler
+from semantix.types.prompt import OutputHint, TypeExplanation
+
+_STRING = re.compile(r"""("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')""")
+_JSON_LITERALS = {"true": "True", "false": "False", "null": "None"}
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'"})
+_BRACKETS = {"(": ")", "[": "]", "{": "}"}
+
+
+class RepairContext:
+    """Class to represent what the repairs know about the expected output."""
+
+    def __init__(
+        self,
+        error: Exception,
+        return_hint: OutputHint,
+        type_explanations: List[TypeExplanation],
+        _globals: dict,
+        _locals: Mapping[str, Any],
+    ) -> None:
+        """Initializes the RepairContext class.
+
+        Args:
+            error (Exception): The error raised when parsing the original output.
+            return_hint (OutputHint): The output type.
+            type_explanations (List[TypeExplanation]): The types used in the output.
+            _globals (dict): The globals the output is evaluated with.
+            _locals (dict): The locals the output is evaluated with.
+        """
+        self.error = error
+        self.return_hint = return_hint
+        self.type_explanations = type_explanations
+        self.globals = _globals
+        self.locals = _locals
+
+    def is_defined(self, name: str) -> bool:
+        """Check whether a name is defined when evaluating the output."""
+        return name in self.locals or name in self.globals
+
+    @property
+    def enum_members(self) -> Dict[str, str]:
+        """Get the qualified name of the members of the output enums, by member name."""
+        members: Dict[str, str] = {}
+        ambiguous = set()
+        for t in self.type_explanations:
+            if not (isinstance(t.type, type) and issubclass(t.type, Enum)):
+                continue
+            for name in t.type.__members__:
+                if name in members:
+                    ambiguous.add(name)
+                members[name] = f"{t.type.__name__}.{name}"
+        return {k: v for k, v in members.items() if k not in ambiguous}
+
+
+Repair = Callable[[str, RepairContext], str]
+
+
+def _outside_strings(output: str, rewrite: Callable[[str], str]) -> str:
+    """Apply a rewrite to the parts of the output that are not string literals."""
+    parts = _STRING.split(output)
+    return "".join(
+        part if index % 2 else rewrite(part) for index, part in enumerate(parts)
+    )
+
+
+def smart_quotes(output: str, context: RepairContext) -> str:
+    """Replace typographic quotes with ASCII quotes."""
+    return output.translate(_SMART_QUOTES)
+
+
+def json_literals(output: str, context: RepairContext) -> str:
+    """Replace the JSON literals `true`, `false` and `null` with their Python equivalent."""
+    pattern = re.compile(r"(?<![\w.])(true|false|null)(?![\w(])")
+    return _outside_strings(
+        output,
+        lambda part: pattern.sub(
+            lambda m: (
+                m.group(0)
+                if context.is_defined(m.group(0))
+                else _JSON_LITERALS[m.group(0)]
+            ),
+            part,
+        ),
+    )
+
+
+def trailing_commas(output: str, context: RepairContext) -> str:
+    """Remove repeated commas and the commas before a closing bracket."""
+    return _outside_strings(
+        output,
+        lambda part: re.sub(r",\s*(?=[)\]}])", "", re.sub(r",(\s*,)+", ",", part)),
+    )
+
+
+def enum_prefix(output: str, context: RepairContext) -> str:
+    """Qualify bare enum member names with their enum class (`RED` -> `Color.RED`)."""
+    members = {
+        name: qualified
+        for name, qualified in context.enum_members.items()
+        if not context.is_defined(name)
+    }
+    if not members:
+        return output
+    pattern = re.compile(r"(?<![\w.])([A-Za-z_]\w*)(?![\w.(])(?!\s*=(?!=))")
+    return _outside_strings(
+        output,
+        lambda part: pattern.sub(lambda m: members.get(m.group(1), m.group(1)), part),
+    )
+
+
+def balance_brackets(output: str, context: RepairContext) -> str:
+    """Close the strings and brackets left open by a truncated output.
+
+    Unmatched closing brackets are dropped.
+    """
+    stack: List[str] = []
+    result: List[str] = []
+    quote = ""
+    escaped = False
+    for char in output.rstrip():
+        if quote:
+            result.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = ""
+            continue
+        if char in "'\"":
+            quote = char
+        elif char in _BRACKETS:
+            stack.append(_BRACKETS[char])
+        elif char in ")]}":
+            if not stack or stack[-1] != char:
+                continue
+            stack.pop()
+        result.append(char)
+    text = "".join(result) + quote
+    text = re.sub(r"[,:=]\s*$", "", text)
+    return text + "".join(reversed(stack))
+
+
+DEFAULT_REPAIRS: List[Repair] = [
+    smart_quotes,
+    json_literals,
+    trailing_commas,
+    enum_prefix,
+    balance_brackets,
+]
+
+
+class RepairPipeline:
+    """Class to run the local repairs of an output that fails to parse."""
+
+    def __init__(self, repairs: Optional[List[Repair]] = None) -> None:
+        """Initializes the RepairPipeline class.
+
+        Args:
+            repairs (List[Repair], optional): The repairs to try, in order. Defaults to
+                `DEFAULT_REPAIRS`.
+        """
+        self.repairs = list(DEFAULT_REPAIRS if repairs is None else repairs)
+
+    def add(self, repair: Repair) -> None:
+        """Add a repair, tried after the existing ones."""
+        self.repairs.append(repair)
+
+    def run(
+        self,
+        output: str,
+        parse: Callable[[str], Any],
+        context: RepairContext,
+    ) -> Any:  # noqa: ANN401
+        """Repair and parse an output.
+
+        Args:
+            output (str): The output that failed to parse.
+            parse (Callable[[str], Any]): The function parsing an output into an object.
+            context (RepairContext): What the repairs know about the expected output.
+
+        Returns:
+            Any: The parsed object of the first repaired output that parses.
+
+        Raises:
+            ValueError: If no repair makes the output parse.
+        """
+        current = output
+        for repair in self.repairs:
+            with profiler.span("repair", repair.__name__):
+                try:
+                    repaired = repair(current, context)
+                except Exception:
+                    continue
+                if repaired == current:
+                    continue
+                current = repaired
+                try:
+                    obj = parse(current)
+                except Exception:
+                    continue
+            metrics.record_local_repair(repair.__name__)
+            return obj
+        raise ValueError("The output could not be repaired locally.")
@@ -0,0 +1,247 @@
+"""Conversation sessions, to chain enhanced calls on an append-only message history.
+
+Outside a session every call sends a standalone prompt. Inside a session, a call sends the
+history of the session followed by its own turn, and its turn and the answer of the model
+are appended to the history. The history is only appended to, so the requests of a
+session share a stable prefix that the provider prompt caches can reuse. The goal, output
+type and type definitions of a function are only sent in its first turn, and its goal and
+output type are sent again when another function was called since.
+
+When the history exceeds the token budget, the oldest turns are dropped down to `trim_to`
+of the budget at once (so the prefix changes rarely), and are summarised by the
+`summarizer` LLM if one is given.
+
+Example:
+```python
+from semantix import Session
+
+with Session(max_tokens=8000, summarizer=llm) as session:
+    plan = plan_trip(destination="Kyoto")
+    refined = refine_plan(feedback="Less temples, more food")  # sees the plan_trip turn
+print(session.tokens, session.summary)
+```
+"""
+
+import hashlib
+import threading
+from contextvars import ContextVar, Token
+from typing import Any, Callable, List, Optional, TYPE_CHECKING
+
+from semantix import profiler
+from semantix.utils.fences import scan_blocks
+
+if TYPE_CHECKING:
+    from semantix.inference import EnhancedFunction, InferenceEngine
+    from semantix.llms.base import BaseLLM
+
+_active: ContextVar[Optional["Session"]] = ContextVar("semantix_session", default=None)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text, at about 4 characters per token."""
+    return (len(text) + 3) // 4
+
+
+def current_session() -> Optional["Session"]:
+    """Get the session of the current context, None outside a session."""
+    return _active.get()
+
+
+class Turn:
+    """Class to represent the messages of a call in a session and the answer of the model."""
+
+    def __init__(
+        self,
+        messages: List["BaseLLM.Message"],
+        tokens: int,
+        static_key: str = "",
+        goal_key: str = "",
+    ) -> None:
+        """Initializes the Turn class.
+
+        Args:
+            messages (List[BaseLLM.Message]): The messages of the call and the answer.
+            tokens (int): The number of tokens of the messages.
+            static_key (str, optional): The key of the goal, output type and type
+                definitions of the function, if they are sent in this turn. Defaults to "".
+            goal_key (str, optional): The key of the function whose goal and output type
+                are sent in this turn, with or without the type definitions. Defaults to "".
+        """
+        self.messages = messages
+        self.tokens = tokens
+        self.static_key = static_key
+        self.goal_key = goal_key or static_key
+
+
+class Session:
+    """Class to chain the enhanced calls made inside it on a shared message history."""
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        trim_to: float = 0.5,
+        summarizer: Optional["BaseLLM"] = None,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ) -> None:
+        """Initializes the Session class.
+
+        Args:
+            max_tokens (int, optional): The token budget of a request (history and turn).
+                Defaults to None (no budget).
+            trim_to (float, optional): The share of the budget the history is trimmed to
+                when a request exceeds it. Defaults to 0.5.
+            summarizer (BaseLLM, optional): The LLM summarising the dropped turns. Defaults
+                to None (the dropped turns are forgotten).
+            count_tokens (Callable[[str], int], optional): Counts the tokens of a text.
+                Defaults to an estimate of 4 characters per token.
+        """
+        assert 0 <= trim_to <= 1, "trim_to must be between 0 and 1."
+        self.max_tokens = max_tokens
+        self.trim_to = trim_to
+        self.summarizer = summarizer
+        self.count_tokens = count_tokens
+        self.model: Optional["BaseLLM"] = None
+        self.summary = ""
+        self.turns: List[Turn] = []
+        self.dropped = 0
+        self._summary_tokens = 0
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def __enter__(self) -> "Session":
+        """Make the enhanced calls of the context run in the session."""
+        stack: List[Token] = self._local.__dict__.setdefault("stack", [])
+        stack.append(_active.set(self))
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Leave the session."""
+        _active.reset(self._local.stack.pop())
+
+    @property
+    def tokens(self) -> int:
+        """Get the number of tokens of the history."""
+        with self._lock:
+            return self._summary_tokens + sum(turn.tokens for turn in self.turns)
+
+    @property
+    def messages(self) -> List["BaseLLM.Message"]:
+        """Get the messages of the history, the summary first."""
+        with self._lock:
+            messages = []
+            if self.summary and self.model is not None:
+                messages.append(self._summary_message(self.model))
+            for turn in self.turns:
+                messages.extend(turn.messages)
+            return messages
+
+    def clear(self) -> None:
+        """Forget the history."""
+        with self._lock:
+            self.turns = []
+            self.summary = ""
+            self._summary_tokens = 0
+
+    def run(self, function: "EnhancedFunction", **kwargs: Any) -> Any:  # noqa: ANN401
+        """Run a call of an enhanced function in the session.
+
+        The calls of a session run one at a time, in the order of the history.
+
+        Raises:
+            ValueError: If the function does not use the LLM of the session.
+        """
+        with self._lock:
+            if self.model is None:
+                self.model = function.model
+            elif function.model is not self.model:
+                raise ValueError("The functions of a session must share the same LLM.")
+            with profiler.span("prompt"):
+                engine = function.build_engine(**kwargs)
+                turn = self._build_turn(engine)
+            engine.set_messages(self.messages + turn.messages)
+            # The calls made while running the turn (e.g. by the tools) run by themselves
+            token = _active.set(None)
+            try:
+                output = function._run_engine(engine)
+            finally:
+                _active.reset(token)
+            answer = self.model.Message(
+                self.model.ASSISTANT_ROLE, self.model.Message.Content([engine.output])
+            )
+            turn.messages.append(answer)
+            turn.tokens += self.count_tokens(str(answer))
+            self.turns.append(turn)
+            return output
+
+    def _build_turn(self, engine: "InferenceEngine") -> Turn:
+        """Get the messages of a call, trimming the history to fit them in the budget."""
+        model, prompt_info = engine.model, engine.prompt_info
+        static = prompt_info.get_static_messages(model)
+        key = hashlib.sha256(
+            "\n".join(str(m) for m in static).encode("utf-8")
+        ).hexdigest()
+        messages = prompt_info.get_input_messages(model)
+        messages.extend(prompt_info.get_information_messages(model))
+        messages.append(engine.method_message())
+        tokens = sum(self.count_tokens(str(m)) for m in messages)
+        static_tokens = sum(self.count_tokens(str(m)) for m in static)
+        self._fit(tokens + static_tokens)
+        if not any(turn.static_key == key for turn in self.turns):
+            return Turn(static + messages, tokens + static_tokens, key)
+        last_goal = next((t.goal_key for t in reversed(self.turns) if t.goal_key), "")
+        if last_goal == key:
+            return Turn(messages, tokens)
+        # Another function was called since, remind the model of the goal of this one
+        goal = prompt_info.get_goal_messages(model)
+        goal_tokens = sum(self.count_tokens(str(m)) for m in goal)
+        return Turn(goal + messages, tokens + goal_tokens, goal_key=key)
+
+    def _fit(self, tokens: int) -> None:
+        """Trim the history if it does not leave room for a turn of the given size."""
+        if self.max_tokens is None or self.tokens + tokens <= self.max_tokens:
+            return
+        target = max(self.max_tokens * self.trim_to - tokens, 0)
+        dropped: List[Turn] = []
+        while self.turns and self.tokens > target:
+            dropped.append(self.turns.pop(0))
+        self.dropped += len(dropped)
+        if dropped and self.summarizer is not None:
+            self._summarize(dropped)
+
+    def _summarize(self, turns: List[Turn]) -> None:
+        """Fold the dropped turns into the summary of the session."""
+        summarizer = self.summarizer
+        assert summarizer is not None
+        conversation = "\n\n".join(str(m) for turn in turns for m in turn.messages)
+        messages = [summarizer.get_system_message("summarize")]
+        if self.summary:
+            messages.append(self._summary_message(summarizer, summarizer.USER_ROLE))
+        messages.append(
+            summarizer.Message(
+                summarizer.USER_ROLE,
+                summarizer.Message.Content(
+                    [conversation], summarizer.get_message_desc("conversation")
+                ),
+            )
+        )
+        messages.append(
+            summarizer.Message(
+                summarizer.USER_ROLE,
+                summarizer.Message.Content([summarizer.SUMMARIZE_INSTRUCTION]),
+            )
+        )
+        output = summarizer(messages, {})
+        self.summary = scan_blocks(output, ["summary"]).get("summary", output).strip()
+        if self.model is not None:
+            self._summary_tokens = self.count_tokens(
+                str(self._summary_message(self.model))
+            )
+
+    def _summary_message(
+        self, model: "BaseLLM", role: Optional[str] = None
+    ) -> "BaseLLM.Message":
+        """Get the message with the summary of the dropped turns."""
+        return model.Message(
+            role or model.SYSTEM_ROLE,
+            model.Message.Content([self.summary], model.get_message_desc("summary")),
+        )
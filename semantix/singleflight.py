@@ -0,0 +1,83 @@
+"""Single-flight coalescing of identical concurrent calls.
+
+When several threads or asyncio tasks make the same call at the same time, only the first
+one (the leader) does the work. The others wait for its result or exception.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from semantix import metrics
+
+
+class SingleFlight:
+    """Class to coalesce identical concurrent calls, keyed on a request hash.
+
+    The result of the leader is shared as is with the coalesced callers, so mutating it
+    affects all of them.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the SingleFlight class."""
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """Get the future of the call in flight for the key, registering a new one if none."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                metrics.record_coalesced()
+                return future, False
+            future = self._calls[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key: str) -> None:
+        """Unregister the call in flight for the key."""
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:  # noqa: ANN401
+        """Run `fn`, unless an identical call is in flight, in which case wait for its result."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key)
+
+    async def do_async(
+        self, key: str, fn: Callable[[], Awaitable[Any]]
+    ) -> Any:  # noqa: ANN401
+        """Await `fn()`, unless an identical call is in flight, in which case await its result."""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key)
+
+    @property
+    def in_flight(self) -> int:
+        """Get the number of calls in flight."""
+        return len(self._calls)
@@ -0,0 +1,290 @@
+"""Streaming of the enhanced function calls.
+
+`fn.stream(**kwargs)` and `fn.astream(**kwargs)` stream the response of the model and
+yield typed events as the fenced blocks of the response (e.g. `reasoning`, then `output`)
+are generated, then the parsed output:
+
+- `BlockStart(name)` when a block is opened,
+- `BlockDelta(name, text)` for every new piece of the content of the block,
+- `BlockEnd(name, content, complete)` when the block is closed,
+- `ListElement(index, value)` for every element of a list output, as soon as it is
+  generated,
+- `FinalOutput(output)` with the parsed output, once the response is complete.
+
+The deltas of a block add up to its content. The last partial line of a block is held
+back from its first backtick and its trailing whitespace until more of it is received,
+so that the closing fence never leaks into the deltas.
+
+When the function returns a list, the output block is scanned as it is streamed, and every
+top-level element is parsed and validated as soon as the comma or the bracket after it is
+generated. `fn.stream_elements(**kwargs)` yields these elements alone. The elements that
+cannot be parsed while streaming are taken from the parsed output instead, once the
+response is complete, so every element is yielded once and in order.
+
+Example:
+```python
+for event in get_person_info.stream(name="Albert Einstein"):
+    if isinstance(event, BlockDelta):
+        print(event.text, end="", flush=True)
+    elif isinstance(event, FinalOutput):
+        person = event.output
+```
+"""
+
+import asyncio
+import contextvars
+import threading
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from semantix.utils.fences import Block, FenceScanner
+
+
+class StreamEvent:
+    """Base class for the events of a streamed call."""
+
+
+class BlockStart(StreamEvent):
+    """Event of a fenced block opened in the response."""
+
+    def __init__(self, name: str) -> None:
+        """Initializes the BlockStart class."""
+        self.name = name
+
+    def __repr__(self) -> str:
+        """Get the representation of the event."""
+        return f"BlockStart({self.name!r})"
+
+
+class BlockDelta(StreamEvent):
+    """Event of new content in a fenced block of the response."""
+
+    def __init__(self, name: str, text: str) -> None:
+        """Initializes the BlockDelta class."""
+        self.name = name
+        self.text = text
+
+    def __repr__(self) -> str:
+        """Get the representation of the event."""
+        return f"BlockDelta({self.name!r}, {self.text!r})"
+
+
+class BlockEnd(StreamEvent):
+    """Event of a fenced block closed in the response."""
+
+    def __init__(self, name: str, content: str, complete: bool = True) -> None:
+        """Initializes the BlockEnd class.
+
+        Args:
+            name (str): The name of the block.
+            content (str): The whole content of the block.
+            complete (bool, optional): Whether the closing fence was found, False if the
+                response ended in the block. Defaults to True.
+        """
+        self.name = name
+        self.content = content
+        self.complete = complete
+
+    def __repr__(self) -> str:
+        """Get the representation of the event."""
+        return f"BlockEnd({self.name!r}, {self.content!r}, complete={self.complete})"
+
+
+class ListElement(StreamEvent):
+    """Event of an element of a list output, parsed while the list is generated."""
+
+    def __init__(self, index: int, value: Any) -> None:  # noqa: ANN401
+        """Initializes the ListElement class.
+
+        Args:
+            index (int): The index of the element in the list.
+            value (Any): The parsed and validated element.
+        """
+        self.index = index
+        self.value = value
+
+    def __repr__(self) -> str:
+        """Get the representation of the event."""
+        return f"ListElement({self.index}, {self.value!r})"
+
+
+class FinalOutput(StreamEvent):
+    """Event of the parsed output, the last event of a streamed call."""
+
+    def __init__(self, output: Any) -> None:  # noqa: ANN401
+        """Initializes the FinalOutput class.
+
+        Args:
+            output (Any): The output of the call, an `Output` object with the blocks if the
+                function returns the additional information.
+        """
+        self.output = output
+
+    def __repr__(self) -> str:
+        """Get the representation of the event."""
+        return f"FinalOutput({self.output!r})"
+
+
+class BlockEvents:
+    """Class to convert the chunks of a streamed response into block events."""
+
+    def __init__(self) -> None:
+        """Initializes the BlockEvents class."""
+        self.scanner = FenceScanner()
+        self._name: Optional[str] = None
+        self._sent = 0
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        """Get the events of a chunk of the response."""
+        events: List[StreamEvent] = []
+        for block in self.scanner.feed(chunk):
+            self._end(block, events)
+        current = self.scanner.current
+        if current is not None:
+            name, content = current
+            if self._name is None:
+                self._name, self._sent = name, 0
+                events.append(BlockStart(name))
+            visible = self._visible(content)
+            if len(visible) > self._sent:
+                events.append(BlockDelta(name, visible[self._sent :]))
+                self._sent = len(visible)
+        return events
+
+    def close(self) -> List[StreamEvent]:
+        """Get the events of the end of the response."""
+        events: List[StreamEvent] = []
+        for block in self.scanner.close():
+            self._end(block, events)
+        return events
+
+    def _end(self, block: Block, events: List[StreamEvent]) -> None:
+        """Add the events of a completed block."""
+        if self._name is None:
+            events.append(BlockStart(block.name))
+            self._sent = 0
+        if len(block.content) > self._sent:
+            events.append(BlockDelta(block.name, block.content[self._sent :]))
+        events.append(BlockEnd(block.name, block.content, block.complete))
+        self._name, self._sent = None, 0
+
+    @staticmethod
+    def _visible(content: str) -> str:
+        """Get the content of the block that cannot be part of the closing fence."""
+        lines, newline, partial = content.rpartition("\n")
+        if "`" in partial:
+            partial = partial[: partial.index("`")]
+        partial = partial.rstrip()
+        if not partial:
+            return lines
+        return lines + newline + partial
+
+
+class ListElementScanner:
+    """Class to find the top-level elements of a list literal, fed in chunks.
+
+    Strings (with escapes and triple quotes) and nested brackets are skipped, so only the
+    commas and the closing bracket of the list end an element.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the ListElementScanner class."""
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._quote = ""
+        self._escape = False
+        self._start = -1
+
+    def feed(self, text: str) -> List[str]:
+        """Scan the next part of the list.
+
+        Returns:
+            List[str]: The source of the elements completed by the text.
+        """
+        elements: List[str] = []
+        self._text += text
+        text = self._text
+        while not self.done and self._pos < len(text):
+            char = text[self._pos]
+            if self._quote:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == self._quote[0]:
+                    if len(text) - self._pos < len(self._quote):
+                        break  # Wait to know whether the string ends
+                    if text.startswith(self._quote, self._pos):
+                        self._pos += len(self._quote) - 1
+                        self._quote = ""
+            elif self._depth == 0:
+                if char == "[":
+                    self._depth, self._start = 1, self._pos + 1
+                elif not char.isspace():
+                    self.done = True  # Not a list literal
+            elif char in "\"'":
+                if len(text) - self._pos < 3:
+                    break  # Wait to know whether the string is triple quoted
+                self._quote = char * 3 if text.startswith(char * 3, self._pos) else char
+                self._pos += len(self._quote) - 1
+            elif char in "([{":
+                self._depth += 1
+            elif char in ")]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._add(self._pos, elements)
+                    self.done = True
+            elif char == "," and self._depth == 1:
+                self._add(self._pos, elements)
+                self._start = self._pos + 1
+            self._pos += 1
+        return elements
+
+    def _add(self, end: int, elements: List[str]) -> None:
+        """Add the element ending at the given position, if not empty."""
+        element = self._text[self._start : end].strip()
+        if element:
+            elements.append(element)
+
+
+async def iterate_in_thread(
+    make_iterator: Callable[[], Iterator[Any]]
+) -> AsyncIterator[Any]:
+    """Iterate a blocking iterator in a worker thread, without blocking the event loop.
+
+    The iterator is closed if the consumer stops early.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def produce() -> None:
+        iterator = make_iterator()
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (done, e))
+            return
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        loop.call_soon_threadsafe(queue.put_nowait, (done, None))
+
+    producer = loop.run_in_executor(None, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                break
+            yield item
+    finally:
+        stop.set()
+        await asyncio.shield(producer)
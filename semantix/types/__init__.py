@@ -1,5 +1,5 @@
 """Type definitions for Semantix."""
 
-from semantix.types.media import Image, Video
+from semantix.types.media import Image, MediaPool, Video
 
-__all__ = ["Image", "Video"]
+__all__ = ["Image", "MediaPool", "Video"]
@@ -1,18 +1,90 @@
-"""Media module to process images and videos."""
+"""Media module to process images and videos.
+
+The media backends (OpenCV and Pillow) are heavy to import, so they are only imported
+when a media object is processed for the first time.
+
+Processing the media (decoding, re-encoding, base64) is CPU-bound and holds the GIL. A
+`MediaPool` processes them in worker processes instead, ahead of the requests, and the
+encoded payloads come back through shared memory.
+"""
 
 import base64
+import functools
 import importlib
 import importlib.util
+import threading
+from concurrent.futures import Future
 from io import BytesIO
-from typing import Tuple
+from typing import Any, Iterable, List, Optional, Tuple
+
+from semantix import profiler
+
+_BACKENDS = {"cv2": ("cv2", "cv2"), "PILImage": ("PIL", "PIL.Image")}
+
+
+def _is_available(name: str) -> bool:
+    """Check whether a media backend is installed, without importing it."""
+    return importlib.util.find_spec(_BACKENDS[name][0]) is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _load(name: str) -> Any:  # noqa: ANN401
+    """Import a media backend, returning None if it is not installed."""
+    package, module = _BACKENDS[name]
+    if importlib.util.find_spec(package) is None:
+        return None
+    return importlib.import_module(module)
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    """Import the media backends lazily."""
+    if name in _BACKENDS:
+        return _load(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _Media:
+    """Base class of the media objects, whose payload can be prepared by a media pool."""
+
+    _payload: Optional[Future] = None
+
+    def __getstate__(self) -> dict:
+        """Get the state sent to the worker processes, without the prepared payload."""
+        state = dict(self.__dict__)
+        state.pop("_payload", None)
+        return state
+
+    def _process(self) -> Any:  # noqa: ANN401
+        """Encode the media into its payload."""
+        raise NotImplementedError
 
-cv2 = importlib.import_module("cv2") if importlib.util.find_spec("cv2") else None
-PILImage = (
-    importlib.import_module("PIL.Image") if importlib.util.find_spec("PIL") else None
-)
+    def _get_payload(self) -> Any:  # noqa: ANN401
+        """Get the payload prepared by the media pool, or encode it in the calling thread.
+
+        A payload that failed to be prepared (e.g. the pool was shut down) is forgotten,
+        so the error is not raised again by the later calls.
+        """
+        payload = self._payload
+        if payload is not None:
+            try:
+                return payload.result()
+            except Exception:
+                if self._payload is payload:
+                    self._payload = None
+        return self._process()
+
+    @staticmethod
+    def _split(payload: Any) -> Tuple[List[str], Any]:  # noqa: ANN401
+        """Split a payload into its base64 chunks and its metadata."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _join(chunks: List[str], meta: Any) -> Any:  # noqa: ANN401
+        """Join the base64 chunks and the metadata of a payload."""
+        raise NotImplementedError
 
 
-class Video:
+class Video(_Media):
     """Class to represent a video."""
 
     def __init__(
@@ -29,8 +101,8 @@ class Video:
         Raises:
             AssertionError: If the required dependencies are not installed.
         """
-        assert (
-            cv2 is not None
+        assert _is_available(
+            "cv2"
         ), "Please install the required dependencies by running `pip install semantix[video]`."
         self.file_path = file_path
         self.seconds_per_frame = seconds_per_frame
@@ -40,11 +112,17 @@ class Video:
         self,
     ) -> list:
         """Processes the video and returns a list of base64 encoded frames."""
-        assert (
-            cv2 is not None
+        assert _is_available(
+            "cv2"
         ), "Please install the required dependencies by running `pip install semantix[video]`."
 
         assert self.seconds_per_frame > 0, "Seconds per frame must be greater than 0"
+        with profiler.span("media", "Video.process"):
+            return self._get_payload()
+
+    def _process(self) -> list:
+        """Extract and encode the frames of the video."""
+        cv2 = _load("cv2")
 
         base64_frames = []
 
@@ -72,8 +150,18 @@ class Video:
         video.release()
         return base64_frames
 
+    @staticmethod
+    def _split(payload: list) -> Tuple[List[str], Any]:
+        """Split a payload into its base64 chunks and its metadata."""
+        return payload, None
+
+    @staticmethod
+    def _join(chunks: List[str], meta: Any) -> list:  # noqa: ANN401
+        """Join the base64 chunks and the metadata of a payload."""
+        return chunks
 
-class Image:
+
+class Image(_Media):
     """Class to represent an image."""
 
     def __init__(self, file_path: str, quality: str = "low") -> None:
@@ -87,17 +175,23 @@ class Image:
         Raises:
             AssertionError: If the required dependencies are not installed.
         """
-        assert (
-            PILImage is not None
+        assert _is_available(
+            "PILImage"
         ), "Please install the required dependencies by running `pip install semantix[image]`."
         self.file_path = file_path
         self.quality = quality
 
     def process(self) -> Tuple[str, str]:
         """Processes the image and returns a base64 encoded image and its format."""
-        assert (
-            PILImage is not None
+        assert _is_available(
+            "PILImage"
         ), "Please install the required dependencies by running `pip install semantix[image]`."
+        with profiler.span("media", "Image.process"):
+            return self._get_payload()
+
+    def _process(self) -> Tuple[str, str]:
+        """Re-encode the image as base64."""
+        PILImage = _load("PILImage")  # noqa: N806
         image = PILImage.open(self.file_path)
         img_format = image.format
         with BytesIO() as buffer:
@@ -106,3 +200,153 @@ class Image:
                 base64.b64encode(buffer.getvalue()).decode("utf-8"),
                 img_format.lower(),
             )
+
+    @staticmethod
+    def _split(payload: Tuple[str, str]) -> Tuple[List[str], Any]:
+        """Split a payload into its base64 chunks and its metadata."""
+        return [payload[0]], payload[1]
+
+    @staticmethod
+    def _join(chunks: List[str], meta: Any) -> Tuple[str, str]:  # noqa: ANN401
+        """Join the base64 chunks and the metadata of a payload."""
+        return chunks[0], meta
+
+
+def _process_shared(media: _Media) -> Tuple[str, List[int], Any]:
+    """Process a media object in a worker process, writing the payload to shared memory.
+
+    Returns:
+        Tuple[str, List[int], Any]: The name of the shared memory block, the size of every
+            chunk and the metadata of the payload.
+    """
+    from multiprocessing import shared_memory
+
+    chunks, meta = media._split(media._process())
+    data = [chunk.encode("ascii") for chunk in chunks]
+    sizes = [len(d) for d in data]
+    block = shared_memory.SharedMemory(create=True, size=max(sum(sizes), 1))
+    offset = 0
+    for d in data:
+        block.buf[offset : offset + len(d)] = d
+        offset += len(d)
+    block.close()
+    return block.name, sizes, meta
+
+
+def _read_shared(
+    media: _Media,
+    name: str,
+    sizes: List[int],
+    meta: Any,  # noqa: ANN401
+) -> Any:  # noqa: ANN401
+    """Read the payload written to shared memory by a worker process, and free it."""
+    from multiprocessing import shared_memory
+
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        chunks = []
+        offset = 0
+        for size in sizes:
+            chunks.append(bytes(block.buf[offset : offset + size]).decode("ascii"))
+            offset += size
+    finally:
+        block.close()
+        block.unlink()
+    return media._join(chunks, meta)
+
+
+class MediaPool:
+    """Class to prepare the payloads of media objects in worker processes.
+
+    Once a media object is prepared, `process()` returns its payload (waiting for the
+    worker if needed) instead of processing it in the calling thread.
+
+    Example:
+    ```python
+    pool = MediaPool(max_workers=4)
+
+    @sx.enhance("Describe the image", llm, media_pool=pool)
+    def describe(img: Image) -> str: ...
+    ```
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        mp_context: Any = None,  # noqa: ANN401
+    ) -> None:
+        """Initializes the MediaPool class.
+
+        Args:
+            max_workers (int, optional): The number of worker processes. Defaults to the
+                number of CPUs.
+            mp_context (multiprocessing context, optional): The context the workers are
+                started with (e.g. `multiprocessing.get_context("spawn")`). Defaults to the
+                default start method of the platform.
+        """
+        self.max_workers = max_workers
+        self.mp_context = mp_context
+        self._executor: Any = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Any:  # noqa: ANN401
+        """Get the process pool, starting it on first use."""
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                from multiprocessing import resource_tracker
+
+                # The workers share the resource tracker of this process, which owns the
+                # shared memory blocks once they are read, and frees the unread ones at exit.
+                resource_tracker.ensure_running()
+                self._executor = ProcessPoolExecutor(
+                    self.max_workers, mp_context=self.mp_context
+                )
+            return self._executor
+
+    def prepare(self, media: Iterable[Any]) -> None:
+        """Start preparing the payloads of the media objects, in the background.
+
+        Args:
+            media (Iterable[Any]): The objects to prepare. Lists and tuples are searched for
+                media objects, the other objects are ignored, as are the media objects
+                already prepared.
+        """
+        for obj in media:
+            if isinstance(obj, (list, tuple)):
+                self.prepare(obj)
+            elif isinstance(obj, _Media) and obj._payload is None:
+                self._submit(obj)
+
+    def _submit(self, media: _Media) -> None:
+        """Submit a media object to the worker processes."""
+        payload: Future = Future()
+        media._payload = payload
+        try:
+            job = self._get_executor().submit(_process_shared, media)
+        except Exception as e:
+            payload.set_exception(e)
+            return
+
+        def done(job: Future) -> None:
+            try:
+                payload.set_result(_read_shared(media, *job.result()))
+            except Exception as e:
+                payload.set_exception(e)
+
+        job.add_done_callback(done)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait)
+
+    def __enter__(self) -> "MediaPool":
+        """Use the pool as a context manager, shutting it down on exit."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:  # noqa: ANN401
+        """Shut down the pool."""
+        self.shutdown()
@@ -1,34 +1,63 @@
 """Module to represent the prompt types."""
 
+import dataclasses
+import inspect
+import threading
 from enum import Enum
-from types import FrameType
-from typing import Any, Callable, Dict, List, Type, Union
-
-from pydantic import BaseModel
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING, Type, Union
 
+from semantix import metrics, profiler
+from semantix.cache import canonical_key
+from semantix.singleflight import SingleFlight
 from semantix.types.semantic import Semantic
-from semantix.utils.helpers import pydantic_to_dataclass
+from semantix.utils.helpers import is_pydantic_model, pydantic_to_dataclass
 from semantix.utils.utils import (
     extract_non_primary_type,
+    get_compact_object_string,
+    get_field_default,
     get_object_string,
     get_type,
     get_type_from_value,
 )
 
+if TYPE_CHECKING:
+    from semantix.cache import TTLCache
+    from semantix.utils.namespace import Namespace
+
+_MISS = object()
+
 
 class TypeExplanation:
     """Class to represent the type explanation."""
 
-    def __init__(self, frame: FrameType, type: str) -> None:
-        """Initializes the TypeExplanation class."""
-        self.type = frame.f_globals[type]
+    def __init__(
+        self,
+        namespace: "Namespace",
+        type: str,
+        compact: bool = False,
+        field_docs: bool = True,
+        enum_indices: bool = False,
+    ) -> None:
+        """Initializes the TypeExplanation class.
+
+        Args:
+            namespace (Namespace): The namespace the type is resolved in.
+            type (str): The name of the type.
+            compact (bool, optional): Whether the type is explained in the compact form.
+                Defaults to False.
+            field_docs (bool, optional): Whether the meaning of the fields is given in the
+                compact form. Defaults to True.
+            enum_indices (bool, optional): Whether the members of an Enum are numbered, for
+                the output to give their index. Defaults to False.
+        """
+        self.type = namespace[type]
+        self.compact = compact
+        self.field_docs = field_docs
+        self.enum_indices = enum_indices
 
     def get_type_repr(self, type_collector: list = []) -> str:
         """Get the type representation."""
-        if issubclass(self.type, BaseModel):
-            __doc__ = self.type.__doc__
-            self.type = pydantic_to_dataclass(self.type, self.type.__name__)
-            self.type.__doc__ = __doc__
+        self._convert_pydantic_model()
         semstr = self.type.__doc__ if self.type.__doc__ else ""
         _name = self.type.__name__
         usage_example_list = []
@@ -50,23 +79,81 @@ class TypeExplanation:
             return f"- {semstr} ({_name}) (class) -> {_name}({usage_example})".strip()
         return f"- {_name} (class) -> {_name}({usage_example})".strip()
 
+    def _convert_pydantic_model(self) -> None:
+        """Explain a pydantic model as a dataclass with the same fields."""
+        if is_pydantic_model(self.type):
+            __doc__ = self.type.__doc__
+            self.type = pydantic_to_dataclass(self.type, self.type.__name__)
+            self.type.__doc__ = __doc__
+
     def get_type_repr_enum(self) -> str:
         """Get the type representation."""
         semstr = self.type.__doc__ if self.type.__doc__ else ""
         _name = self.type.__name__
         usage_example_list = []
-        for param, _ in self.type.__members__.items():
-            usage_example_list.append(f"{_name}.{param}")
+        for index, param in enumerate(self.type.__members__):
+            if self.enum_indices:
+                usage_example_list.append(f"{index} = {_name}.{param}")
+            else:
+                usage_example_list.append(f"{_name}.{param}")
         usage_example = ", ".join(usage_example_list)
+        kind = "Enum, written as the index" if self.enum_indices else "Enum"
+        if semstr:
+            return f"- {semstr} ({_name}) ({kind}) -> {usage_example}".strip()
+        return f"- {_name} ({kind}) -> {usage_example}".strip()
+
+    def get_type_repr_compact(self) -> str:
+        """Get the compact type representation.
+
+        The members of an Enum are listed once after its name, the meaning of the fields
+        is optional, and the docstrings generated by the dataclasses (which repeat the
+        signature) are left out.
+        """
+        self._convert_pydantic_model()
+        _name = self.type.__name__
+        semstr = self.type.__doc__ or ""
+        if semstr.startswith(f"{_name}("):
+            semstr = ""
+        if issubclass(self.type, Enum) and self.enum_indices:
+            members = ", ".join(
+                f"{i}: {m}" for i, m in enumerate(self.type.__members__)
+            )
+            usage_example = f"{_name}.{{{members}}} (written as the index)"
+        elif issubclass(self.type, Enum):
+            usage_example = f"{_name}.{{{', '.join(self.type.__members__)}}}"
+        else:
+            defaults = {}
+            if dataclasses.is_dataclass(self.type):
+                for field in dataclasses.fields(self.type):
+                    default = get_field_default(field)
+                    if default is not dataclasses.MISSING:
+                        defaults[field.name] = get_compact_object_string(default)
+            params = []
+            for param, annotation in self.type.__init__.__annotations__.items():
+                if param == "return":
+                    continue
+                if isinstance(annotation, type) and issubclass(annotation, Semantic):
+                    type_repr = get_type(annotation.wrapped_type)
+                    if self.field_docs and annotation._meaning:
+                        type_repr = f"{type_repr} ({annotation._meaning})"
+                else:
+                    type_repr = get_type(annotation)
+                if param in defaults:
+                    type_repr = f"{type_repr} = {defaults[param]}"
+                params.append(f"{param}: {type_repr}")
+            usage_example = f"{_name}({', '.join(params)})"
         if semstr:
-            return f"- {semstr} ({_name}) (Enum) -> {usage_example}".strip()
-        return f"- {_name} (Enum) -> {usage_example}".strip()
+            return f"- {usage_example}: {' '.join(semstr.split())}"
+        return f"- {usage_example}"
 
     def __str__(self) -> str:
         """Returns the string representation of the TypeExplanation class."""
-        if issubclass(self.type, Enum):
-            return self.get_type_repr_enum()
-        return self.get_type_repr()
+        with profiler.span("type_explanation"):
+            if self.compact:
+                return self.get_type_repr_compact()
+            if issubclass(self.type, Enum):
+                return self.get_type_repr_enum()
+            return self.get_type_repr()
 
     def get_nested_types(self) -> list:
         """Get the nested types."""
@@ -79,11 +166,22 @@ class TypeExplanation:
 class Information:
     """Class to represent the information."""
 
-    def __init__(self, semstr: str, name: str, value: Any) -> None:  # noqa: ANN401
-        """Initializes the Information class."""
+    def __init__(
+        self, semstr: str, name: str, value: Any, compact: bool = False  # noqa: ANN401
+    ) -> None:
+        """Initializes the Information class.
+
+        Args:
+            semstr (str): The meaning of the information.
+            name (str): The name of the information.
+            value (Any): The value of the information.
+            compact (bool, optional): Whether the value is written in the compact form.
+                Defaults to False.
+        """
         self.value = value
         self.name = name
         self.semstr = semstr
+        self.compact = compact
 
     @property
     def type(self) -> str:
@@ -102,30 +200,48 @@ class Information:
 
     def __str__(self) -> str:
         """Returns the string representation of the Information class."""
+        with profiler.span("get_object_string"):
+            if self.compact:
+                value_str = get_compact_object_string(self.value)
+            else:
+                value_str = get_object_string(self.value)
         if self.semstr:
-            return f"- {self.semstr} ({self.name}) ({self.type}) = {get_object_string(self.value)}".strip()
-        return f"- {self.name} ({self.type}) = {get_object_string(self.value)}".strip()
+            return f"- {self.semstr} ({self.name}) ({self.type}) = {value_str}".strip()
+        return f"- {self.name} ({self.type}) = {value_str}".strip()
 
     def get_types(self) -> list:
         """Get the types of the information."""
         type_collector = extract_non_primary_type(self.type)
-        get_object_string(self.value, type_collector)
+        with profiler.span("get_object_string"):
+            get_object_string(self.value, type_collector)
         return type_collector
 
 
 class OutputHint:
     """Class to represent the output hint."""
 
-    def __init__(self, semstr: str, type: Type[Any]) -> None:  # noqa: ANN401
-        """Initializes the OutputHint class."""
+    def __init__(
+        self, semstr: str, type: Type[Any], enum_indices: bool = False  # noqa: ANN401
+    ) -> None:
+        """Initializes the OutputHint class.
+
+        Args:
+            semstr (str): The meaning of the output.
+            type (Type[Any]): The output type.
+            enum_indices (bool, optional): Whether the Enum members of the output are
+                written as their index. Defaults to False.
+        """
         self.semstr = semstr
+        self.annotation = type
         self.type = get_type(type)
+        self.enum_indices = enum_indices
 
     def __str__(self) -> str:
         """Returns the string representation of the OutputHint class."""
+        note = " (Enum members written as their index)" if self.enum_indices else ""
         if self.semstr:
-            return f"- {self.semstr} ({self.type})".strip()
-        return f"- {self.type}".strip()
+            return f"- {self.semstr} ({self.type}){note}".strip()
+        return f"- {self.type}{note}".strip()
 
     def get_types(self) -> list:
         """Get the types of the output."""
@@ -134,12 +250,22 @@ class OutputHint:
 
 
 class Tool:
-    """Base class for tools."""
+    """Base class for tools.
+
+    With a cache, the results are memoised by the canonical form of the arguments, and the
+    identical concurrent calls share a single execution.
+    """
 
-    def __init__(self, func: Callable, semstr: str = "") -> None:
+    def __init__(
+        self, func: Callable, semstr: str = "", cache: Optional["TTLCache"] = None
+    ) -> None:
         """Initialize the tool."""
         self.func = func
         self.semstr = semstr
+        self.cache = cache
+        self.hits = 0
+        self._single_flight = SingleFlight() if cache is not None else None
+        self._lock = threading.Lock()
 
     @property
     def get_params(self) -> List[Dict]:
@@ -166,7 +292,78 @@ class Tool:
 
     def __call__(self, *args, **kwargs) -> str:  # noqa
         """Forward function of the tool."""
-        return self.func(*args, **kwargs)
+        if self.cache is None:
+            return self.func(*args, **kwargs)
+        try:
+            key = self.cache_key(*args, **kwargs)
+        except TypeError:  # Invalid arguments, let the function raise
+            return self.func(*args, **kwargs)
+        if inspect.iscoroutinefunction(self.func):
+            return self._cached_call_async(key, *args, **kwargs)  # type: ignore
+        return self._cached_call(key, *args, **kwargs)
+
+    def stats(self) -> dict:
+        """Get the number of calls served from the cache or by an identical call in flight.
+
+        Returns:
+            dict: The number of `hits` (from the cache), `coalesced` calls (waiting for an
+                identical call), `executions` of the function, and the `hit_rate` (the share
+                of the calls that did not execute the function).
+        """
+        with self._lock:
+            hits = self.hits
+        coalesced = self._single_flight.coalesced if self._single_flight else 0
+        executions = self._single_flight.leaders if self._single_flight else 0
+        calls = hits + coalesced + executions
+        return {
+            "hits": hits,
+            "coalesced": coalesced,
+            "executions": executions,
+            "hit_rate": (hits + coalesced) / calls if calls else 0.0,
+        }
+
+    def cache_key(self, *args, **kwargs) -> str:  # noqa
+        """Get the cache key of a call, equal for the calls with equal arguments."""
+        bound = inspect.signature(self.func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        name = f"{self.func.__module__}.{self.func.__qualname__}"
+        return canonical_key(name, dict(bound.arguments))
+
+    def _cached_call(self, key: str, *args, **kwargs) -> Any:  # noqa
+        """Get the cached result of a call, or run it and cache its result."""
+        assert self.cache is not None and self._single_flight is not None
+        cache = self.cache
+        result = cache.get(key, _MISS)
+        metrics.record_cache(cache.name, result is not _MISS)
+        if result is not _MISS:
+            with self._lock:
+                self.hits += 1
+            return result
+
+        def run() -> Any:  # noqa: ANN401
+            result = self.func(*args, **kwargs)
+            cache.put(key, result)
+            return result
+
+        return self._single_flight.do(key, run)
+
+    async def _cached_call_async(self, key: str, *args, **kwargs) -> Any:  # noqa
+        """Get the cached result of a call, or await it and cache its result."""
+        assert self.cache is not None and self._single_flight is not None
+        cache = self.cache
+        result = cache.get(key, _MISS)
+        metrics.record_cache(cache.name, result is not _MISS)
+        if result is not _MISS:
+            with self._lock:
+                self.hits += 1
+            return result
+
+        async def run() -> Any:  # noqa: ANN401
+            result = await self.func(*args, **kwargs)
+            cache.put(key, result)
+            return result
+
+        return await self._single_flight.do_async(key, run)
 
     def get_usage_example(self) -> str:
         """Get the usage example of the tool."""
@@ -206,4 +403,4 @@ class ReActOutput:
 
     def __repr__(self) -> str:
         """Returns the string representation of the ReActOutput class."""
-        return f"\t- Thought: {self.thought}\n\t- Action: {self.action}\n\t- Observation: {self.observation})"
+        return f"\t- Thought: {self.thought}\n\t- Action: {self.action}\n\t- Observation: {self.observation}"
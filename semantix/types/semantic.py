@@ -1,8 +1,7 @@
 """This module contains the classes and functions to represent the types and information needed for the library."""
 
-import inspect
-import sys
-from typing import Any, Generic, Type, TypeVar
+import threading
+from typing import Any, Dict, Generic, Tuple, Type, TypeVar
 
 from semantix.utils.utils import get_type
 
@@ -11,7 +10,15 @@ T = TypeVar("T")
 
 
 class SemanticMeta(type):
-    """Metaclass for the Semantic class."""
+    """Metaclass for the Semantic class.
+
+    `Semantic[type, meaning]` creates the semantic type once per pair and caches it, so
+    subscriptions are cheap and safe from any thread. The meaning of a variable annotated
+    with a semantic type is read from the annotations of its module.
+    """
+
+    _types: Dict[Tuple[Any, str], type] = {}
+    _lock = threading.Lock()
 
     def __new__(
         mcs, name: str, bases: tuple, namespace: dict, **kwargs: dict  # noqa: N804
@@ -27,17 +34,22 @@ class SemanticMeta(type):
         if not isinstance(params, tuple) or len(params) != 2:
             raise TypeError("Semantic requires two parameters: type and meaning")
         typ, meaning = params
-        curr_frame = inspect.currentframe()
-        if curr_frame:
-            frame = curr_frame.f_back
-        if not frame:
-            raise Exception("Cannot get the current frame.")
-        var_name = list(frame.f_locals.keys())[-1]
-        # Set the meaning of the variable in the module's global scope
-        if var_name:
-            setattr(
-                sys.modules[frame.f_globals["__name__"]], f"{var_name}_meaning", meaning
-            )
+        try:
+            key = (cls, typ, meaning)
+            hash(key)
+        except TypeError:  # Unhashable type arguments
+            return cls._create(typ, meaning)
+        semantic_type = SemanticMeta._types.get(key)  # type: ignore
+        if semantic_type is None:
+            with SemanticMeta._lock:
+                semantic_type = SemanticMeta._types.get(key)  # type: ignore
+                if semantic_type is None:
+                    semantic_type = cls._create(typ, meaning)
+                    SemanticMeta._types[key] = semantic_type  # type: ignore
+        return semantic_type  # type: ignore
+
+    def _create(cls, typ: Any, meaning: str) -> type:  # noqa: ANN401
+        """Create the semantic type of a type and a meaning."""
         return type(
             f"MT_{get_type(typ)}", (cls,), {"wrapped_type": typ, "_meaning": meaning}
         )
@@ -65,6 +77,13 @@ class Semantic(Generic[T], metaclass=SemanticMeta):
         """Get the representation of the class."""
         return f"{self.wrapped_type.__name__} {self._meaning}"
 
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: Any  # noqa: ANN401
+    ) -> Any:  # noqa: ANN401
+        """Validate the semantic type as its wrapped type in pydantic."""
+        return handler.generate_schema(cls.wrapped_type)
+
 
 class Output:
     """Class to represent the output."""
@@ -0,0 +1,179 @@
+"""Scanner of the fenced blocks (```name ... ```) of model outputs.
+
+The scanner reads the output line by line in a single pass. Fences nested in a block (e.g.
+a code block inside a string output) are kept in the block, an unterminated block is
+closed at the end of the output, and the output can be fed in chunks as it is streamed.
+
+Inside a block, a fence followed by the name of a section of the prompts at the start of a
+line (```output) closes the block, unterminated, and opens the next one, so a block the
+model forgets to close does not swallow the following blocks. Any other named fence
+(e.g. ```python in a string output) opens a nested block. A fence at the start or at the
+end of a line closes the innermost block. Other fences are content.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+FENCE = "```"
+_RUN = re.compile(r"`{3,}")
+_INFO = re.compile(r"[\w+.-]+\s*")
+# The sections asked for by the method templates of the prompts (see `BaseLLM`)
+SECTIONS = frozenset(
+    {
+        "output",
+        "reasoning",
+        "chain-of-thoughts",
+        "reflection",
+        "plan",
+        "thought",
+        "action",
+        "summary",
+        "debug",
+    }
+)
+_NUMBERED_SECTION = re.compile(r"(output|step)_\w+")
+
+
+def is_section(name: str) -> bool:
+    """Check whether a block name is a section of the prompts (e.g. output, output_0)."""
+    return name in SECTIONS or _NUMBERED_SECTION.fullmatch(name) is not None
+
+
+class Block:
+    """Class to represent a fenced block."""
+
+    def __init__(self, name: str, content: str, complete: bool = True) -> None:
+        """Initializes the Block class.
+
+        Args:
+            name (str): The info string of the opening fence (e.g. "output").
+            content (str): The content between the fences.
+            complete (bool, optional): Whether the closing fence was found. Defaults to True.
+        """
+        self.name = name
+        self.content = content
+        self.complete = complete
+
+    def __repr__(self) -> str:
+        """Get the representation of the block."""
+        return f"Block({self.name!r}, {self.content!r}, complete={self.complete})"
+
+
+class FenceScanner:
+    """Class to scan the fenced blocks of an output, optionally fed in chunks."""
+
+    def __init__(self, names: Optional[Iterable[str]] = None) -> None:
+        """Initializes the FenceScanner class.
+
+        Args:
+            names (Iterable[str], optional): The names of the blocks to collect. The content
+                of the other blocks is skipped. Defaults to all the blocks.
+        """
+        self.names = set(names) if names is not None else None
+        self.blocks: List[Block] = []
+        self._buffer = ""
+        self._name: Optional[str] = None
+        self._lines: List[str] = []
+        self._depth = 0
+
+    @property
+    def current(self) -> Optional[Tuple[str, str]]:
+        """Get the name and the content so far of the block being scanned, if any."""
+        if self._name is None:
+            return None
+        return self._name, "\n".join([*self._lines, self._buffer])
+
+    def feed(self, chunk: str) -> List[Block]:
+        """Scan a chunk of the output.
+
+        Returns:
+            List[Block]: The blocks completed by the chunk.
+        """
+        *lines, self._buffer = (self._buffer + chunk).split("\n")
+        completed: List[Block] = []
+        for line in lines:
+            self._scan_line(line, completed)
+        return completed
+
+    def close(self) -> List[Block]:
+        """Scan the end of the output, closing the unterminated block if any.
+
+        Returns:
+            List[Block]: The blocks completed at the end of the output.
+        """
+        completed: List[Block] = []
+        if self._buffer:
+            line, self._buffer = self._buffer, ""
+            self._scan_line(line, completed)
+        if self._name is not None:
+            self._close("\n".join(self._lines), False, completed)
+        return completed
+
+    def _keep(self) -> bool:
+        """Check whether the content of the current block is collected."""
+        return self.names is None or self._name in self.names
+
+    def _close(self, content: str, complete: bool, completed: List[Block]) -> None:
+        """Close the current block."""
+        if self._keep():
+            block = Block(self._name or "", content, complete)
+            self.blocks.append(block)
+            completed.append(block)
+        self._name = None
+        self._lines = []
+        self._depth = 0
+
+    def _scan_line(self, line: str, completed: List[Block]) -> None:
+        """Scan a complete line of the output."""
+        if self._name is None:
+            start = line.find(FENCE)
+            if start == -1:
+                return
+            end = start + len(FENCE)
+            while end < len(line) and line[end] == "`":
+                end += 1
+            info = line[end:]
+            if FENCE in info:
+                return
+            self._name = info.strip()
+            self._depth = 1
+            return
+        for run in _RUN.finditer(line):
+            before, after = line[: run.start()], line[run.end() :]
+            if (
+                _INFO.fullmatch(after)
+                and not before.strip()
+                and is_section(after.strip())
+            ):
+                self._close("\n".join(self._lines), False, completed)
+                self._name = after.strip()
+                self._depth = 1
+                return
+            if _INFO.fullmatch(after):
+                self._depth += 1
+            elif not after.strip() or not before.strip():
+                self._depth -= 1
+                if self._depth == 0:
+                    if before.strip() and self._keep():
+                        self._lines.append(before)
+                    self._close("\n".join(self._lines), True, completed)
+                    return
+        if self._keep():
+            self._lines.append(line)
+
+
+def scan_blocks(output: str, names: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """Get the content of the fenced blocks of an output by name.
+
+    Args:
+        output (str): The model output.
+        names (Iterable[str], optional): The names of the blocks to get. Defaults to all the
+            blocks.
+
+    Returns:
+        Dict[str, str]: The content of the blocks. If a name is repeated, the last block wins.
+    """
+    scanner = FenceScanner(names)
+    scanner.feed(output)
+    scanner.close()
+    return {block.name: block.content for block in scanner.blocks}
@@ -1,16 +1,26 @@
 """Helper functions for the semantix package."""
 
 import dataclasses
+import sys
 from enum import Enum
-from typing import Any, Dict, Tuple, Type
+from typing import Any, Dict, TYPE_CHECKING, Tuple, Type
 
-from pydantic import BaseModel, create_model
+if TYPE_CHECKING:
+    from pydantic import BaseModel
 
-from pydantic_core import PydanticUndefined
+
+def is_pydantic_model(obj: Any) -> bool:  # noqa: ANN401
+    """Check whether the object is a pydantic model class, without importing pydantic."""
+    # pydantic may be in sys.modules while another thread is still importing it, in which
+    # case no model can exist yet.
+    base_model = getattr(sys.modules.get("pydantic"), "BaseModel", None)
+    return (
+        base_model is not None and isinstance(obj, type) and issubclass(obj, base_model)
+    )
 
 
 def pydantic_to_dataclass(
-    klass: Type[BaseModel], classname: str
+    klass: Type["BaseModel"], classname: str
 ) -> Any:  # noqa: ANN401
     """
     Dataclass from Pydantic model.
@@ -26,6 +36,8 @@ def pydantic_to_dataclass(
 
     """
     # https://stackoverflow.com/questions/78327471/how-to-convert-pydantic-model-to-python-dataclass
+    from pydantic_core import PydanticUndefined
+
     dataclass_args = []
     for name, info in klass.model_fields.items():
         if info.default_factory is not None:
@@ -63,6 +75,8 @@ def create_class(
     - Any: The created dataclass.
 
     """  # noqa: E501
+    from pydantic import create_model
+
     pydantic_model = create_model(classname, **fields)
     datacls = pydantic_to_dataclass(pydantic_model, classname)
     datacls.__doc__ = desc
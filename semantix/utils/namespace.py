@@ -0,0 +1,128 @@
+"""Resolution namespace of the enhanced functions.
+
+An enhanced function resolves names when it renders its prompt (the meaning of the
+information variables, the types to explain) and when it evaluates the output of the
+model. The namespace is captured once when the function is decorated: the locals of the
+decorating scope are copied into a read-only snapshot, and the globals are the dictionary
+of the module, which the function already refers to through `__globals__`. No frame is
+kept alive nor read afterwards, so the calls can run concurrently from any thread.
+"""
+
+import ast
+import importlib
+import sys
+from types import FrameType, MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+
+
+class Namespace:
+    """Class to represent the names an enhanced function resolves."""
+
+    def __init__(
+        self,
+        _globals: dict,
+        _locals: Optional[Mapping[str, Any]] = None,
+        filename: str = "",
+    ) -> None:
+        """Initializes the Namespace class.
+
+        Args:
+            _globals (dict): The globals of the module of the function.
+            _locals (Mapping[str, Any], optional): The locals of the decorating scope,
+                copied into a read-only snapshot. Defaults to None.
+            filename (str, optional): The source file of the decorating scope, used to
+                follow the imported information variables. Defaults to "".
+        """
+        self.globals = _globals
+        self.locals: Mapping[str, Any] = MappingProxyType(dict(_locals or {}))
+        self.filename = filename
+
+    @classmethod
+    def from_frame(cls, frame: FrameType) -> "Namespace":
+        """Capture the namespace of a frame (the scope decorating the function)."""
+        _globals = frame.f_globals
+        _locals = frame.f_locals
+        return cls(
+            _globals,
+            None if _locals is _globals else _locals,
+            frame.f_code.co_filename,
+        )
+
+    @classmethod
+    def from_module(cls, module: Any) -> "Namespace":  # noqa: ANN401
+        """Get the namespace of a module."""
+        return cls(vars(module), None, getattr(module, "__file__", "") or "")
+
+    @property
+    def module(self) -> str:
+        """Get the name of the module."""
+        return self.globals.get("__name__", "")
+
+    def __getitem__(self, name: str) -> Any:  # noqa: ANN401
+        """Resolve a name in the locals, then in the globals."""
+        if name in self.locals:
+            return self.locals[name]
+        return self.globals[name]
+
+    def __contains__(self, name: str) -> bool:
+        """Check whether a name is defined."""
+        return name in self.locals or name in self.globals
+
+    def find(self, obj: Any) -> str:  # noqa: ANN401
+        """Get the name of the variable bound to an object, "" if none."""
+        for scope in (self.locals, self.globals):
+            for name, value in list(scope.items()):
+                if value is obj:
+                    return name
+        return ""
+
+    def meaning(self, var_name: str) -> Optional[str]:
+        """Get the meaning of a variable, from its `Semantic` annotation.
+
+        The `<var_name>_meaning` variables are supported as well.
+        """
+        meaning = self.locals.get(f"{var_name}_meaning")
+        if meaning is None:
+            meaning = self.globals.get(f"{var_name}_meaning")
+        if meaning is not None:
+            return meaning
+        annotations = self.globals.get("__annotations__")
+        if annotations is None:
+            module = sys.modules.get(self.module)
+            annotations = getattr(module, "__annotations__", None) or {}
+        annotation = annotations.get(var_name)
+        return getattr(annotation, "_meaning", None)
+
+    def get_semstr(self, obj: Any) -> Tuple[str, str]:  # noqa: ANN401
+        """Get the name and the meaning of an information variable.
+
+        Variables imported with `from module import name` get the meaning declared in
+        their module.
+        """
+        var_name = self.find(obj)
+        if not var_name:
+            return "", ""
+        meaning = self.meaning(var_name)
+        if meaning is None and self.filename:
+            module = self._imported_from(var_name)
+            if module:
+                meaning = Namespace.from_module(
+                    importlib.import_module(module)
+                ).meaning(var_name)
+        return var_name, meaning or ""
+
+    def _imported_from(self, var_name: str) -> str:
+        """Get the module a variable is imported from in the source file, "" if none."""
+        try:
+            with open(self.filename, "r") as file:
+                tree = ast.parse(file.read())
+        except (OSError, SyntaxError):
+            return ""
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.ImportFrom)
+                and node.module
+                and any(alias.name == var_name for alias in node.names)
+            ):
+                return node.module
+        return ""
@@ -0,0 +1,225 @@
+"""JSON Schema compilation of output types and decoding of JSON outputs.
+
+Used by the structured output mode, where the provider is asked for a JSON output that
+matches the schema of the return type instead of Python constructor syntax.
+"""
+
+import dataclasses
+import types
+import typing
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from semantix.types.semantic import Semantic
+from semantix.utils.helpers import is_pydantic_model
+
+_PRIMITIVES = {
+    str: {"type": "string"},
+    int: {"type": "integer"},
+    float: {"type": "number"},
+    bool: {"type": "boolean"},
+    type(None): {"type": "null"},
+}
+_UNION_TYPES: tuple = tuple(
+    t for t in (typing.Union, getattr(types, "UnionType", None)) if t is not None
+)
+
+
+def _unwrap(_type: Any) -> Tuple[Any, str]:  # noqa: ANN401
+    """Get the wrapped type and the meaning of a semantic type."""
+    if isinstance(_type, type) and issubclass(_type, Semantic):
+        return _type.wrapped_type, _type._meaning
+    return _type, ""
+
+
+def get_fields(cls: type) -> Dict[str, Any]:
+    """Get the fields of a class with their type annotations."""
+    if is_pydantic_model(cls):
+        return {
+            name: info.annotation
+            for name, info in cls.model_fields.items()  # type: ignore
+        }
+    if dataclasses.is_dataclass(cls):
+        try:
+            hints = typing.get_type_hints(cls)
+        except Exception:
+            hints = {}
+        return {f.name: hints.get(f.name, f.type) for f in dataclasses.fields(cls)}
+    try:
+        hints = typing.get_type_hints(cls.__init__)  # type: ignore
+    except Exception:
+        hints = dict(getattr(cls.__init__, "__annotations__", {}))  # type: ignore
+    hints.pop("return", None)
+    return hints
+
+
+class SchemaCompiler:
+    """Class to compile a type and the types it refers to into JSON Schema."""
+
+    def __init__(self) -> None:
+        """Initializes the SchemaCompiler class."""
+        self.defs: Dict[str, dict] = {}
+        self.strict = True
+
+    def compile(self, _type: Any) -> dict:  # noqa: ANN401
+        """Get the schema of a type, adding the classes it refers to to the definitions."""
+        _type, meaning = _unwrap(_type)
+        schema = self._compile(_type)
+        if meaning:
+            schema = {**schema, "description": meaning}
+        return schema
+
+    def _compile(self, _type: Any) -> dict:  # noqa: ANN401
+        """Get the schema of an unwrapped type."""
+        if _type in _PRIMITIVES:
+            return dict(_PRIMITIVES[_type])
+        if _type is Any or _type is object:
+            self.strict = False
+            return {}
+        origin, args = typing.get_origin(_type), typing.get_args(_type)
+        if origin is typing.Literal:
+            return {"enum": list(args)}
+        if origin in _UNION_TYPES:
+            return {"anyOf": [self.compile(arg) for arg in args]}
+        if origin in (list, set, frozenset) or _type in (list, set):
+            return {"type": "array", "items": self.compile(args[0]) if args else {}}
+        if origin is tuple or _type is tuple:
+            self.strict = False
+            if args and args[-1] is not Ellipsis:
+                return {
+                    "type": "array",
+                    "prefixItems": [self.compile(arg) for arg in args],
+                    "minItems": len(args),
+                    "maxItems": len(args),
+                }
+            return {"type": "array", "items": self.compile(args[0]) if args else {}}
+        if origin is dict or _type is dict:
+            self.strict = False
+            return {
+                "type": "object",
+                "additionalProperties": self.compile(args[1]) if args else {},
+            }
+        if isinstance(_type, type):
+            return self._compile_class(_type)
+        raise TypeError(f"Cannot compile {_type} into JSON Schema.")
+
+    def _compile_class(self, cls: type) -> dict:
+        """Get a reference to the definition of a class, compiling it on first use."""
+        ref = {"$ref": f"#/$defs/{cls.__name__}"}
+        if cls.__name__ in self.defs:
+            return ref
+        self.defs[cls.__name__] = {}
+        schema: Dict[str, Any]
+        if issubclass(cls, Enum):
+            schema = {"type": "string", "enum": list(cls.__members__)}
+        else:
+            fields = get_fields(cls)
+            if not fields:
+                self.strict = False
+            schema = {
+                "type": "object",
+                "properties": {
+                    name: self.compile(annotation)
+                    for name, annotation in fields.items()
+                },
+                "required": list(fields),
+                "additionalProperties": False,
+            }
+        if cls.__doc__ and not (
+            dataclasses.is_dataclass(cls) and cls.__doc__.startswith(f"{cls.__name__}(")
+        ):
+            schema["description"] = cls.__doc__.strip()
+        self.defs[cls.__name__] = schema
+        return ref
+
+
+def compile_output_schema(
+    return_type: Any, sections: Optional[Dict[str, str]] = None  # noqa: ANN401
+) -> Tuple[dict, bool]:
+    """Compile the JSON Schema of the output of an enhanced function.
+
+    Args:
+        return_type (Any): The return type of the function.
+        sections (Dict[str, str], optional): The additional sections requested by the method
+            (e.g. reasoning), by name with their instructions. They come before the output.
+
+    Returns:
+        Tuple[dict, bool]: The schema, and whether it is supported by strict schema modes
+            (no free form objects, tuples or `Any`).
+    """
+    compiler = SchemaCompiler()
+    properties: Dict[str, Any] = {
+        name: {"type": "string", "description": desc}
+        for name, desc in (sections or {}).items()
+    }
+    properties["output"] = compiler.compile(return_type)
+    schema: Dict[str, Any] = {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+    if compiler.defs:
+        schema["$defs"] = compiler.defs
+    return schema, compiler.strict
+
+
+def from_json(data: Any, _type: Any) -> Any:  # noqa: ANN401
+    """Decode a JSON value into an object of the given type."""
+    _type, _ = _unwrap(_type)
+    if _type is Any or _type is object:
+        return data
+    if _type is type(None):
+        if data is not None:
+            raise ValueError(f"Expected null, got {data!r}")
+        return None
+    if _type is float and isinstance(data, int) and not isinstance(data, bool):
+        return float(data)
+    if _type in _PRIMITIVES:
+        if not isinstance(data, _type) or (_type is int and isinstance(data, bool)):
+            raise ValueError(f"Expected {_type.__name__}, got {data!r}")
+        return data
+    origin, args = typing.get_origin(_type), typing.get_args(_type)
+    if origin is typing.Literal:
+        if data not in args:
+            raise ValueError(f"Expected one of {args}, got {data!r}")
+        return data
+    if origin in _UNION_TYPES:
+        errors: List[str] = []
+        for arg in args:
+            try:
+                return from_json(data, arg)
+            except (TypeError, ValueError, KeyError) as e:
+                errors.append(str(e))
+        raise ValueError(f"{data!r} does not match {_type}: {'; '.join(errors)}")
+    if origin in (list, set, frozenset, tuple) or _type in (list, set, tuple):
+        if not isinstance(data, list):
+            raise ValueError(f"Expected a list, got {data!r}")
+        container = origin or _type
+        if container is tuple and args and args[-1] is not Ellipsis:
+            return tuple(from_json(item, arg) for item, arg in zip(data, args))
+        item_type = args[0] if args else Any
+        return container(from_json(item, item_type) for item in data)
+    if origin is dict or _type is dict:
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected an object, got {data!r}")
+        key_type, value_type = args if args else (Any, Any)
+        return {
+            (key_type(k) if key_type in (int, float) else k): from_json(v, value_type)
+            for k, v in data.items()
+        }
+    if isinstance(_type, type) and issubclass(_type, Enum):
+        if data in _type.__members__:
+            return _type[data]
+        return _type(data)
+    if isinstance(_type, type):
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a {_type.__name__} object, got {data!r}")
+        fields = get_fields(_type)
+        return _type(
+            **{
+                name: from_json(value, fields.get(name, Any))
+                for name, value in data.items()
+            }
+        )
+    raise TypeError(f"Cannot decode {_type}.")
@@ -0,0 +1,40 @@
+"""Threads running the requests that are waited for with a timeout or raced."""
+
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+
+def start_thread(
+    fn: Callable[..., Any], *args: Any, name: str = "semantix"  # noqa: ANN401
+) -> Future:
+    """Run a function in a new daemon thread, in a copy of the current context.
+
+    A thread of its own rather than a shared pool: a request queued for a worker would
+    spend its timeout waiting, and a request that cannot be interrupted once abandoned
+    would keep holding a worker.
+
+    Args:
+        fn (Callable[..., Any]): The function to run.
+        *args (Any): The arguments of the function.
+        name (str, optional): The name of the thread. Defaults to "semantix".
+
+    Returns:
+        Future: The future of the result of the function.
+    """
+    context = contextvars.copy_context()
+    future: Future = Future()
+
+    def run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = context.run(fn, *args)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
@@ -1,12 +1,9 @@
 """Utility functions for the semantix package."""
 
-import ast
-import importlib
+import dataclasses
 import re
-import sys
 from enum import Enum
-from types import FrameType, ModuleType
-from typing import Any, Optional
+from typing import Any, Callable, Dict
 
 
 def get_type(_type: Any) -> str:  # noqa: ANN401
@@ -67,6 +64,108 @@ def get_object_string(obj: Any, type_collector: list = []) -> str:  # noqa: ANN4
         return str(obj)
 
 
+def get_compact_object_string(obj: Any, min_length: int = 24) -> str:  # noqa: ANN401
+    """Get the compact string representation of the input object.
+
+    The dataclasses are written with positional arguments, and their trailing fields left
+    at their default values are left out. The substructures (objects, lists, tuples and
+    dicts) of at least `min_length` characters that are repeated in the object are
+    written once, as `$1`, `$2`... references defined after the object.
+    """
+    plain: Dict[int, str] = {}
+    counts: Dict[str, int] = {}
+
+    def measure(item: Any) -> str:  # noqa: ANN401
+        text = _compact_string(item, measure)
+        if _is_composite(item):
+            plain[id(item)] = text
+            if len(text) >= min_length:
+                counts[text] = counts.get(text, 0) + 1
+        return text
+
+    text = measure(obj)
+    if not any(count > 1 for count in counts.values()):
+        return text
+    # Count the occurrences again, without entering the repeats of a repeated value
+    repeats: Dict[str, int] = {}
+
+    def visit(item: Any) -> str:  # noqa: ANN401
+        key = plain.get(id(item), "")
+        if counts.get(key, 0) > 1:
+            repeats[key] = repeats.get(key, 0) + 1
+            if repeats[key] > 1:
+                return ""
+        return _compact_string(item, visit)
+
+    visit(obj)
+    names: Dict[str, str] = {}
+    definitions: Dict[str, str] = {}
+
+    def render(item: Any) -> str:  # noqa: ANN401
+        key = plain.get(id(item), "")
+        if repeats.get(key, 0) < 2:
+            return _compact_string(item, render)
+        if key not in names:
+            names[key] = f"${len(names) + 1}"
+            definitions[names[key]] = _compact_string(item, render)
+        return names[key]
+
+    text = _compact_string(obj, render)
+    references = sorted(definitions.items(), key=lambda item: int(item[0][1:]))
+    return f"{text} where {', '.join(f'{n} = {d}' for n, d in references)}"
+
+
+def _is_composite(obj: Any) -> bool:  # noqa: ANN401
+    """Check whether an object is rendered with nested values."""
+    return isinstance(obj, (list, tuple, dict)) or (
+        not isinstance(obj, (str, int, float, bool, Enum)) and hasattr(obj, "__dict__")
+    )
+
+
+def _compact_string(obj: Any, render: Callable[[Any], str]) -> str:  # noqa: ANN401
+    """Get the compact string of an object, rendering the nested values with `render`."""
+    if isinstance(obj, str):
+        return f'"{obj}"'
+    elif isinstance(obj, (int, float, bool)):
+        return str(obj)
+    elif isinstance(obj, list):
+        return "[" + ", ".join(render(item) for item in obj) + "]"
+    elif isinstance(obj, tuple):
+        return "(" + ", ".join(render(item) for item in obj) + ")"
+    elif isinstance(obj, dict):
+        return (
+            "{"
+            + ", ".join(f"{render(key)}: {render(value)}" for key, value in obj.items())
+            + "}"
+        )
+    elif isinstance(obj, Enum):
+        return f"{obj.__class__.__name__}.{obj.name}"
+    elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        fields = [f for f in dataclasses.fields(obj) if f.init]
+        while fields and _is_default(fields[-1], getattr(obj, fields[-1].name)):
+            fields.pop()
+        args = ", ".join(render(getattr(obj, f.name)) for f in fields)
+        return f"{obj.__class__.__name__}({args})"
+    elif hasattr(obj, "__dict__"):
+        args = ", ".join(f"{key}={render(value)}" for key, value in vars(obj).items())
+        return f"{obj.__class__.__name__}({args})"
+    else:
+        return str(obj)
+
+
+def get_field_default(field: "dataclasses.Field") -> Any:  # noqa: ANN401
+    """Get the default value of a dataclass field, `dataclasses.MISSING` if none."""
+    if field.default_factory is not dataclasses.MISSING:
+        return field.default_factory()
+    return field.default
+
+
+def _is_default(field: "dataclasses.Field", value: Any) -> bool:  # noqa: ANN401
+    """Check whether the value of a dataclass field is its default value."""
+    default = get_field_default(field)
+    return default is not dataclasses.MISSING and value == default
+
+
 def extract_non_primary_type(type_str: str) -> list:
     """Extract non-primary types from the type string."""
     if not type_str:
@@ -110,37 +209,3 @@ def get_type_from_value(data: Any) -> str:  # noqa: ANN401
             return "list"
     else:
         return str(type(data).__name__)
-
-
-def get_semstr(
-    frame: FrameType,
-    obj: Any,  # noqa: ANN401
-    var_name: str = "",
-    module: Optional[ModuleType] = None,
-) -> tuple:
-    """Get the semantic meaning of the input object."""
-    var_name = (
-        var_name
-        if var_name
-        else next((var for var, val in frame.f_locals.items() if val is obj), "")
-    )
-    _module = module if module else sys.modules[frame.f_globals["__name__"]]
-
-    if var_name:
-        meaning = getattr(_module, f"{var_name}_meaning", None)
-    if not meaning and var_name:
-        with open(frame.f_code.co_filename, "r") as file:
-            tree = ast.parse(file.read())
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ImportFrom):
-                for alias in node.names:
-                    if alias.name == var_name:
-                        if node.module:
-                            module = importlib.import_module(node.module)
-                        else:
-                            raise Exception(
-                                "Module not found."
-                            )  # Don't know whether this will happen
-                        var_name, meaning = get_semstr(frame, obj, var_name, module)
-                        break
-    return var_name, meaning
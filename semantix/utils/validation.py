@@ -0,0 +1,178 @@
+"""Validation of parsed outputs against the declared return type.
+
+The outputs are validated and coerced with a pydantic `TypeAdapter`, compiled once per
+return type. Validation is skipped when pydantic is not installed or cannot build a schema
+for the type (e.g. plain classes without annotations).
+"""
+
+import dataclasses
+import functools
+import importlib.util
+import typing
+from enum import Enum
+from typing import Any, Optional, Tuple, Union
+
+from semantix.utils.helpers import is_pydantic_model
+
+
+class OutputValidationError(ValueError):
+    """Error raised when the output does not match the return type."""
+
+
+@functools.lru_cache(maxsize=None)
+def _pydantic_available() -> bool:
+    """Check whether pydantic is installed, without importing it."""
+    return importlib.util.find_spec("pydantic") is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_type_adapter(_type: Any) -> Optional[Any]:  # noqa: ANN401
+    """Compile the type adapter of a type, None if pydantic cannot validate it."""
+    from pydantic import PydanticSchemaGenerationError, TypeAdapter
+
+    try:
+        return TypeAdapter(_type)
+    except (PydanticSchemaGenerationError, TypeError, NameError):
+        return None
+
+
+def get_type_adapter(_type: Any) -> Optional[Any]:  # noqa: ANN401
+    """Get the cached type adapter of a type, None if the type cannot be validated."""
+    if not _pydantic_available():
+        return None
+    try:
+        return _get_type_adapter(_type)
+    except TypeError:  # Unhashable annotation
+        return None
+
+
+def _to_python(obj: Any) -> Any:  # noqa: ANN401
+    """Convert the dataclasses and pydantic models of an object to dicts.
+
+    pydantic does not revalidate the instances it is given, so the fields of the objects
+    created by the model would not be checked otherwise.
+    """
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {
+            f.name: _to_python(getattr(obj, f.name)) for f in dataclasses.fields(obj)
+        }
+    if is_pydantic_model(type(obj)):
+        return {name: _to_python(getattr(obj, name)) for name in obj.model_fields}
+    if isinstance(obj, (list, tuple, set)):
+        return type(obj)(_to_python(item) for item in obj)
+    if isinstance(obj, dict):
+        return {key: _to_python(value) for key, value in obj.items()}
+    return obj
+
+
+def validate_output(obj: Any, _type: Any) -> Any:  # noqa: ANN401
+    """Validate and coerce an output against the return type.
+
+    Args:
+        obj (Any): The parsed output.
+        _type (Any): The return type.
+
+    Returns:
+        Any: The validated output, with the values coerced to the declared types.
+
+    Raises:
+        OutputValidationError: If the output does not match the type. The message lists the
+            path of every invalid field.
+    """
+    adapter = get_type_adapter(_type)
+    if adapter is None:
+        return obj
+    from pydantic import ValidationError
+
+    try:
+        return adapter.validate_python(_to_python(obj))
+    except ValidationError as e:
+        lines = [
+            f"- {'.'.join(str(x) for x in error['loc']) or '<output>'}: "
+            f"{error['msg']} (got {error['input']!r})"
+            for error in e.errors()
+        ]
+        raise OutputValidationError(
+            f"The output does not match the output type ({e.error_count()} errors):\n"
+            + "\n".join(lines)
+        ) from None
+
+
+def decode_enum_indices(obj: Any, _type: Any) -> Any:  # noqa: ANN401
+    """Replace the indices written for the Enum members of an output by the members.
+
+    The Enums are found in the return type, inside lists, sets, tuples, dicts, unions and
+    the fields of the dataclasses. The members given by name are kept.
+
+    Args:
+        obj (Any): The parsed output, with indices in place of the Enum members.
+        _type (Any): The return type.
+
+    Returns:
+        Any: The output with the Enum members.
+
+    Raises:
+        OutputValidationError: If an index is out of the range of its Enum.
+    """
+    return _decode(obj, _type, ())
+
+
+def _decode(obj: Any, _type: Any, path: Tuple[str, ...]) -> Any:  # noqa: ANN401
+    """Decode the Enum indices of an output at the given path."""
+    _type = getattr(_type, "wrapped_type", _type)  # Semantic types
+    origin, args = typing.get_origin(_type), typing.get_args(_type)
+    if isinstance(_type, type) and issubclass(_type, Enum):
+        if isinstance(obj, int) and not isinstance(obj, (bool, _type)):
+            members = list(_type)
+            if not 0 <= obj < len(members):
+                raise OutputValidationError(
+                    f"- {'.'.join(path) or '<output>'}: {obj} is not the index of a "
+                    f"{_type.__name__} member (0 to {len(members) - 1})"
+                )
+            return members[obj]
+        return obj
+    if origin is Union:
+        for arg in args:
+            if _is_instance(obj, arg):
+                return _decode(obj, arg, path)
+        return obj
+    if origin in (list, set, frozenset) and isinstance(obj, (list, set, frozenset)):
+        item_type = args[0] if args else Any
+        return type(obj)(
+            _decode(item, item_type, (*path, str(i))) for i, item in enumerate(obj)
+        )
+    if origin is tuple and isinstance(obj, tuple) and args:
+        if len(args) == 2 and args[1] is Ellipsis:
+            args = (args[0],) * len(obj)
+        return (
+            tuple(
+                _decode(item, arg, (*path, str(i)))
+                for i, (item, arg) in enumerate(zip(obj, args))
+            )
+            + obj[len(args) :]
+        )
+    if origin is dict and isinstance(obj, dict) and len(args) == 2:
+        return {
+            _decode(key, args[0], path): _decode(value, args[1], (*path, str(key)))
+            for key, value in obj.items()
+        }
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        try:
+            hints = typing.get_type_hints(type(obj))
+        except Exception:
+            hints = {f.name: f.type for f in dataclasses.fields(obj)}
+        for field in dataclasses.fields(obj):
+            value = getattr(obj, field.name)
+            decoded = _decode(value, hints.get(field.name), (*path, field.name))
+            if decoded is not value:
+                object.__setattr__(obj, field.name, decoded)
+    return obj
+
+
+def _is_instance(obj: Any, _type: Any) -> bool:  # noqa: ANN401
+    """Check whether an output can be an instance of a member of a union."""
+    _type = getattr(_type, "wrapped_type", _type)
+    if isinstance(_type, type) and issubclass(_type, Enum):
+        return isinstance(obj, (int, _type)) and not isinstance(obj, bool)
+    origin = typing.get_origin(_type) or _type
+    return isinstance(origin, type) and isinstance(obj, origin)